@@ -5,17 +5,23 @@ A Web UI for RED, the Resource Expert Droid.
 """
 
 
+from functools import partial
+import gzip
+import hashlib
 import locale
 import os
+import signal
 import sys
 from urllib.parse import urlsplit
 
 from redbot import __version__
+from redbot.resource import HttpResource
 from redbot.resource.robot_fetch import RobotFetcher
 from redbot.formatter import html
 from redbot.webui import RedWebUi, except_handler_factory
 
 import thor
+from thor.http import get_header
 from thor.loop import _loop
 _loop.precision = .1 # FIXME
 
@@ -38,12 +44,27 @@ class Config(object):
     # how many seconds to allow a check to run for
     max_runtime = 60
 
+    # limits on each fetch a check makes: response body bytes, header bytes and seconds.
+    # None to disable.
+    fetch_max_body = 1024 * 1024 * 16
+    fetch_max_headers = 1024 * 64
+    fetch_max_time = 30
+
+    # limits on all of a check's fetches together (including subrequests and linked resources):
+    # response body bytes and seconds. Keep the time under max_runtime, so results still show.
+    check_max_body = 1024 * 1024 * 64
+    check_max_time = 50
+
     # Where to keep files for future reference, when users save them. None to disable.
     save_dir = '/var/state/redbot/'
 
     # how long to store things when users save them, in days.
     save_days = 30
 
+    # sqlite file to record a summary of every check in, for querying with redbot_query.
+    # None to disable.
+    result_store = None
+
     # show errors in the browser; boolean
     debug = False  # DEBUG_CONTROL
 
@@ -54,9 +75,15 @@ class Config(object):
     # None to disable; 0 to log all.
     log_traffic = 1024 * 1024 * 8
 
+    # how long browsers can cache static assets for, in seconds (standalone server only)
+    static_max_age = 60 * 60 * 24 * 7
+
 # Where to cache robots.txt
 RobotFetcher.robot_cache_dir = "/var/state/robots-txt/" if not Config.debug else False
 
+# Whether subrequests and linked resources should send back the cookies that the response sets
+HttpResource.send_cookies = False
+
 # directory containing files to append to the front page; None to disable
 html.extra_dir = "extra"
 
@@ -189,42 +216,118 @@ def cgi_main():
         except_handler_factory(Config, qs=query_string)()
 
 
-def standalone_main(host, port, static_dir):
-    """Run REDbot as a standalone Web server."""
-
-    # load static files
-    static_types = {
+class StaticFile(object):
+    """
+    A static asset for the standalone server, held in memory along with a gzipped copy (if that
+    helps) so that neither has to be prepared per request.
+    """
+    types = {
         '.js': b'text/javascript',
         '.css': b'text/css',
+        '.map': b'application/json',
         '.png': b'image/png',
+        '.ico': b'image/x-icon',
     }
+    compressible = [b'text/javascript', b'text/css', b'application/json']
+
+    def __init__(self, path, body):
+        self.content_type = self.types.get(
+            os.path.splitext(path)[1].lower(), b'application/octet-stream')
+        self.body = body
+        self.etag = b'"%s"' % hashlib.sha1(body).hexdigest()[:20].encode('ascii')
+        self.gzip_body = None
+        self.gzip_etag = None
+        if self.content_type in self.compressible:
+            gzip_body = gzip.compress(body, 9)
+            if len(gzip_body) < len(body):
+                self.gzip_body = gzip_body
+                self.gzip_etag = self.etag[:-1] + b'-gz"'
+
+    def serve(self, x, req_hdrs, response_done):
+        "Respond to exchange x, choosing a representation and validating it."
+        if self.gzip_body is not None and accepts_gzip(req_hdrs):
+            body, etag = self.gzip_body, self.gzip_etag
+            headers = [(b'Content-Encoding', b'gzip')]
+        else:
+            body, etag = self.body, self.etag
+            headers = []
+        headers.extend([
+            (b'Content-Type', self.content_type),
+            (b'ETag', etag),
+            (b'Cache-Control', b'max-age=%i' % Config.static_max_age)])
+        if self.gzip_body is not None:
+            headers.append((b'Vary', b'Accept-Encoding'))
+        # Content-Length also stops thor from chunking the (empty) body of a 304.
+        headers.append((b'Content-Length', b"%i" % len(body)))
+        inm = b",".join(get_header(req_hdrs, b'if-none-match'))
+        if inm and (inm.strip() == b"*" or etag in [tag.strip() for tag in inm.split(b",")]):
+            x.response_start(b"304", b"Not Modified", headers)
+        else:
+            x.response_start(b"200", b"OK", headers)
+            x.response_body(body)
+        response_done([])
+
+
+def accepts_gzip(req_hdrs):
+    "Does the Accept-Encoding in req_hdrs allow gzip?"
+    for coding in b",".join(get_header(req_hdrs, b'accept-encoding')).split(b","):
+        params = [param.strip().lower() for param in coding.split(b";")]
+        if params[0] in [b'gzip', b'x-gzip']:
+            for param in params[1:]:
+                if param.startswith(b"q="):
+                    try:
+                        return float(param[2:]) > 0
+                    except ValueError:
+                        return False
+            return True
+    return False
+
+
+def load_static_files(static_dir):
+    "Load the static files under static_dir, keyed by the path they're served from."
     static_files = {}
     for root, dirs, files in os.walk(static_dir):
         for name in files:
             try:
                 path = os.path.join(root, name)
                 uri = os.path.relpath(path, static_dir)
-                static_files[b"/static/%s" % uri.encode('utf-8')] = open(path, 'rb').read()
+                static_files[b"/static/%s" % uri.encode('utf-8')] = \
+                    StaticFile(path, open(path, 'rb').read())
             except IOError:
                 sys.stderr.write("* Problem loading %s\n" % path)
+    return static_files
+
+
+def standalone_main(host, port, static_dir, sock=None, worker_id=None, counters=None):
+    """
+    Run REDbot as a standalone Web server.
+
+    If sock is given, accept connections on that (already listening) socket instead of binding
+    to host:port; this is how pre-forked workers share a port. worker_id identifies this worker's
+    slot in counters, a shared array of per-worker request counts.
+    """
+
+    static_files = load_static_files(static_dir)
+
+    active = [0] # requests in progress
 
     def red_handler(x):
         @thor.events.on(x)
         def request_start(method, uri, req_hdrs):
+            active[0] += 1
+            if counters is not None:
+                with counters.get_lock():
+                    counters[worker_id] += 1
+            def response_done(trailers):
+                active[0] -= 1
+                x.response_done(trailers)
             p_uri = urlsplit(uri)
             if p_uri.path in static_files:
-                headers = []
-                file_ext = os.path.splitext(p_uri.path)[1].lower()
-                content_encoding = static_types.get(file_ext, b'application/octet-stream')
-                headers.append((b'Content-Encoding', content_encoding))
-                headers.append((b'Cache-Control', b'max-age=300'))
-                x.response_start(b"200", b"OK", headers)
-                x.response_body(static_files[p_uri.path])
-                x.response_done([])
+                static_files[p_uri.path].serve(x, req_hdrs, response_done)
             elif p_uri.path == b"/":
                 try:
                     RedWebUi(Config, '/', method, p_uri.query,
-                             x.response_start, x.response_body, x.response_done)
+                             x.response_start, x.response_body, response_done)
                 except Exception:
                     sys.stderr.write("""
 
@@ -238,11 +341,31 @@ in standalone server mode. Details follow.
                     thor.stop()
             else:
                 x.response_start(b"404", b"Not Found", [])
-                x.response_done([])
+                response_done([])
 
-    server = thor.http.HttpServer(host, port)
+    if sock is None:
+        server = thor.http.HttpServer(host, port)
+    else:
+        class SharedSocketServer(thor.http.HttpServer):
+            tcp_server_class = partial(thor.TcpServer, sock=sock)
+        server = SharedSocketServer(host, port)
     server.on('exchange', red_handler)
 
+    if worker_id is not None:
+        # SIGTERM asks a worker to stop accepting connections and exit once it's idle.
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(True))
+        def check_stop(stop_time=None):
+            if stopping and stop_time is None:
+                server.tcp_server.unregister_fd() # thor's shutdown leaves it registered
+                server.shutdown()
+                stop_time = thor.time() + Config.max_runtime
+            if stop_time is not None and (active[0] == 0 or thor.time() > stop_time):
+                thor.stop()
+            else:
+                thor.schedule(1, check_stop, stop_time)
+        check_stop()
+
     try:
         thor.run()
     except KeyboardInterrupt:
@@ -258,6 +381,70 @@ def standalone_monitor(host, port, static_dir):
         p.start()
         p.join()
 
+def standalone_prefork(host, port, static_dir, workers):
+    """
+    Run a number of standalone Web server processes, sharing one listening socket.
+
+    Workers that die are restarted. SIGHUP gracefully restarts all workers (e.g., to pick up new
+    code); SIGUSR1 logs how many requests each worker has handled; SIGTERM and SIGINT shut down.
+    """
+    import multiprocessing
+    import time
+    ctx = multiprocessing.get_context('spawn') # so that workers don't share our thor loop
+    sock = thor.tcp.server_listen(host, port)
+    counters = ctx.Array('L', workers)
+    procs = [None] * workers
+    retiring = []
+    pending = []
+    for signum, name in [(signal.SIGHUP, 'restart'), (signal.SIGUSR1, 'stats'),
+                         (signal.SIGTERM, 'stop'), (signal.SIGINT, 'stop')]:
+        signal.signal(signum, lambda signum, frame, name=name: pending.append(name))
+
+    def start_worker(worker_id):
+        proc = ctx.Process(target=standalone_main,
+                           args=(host, port, static_dir, sock, worker_id, counters))
+        proc.start()
+        sys.stderr.write("* Started REDbot worker %s (PID %s)\n" % (worker_id, proc.pid))
+        return proc
+
+    def show_stats():
+        for worker_id, proc in enumerate(procs):
+            sys.stderr.write("* Worker %s (PID %s): %s requests\n" % (
+                worker_id, proc and proc.pid, counters[worker_id]))
+
+    while True:
+        while pending:
+            action = pending.pop(0)
+            if action == 'stats':
+                show_stats()
+            elif action == 'restart':
+                sys.stderr.write("* Restarting workers...\n")
+                retiring.extend([proc for proc in procs if proc])
+                procs = [start_worker(worker_id) for worker_id in range(workers)]
+                for proc in retiring:
+                    proc.terminate()
+            elif action == 'stop':
+                sys.stderr.write("* Stopping workers...\n")
+                for proc in procs + retiring:
+                    if proc and proc.is_alive():
+                        proc.terminate()
+                for proc in procs + retiring:
+                    if proc:
+                        proc.join(Config.max_runtime)
+                        if proc.is_alive():
+                            os.kill(proc.pid, signal.SIGKILL)
+                show_stats()
+                return
+        retiring = [proc for proc in retiring if proc.is_alive()]
+        for worker_id, proc in enumerate(procs):
+            if proc is not None and not proc.is_alive():
+                sys.stderr.write("* Worker %s (PID %s) exited with %s after %s requests\n" % (
+                    worker_id, proc.pid, proc.exitcode, counters[worker_id]))
+                proc = None
+            if proc is None:
+                procs[worker_id] = start_worker(worker_id)
+        time.sleep(1)
+
 
 if __name__ == "__main__":
     if 'GATEWAY_INTERFACE' in os.environ:  # CGI
@@ -268,6 +455,9 @@ if __name__ == "__main__":
         usage = "Usage: %prog [options] port static_dir"
         version = "REDbot version %s" % __version__
         option_parser = OptionParser(usage=usage, version=version)
+        option_parser.add_option("-w", "--workers", action="store", type="int",
+                                 dest="workers", default=1,
+                                 help="number of server processes to run")
         (options, args) = option_parser.parse_args()
         if len(args) < 2:
             option_parser.error("Please specify a port and a static directory.")
@@ -281,4 +471,7 @@ if __name__ == "__main__":
             "Starting standalone server on PID %s...\n" % os.getpid() + \
             "http://localhost:%s/\n" % port)
 
-        standalone_main("", port, static_dir)
+        if options.workers > 1:
+            standalone_prefork("", port, static_dir, options.workers)
+        else:
+            standalone_main("", port, static_dir)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+"""
+Batch checking for REDbot.
+
+BatchChecker runs HttpResource checks for a stream of URLs inside a single thor loop, keeping at
+most a fixed number of them in flight at once.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, TextIO
+
+import thor
+from thor.events import EventEmitter
+
+from redbot.resource import HttpResource
+from redbot.type import StrHeaderListType
+
+
+class BatchChecker(EventEmitter):
+    """
+    Check a number of URLs concurrently.
+
+    Emits "check_done" with each HttpResource as it finishes (i.e., in completion order, not input
+    order), and "batch_done" once every URL has been checked.
+
+    Resources are not retained once "check_done" has been emitted, so memory use is bounded by
+    concurrency, not by the number of URLs.
+
+    To check something other than a list of URLs, override resources().
+    """
+    def __init__(self, urls: Iterable[str]=(), concurrency: int=10, descend: bool=False,
+                 req_hdrs: StrHeaderListType=None) -> None:
+        EventEmitter.__init__(self)
+        self.urls = urls                # type: Iterable[str]
+        self.concurrency = max(1, concurrency)
+        self.descend = descend
+        self.req_hdrs = req_hdrs or []  # type: StrHeaderListType
+        self.running = 0
+        self.checked = 0
+        self.start_time = None          # type: float
+        self.end_time = None            # type: float
+        self._resources = None          # type: Iterator[HttpResource]
+        self._exhausted = False
+        self._filling = False
+
+    def run(self) -> None:
+        """
+        Start checking. The caller is responsible for running the thor loop.
+        """
+        self.start_time = thor.time()
+        self._resources = self.resources()
+        self._fill()
+
+    def _fill(self) -> None:
+        "Start checks until we hit the concurrency limit or run out of resources."
+        if self._filling:
+            # a check finished synchronously while starting; the loop below will pick it up.
+            return
+        self._filling = True
+        try:
+            while self.running < self.concurrency and not self._exhausted:
+                try:
+                    resource = next(self._resources)
+                except StopIteration:
+                    self._exhausted = True
+                    break
+                self._start(resource)
+        finally:
+            self._filling = False
+        if self._exhausted and self.running == 0 and self.end_time is None:
+            self.end_time = thor.time()
+            # from the loop, so that listeners can stop it even if it hasn't started yet.
+            thor.schedule(0, self.emit, "batch_done")
+
+    def resources(self) -> Iterator[HttpResource]:
+        "Yield the HttpResources to check; by default, one for each URL."
+        for url in self.urls:
+            yield self.new_resource(url)
+
+    def new_resource(self, url: str) -> HttpResource:
+        "Return a HttpResource for checking url."
+        resource = HttpResource(descend=self.descend)
+        resource.set_request(url, req_hdrs=list(self.req_hdrs))
+        return resource
+
+    def _start(self, resource: HttpResource) -> None:
+        "Start checking a single resource."
+        self.running += 1
+        @thor.events.on(resource)
+        def check_done() -> None:
+            self.running -= 1
+            self.checked += 1
+            self.emit("check_done", resource)
+            self._fill()
+        resource.check()
+
+    @property
+    def elapsed(self) -> float:
+        "Seconds spent checking so far."
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or thor.time()) - self.start_time
+
+    @property
+    def throughput(self) -> float:
+        "Checks completed per second."
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return 0.0
+        return self.checked / elapsed
+
+
+def read_urls(infile: TextIO) -> Iterator[str]:
+    """
+    Yield URLs from a file-like object, one per line. Blank lines and lines starting with '#'
+    are ignored.
+    """
+    for line in infile:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        yield line
+
+
+def result_record(resource: HttpResource) -> Dict[str, Any]:
+    """
+    Summarise a finished HttpResource as a flat, JSON-serialisable dictionary.
+    """
+    response = resource.response
+    record = {
+        'uri': resource.request.uri or resource.request.iri,
+        'status': response.status_code,
+        'complete': response.complete,
+        'notes': [{'note': note.__class__.__name__,
+                   'subject': note.subject,
+                   'level': note.level.value} for note in resource.notes],
+        'payload_len': response.payload_len,
+        'transfer_in': resource.transfer_in,
+        'transfer_out': resource.transfer_out,
+        'pool_hits': resource.pool_hits,
+        'pool_misses': resource.pool_misses,
+    } # type: Dict[str, Any]
+    if response.http_error is not None:
+        record['error'] = response.http_error.desc
+    if resource.request.start_time and response.complete_time:
+        record['time'] = round(response.complete_time - resource.request.start_time, 3)
+    if resource.descend:
+        record['linked'] = [result_record(linked) for (linked, tag) in resource.linked]
+    return record
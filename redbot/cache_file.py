@@ -1,69 +1,69 @@
 #!/usr/bin/env python
 
-import gzip
 import os
-from os import path
+import sqlite3
+from typing import Tuple, Union
 import zlib
 
 import thor
 
-class CacheFile(object):
+class CacheDb(object):
     """
-    A gzipped cache file whose unix modification time indicates how long it
-    is fresh for. No locking, so errors are discarded.
+    A cache of byte strings in a single sqlite file, each with an expiry time. It can be shared by
+    several processes. Errors are discarded.
     """
+    purge_interval = 1000 # writes between purges of expired entries
 
     def __init__(self, my_path: str) -> None:
         self.path = my_path
+        self._conn = None # type: sqlite3.Connection
+        self._pid = None  # type: int
+        self._writes = 0
 
-    def read(self) -> bytes:
+    def _connect(self) -> sqlite3.Connection:
+        "Get a connection for this process, creating the database if necessary."
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache "
+                         "(key TEXT PRIMARY KEY, expires REAL, content BLOB)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def read(self, key: str) -> Union[Tuple[bytes, float], None]:
         """
-        Read the file, returning its contents. If it does not exist or
-        cannot be read, returns None.
+        Return the content stored for key and when it expires, as a tuple. If there isn't any,
+        it's stale, or it cannot be read, returns None.
         """
-        if not path.exists(self.path):
-            return None
-
         try:
-            fd = gzip.open(self.path)
-        except (OSError, IOError, zlib.error):
-            self.delete()
-            return None
-
-        try:
-            mtime = os.fstat(fd.fileno()).st_mtime
-            is_fresh = mtime > thor.time()
-            if not is_fresh:
-                self.delete()
+            row = self._connect().execute(
+                "SELECT content, expires FROM cache WHERE key = ? AND expires > ?",
+                (key, thor.time())).fetchone()
+            if row is None:
                 return None
-            content = fd.read()
-        except IOError:
-            self.delete()
+            return zlib.decompress(row[0]), row[1]
+        except (sqlite3.Error, zlib.error):
             return None
-        finally:
-            if 'fd' in locals():
-                fd.close()
-        return content
-
 
-    def write(self, content: bytes, lifetime: int) -> None:
+    def write(self, key: str, content: bytes, lifetime: int) -> None:
         """
-        Write content to the file, marking it fresh for lifetime seconds.
+        Store content for key, marking it fresh for lifetime seconds.
         Discard errors silently.
         """
         try:
-            fd = gzip.open(self.path, 'w')
-            fd.write(content)
-            os.utime(self.path, (thor.time(), thor.time() + lifetime))
-        except (OSError, IOError, zlib.error):
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO cache (key, expires, content) VALUES (?, ?, ?)",
+                         (key, thor.time() + lifetime, zlib.compress(content)))
+            self._writes += 1
+            if self._writes % self.purge_interval == 0:
+                conn.execute("DELETE FROM cache WHERE expires <= ?", (thor.time(),))
+        except (sqlite3.Error, OSError):
             return
-        finally:
-            if 'fd' in locals():
-                fd.close()
 
-    def delete(self) -> None:
-        "Remove the file, discarding errors silently."
+    def delete(self, key: str) -> None:
+        "Remove key, discarding errors silently."
         try:
-            os.remove(self.path)
-        except:
+            self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+        except (sqlite3.Error, OSError):
             pass
@@ -104,7 +104,12 @@ class Formatter(EventEmitter):
                 thor.schedule(0.1, self._done)
 
     def _done(self) -> None:
-        self.finish_output()
+        timing = getattr(self.resource, 'timing', None)  # saved resources aren't timed
+        if timing is not None:
+            with timing.phase("render"):
+                self.finish_output()
+        else:
+            self.finish_output()
         self.emit('formatter_done')
 
     def start_output(self) -> None:
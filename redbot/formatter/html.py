@@ -13,7 +13,7 @@ import operator
 import os
 import re
 import textwrap
-from typing import Any, Match, Tuple, Union # pylint: disable=unused-import
+from typing import Any, Match, Set, Tuple, Union # pylint: disable=unused-import
 from urllib.parse import urljoin, quote as urlquote
 
 from markdown import markdown
@@ -114,10 +114,14 @@ $('#red_status').text("%s");
 """ % (thor.time() - self.start, e_html(message)))
 
     def final_status(self) -> None:
-#        See issue #51
-#        self.status("REDbot made %(reqs)s requests in %(elapse)2.3f seconds." % {
-#            'reqs': fetch.total_requests,
-        self.status("")
+        reqs = getattr(self.resource, 'request_count', None)  # saved resources don't know
+        if reqs:
+            self.status("REDbot made %(reqs)s requests in %(elapse)2.3f seconds." % {
+                'reqs': reqs,
+                'elapse': thor.time() - self.start
+            })
+        else:
+            self.status("")
         self.output("""
 <div id="final_status">%(elapse)2.2f seconds</div>
 """ % {'elapse': thor.time() - self.start})
@@ -225,7 +229,9 @@ class SingleEntryHtmlFormatter(BaseHtmlFormatter):
 
     # associating categories with subrequests
     note_responses = {
-        categories.CONNEG: [active_check.ConnegCheck.check_name],
+        categories.CONNEG: [active_check.ConnegCheck.check_name,
+                            active_check.BrotliConnegCheck.check_name,
+                            active_check.DeflateConnegCheck.check_name],
         categories.VALIDATION: [active_check.ETagValidate.check_name,
                                 active_check.LmValidate.check_name],
         categories.RANGE: [active_check.RangeRequest.check_name]}
@@ -398,13 +404,14 @@ class SingleEntryHtmlFormatter(BaseHtmlFormatter):
         out = []
         # banner, possibly with links to subreqs
         out.append("<h3>%s\n" % category.value)
-        if category in self.note_responses:
+        if category in self.note_responses and hasattr(resource, "subreqs"):
             for check_name in self.note_responses[category]:
-                if not resource.subreqs[check_name].fetch_started:
+                subreq = resource.subreqs.get(check_name, None)
+                if subreq is None or not subreq.fetch_started:
                     continue
                 out.append('<span class="req_link"> (<a href="?%s">%s response</a>' % \
                   (self.req_qs(check_name=check_name), check_name))
-                smsgs = [note for note in getattr(resource.subreqs[check_name], "notes", []) if \
+                smsgs = [note for note in getattr(subreq, "notes", []) if \
                   note.level in [levels.BAD] and note not in notes]
 #                notes.extend(smsgs)
                 if len(smsgs) == 1:
@@ -447,7 +454,7 @@ class SingleEntryHtmlFormatter(BaseHtmlFormatter):
    document.write("<a href='#' id='body_view' accesskey='b'>view body</a>")
 </script>""",
                         "View this response body (with any gzip compression removed)"))
-        if isinstance(resource, HttpResource):
+        if hasattr(resource, "subreqs"):
             options.append(
                 ("""\
         <a href="?%s" accesskey="h">view har</a>""" % self.req_qs(res_format='har'),
@@ -519,12 +526,12 @@ class HeaderPresenter(object):
 class TableHtmlFormatter(BaseHtmlFormatter):
     """
     Present a summary of multiple HttpResources.
+
+    When bound to a check that's still running, each resource's row is written as soon as it
+    finishes, in the order they finish. Otherwise, rows are grouped by the kind of link.
     """
-    # HTML template for the main response body
+    # HTML template for the main response body, after the summary table
     template = """\
-    <table id='summary'>
-    %(table)s
-    </table>
     <p class="options">
         %(options)s
     </p>
@@ -546,11 +553,41 @@ class TableHtmlFormatter(BaseHtmlFormatter):
     def __init__(self, *args: Any, **kw: Any) -> None:
         BaseHtmlFormatter.__init__(self, *args, **kw)
         self.problems = [] # type: List[Note]
+        self.streaming = False
+        self.shown = set() # type: Set[HttpResource]
+
+    def start_output(self) -> None:
+        BaseHtmlFormatter.start_output(self)
+        if self.resource is None or self.resource.check_done:
+            return # nothing to wait for; the whole table is written by finish_output.
+        # Write rows as resources finish, rather than making the user wait for all of them.
+        self.streaming = True
+        self.output("    <table id='summary'>\n%s" % self.format_table_header())
+        @thor.events.on(self.resource)
+        def own_checks_done() -> None:
+            self.show_droid(self.resource)
+        @thor.events.on(self.resource)
+        def linked_done(linked: HttpResource, tag: str) -> None:
+            self.show_droid(linked)
+
+    def show_droid(self, resource: HttpResource) -> None:
+        "Write a resource's row to the summary table, if it hasn't been already."
+        if resource not in self.shown:
+            self.shown.add(resource)
+            self.output(self.format_droid(resource))
 
     def finish_output(self) -> None:
-        self.final_status()
+        if self.streaming:
+            self.show_droid(self.resource)
+            for linked, tag in self.resource.linked:
+                self.show_droid(linked)
+            self.output("    </table>\n")
+            self.final_status()
+        else:
+            self.final_status()
+            self.output("    <table id='summary'>\n%s\n    </table>\n" % \
+                        self.format_tables(self.resource))
         self.output(self.template % {
-            'table': self.format_tables(self.resource),
             'problems': self.format_problems(),
             'options': self.format_options(self.resource),
             'footer': self.format_footer(),
@@ -621,10 +658,7 @@ class TableHtmlFormatter(BaseHtmlFormatter):
             out.append(self.format_time(resource.response.freshness_lifetime))
             out.append(self.format_yes_no(resource.ims_support))
             out.append(self.format_yes_no(resource.inm_support))
-            if resource.gzip_support:
-                out.append("<td>%s%%</td>" % resource.gzip_savings)
-            else:
-                out.append(self.format_yes_no(resource.gzip_support))
+            out.append(self.format_codings(resource))
             out.append(self.format_yes_no(resource.partial_support))
             problems = [m for m in resource.notes if m.level in [levels.WARN, levels.BAD]]
             out.append("<td>")
@@ -670,8 +704,8 @@ class TableHtmlFormatter(BaseHtmlFormatter):
           Last-Modified.">IMS</th>
         <th title="Whether If-None-Match validation is supported, using
           ETags.">INM</th>
-        <th title="Whether negotiation for gzip compression is supported; if
-          so, the percent of the original size saved.">gzip</th>
+        <th title="The content-codings that negotiation for compression is
+          supported for, with the percent of the original size each saves.">compression</th>
         <th title="Whether partial responses are supported.">partial</th>
         <th title="Issues encountered.">notes</th>
         </tr>
@@ -691,6 +725,17 @@ class TableHtmlFormatter(BaseHtmlFormatter):
         else:
             return '<td>%s</td>' % f_num(value, by1024=True)
 
+    def format_codings(self, resource: HttpResource) -> str:
+        coding_support = resource.coding_support or {'gzip': resource.gzip_support}
+        coding_savings = resource.coding_savings or {'gzip': resource.gzip_savings}
+        supported = [coding for coding in sorted(coding_support) if coding_support[coding]]
+        if supported:
+            return '<td>%s</td>' % ", ".join(
+                ["%s %s%%" % (coding, coding_savings.get(coding, 0)) for coding in supported])
+        elif False in coding_support.values():
+            return self.format_yes_no(False)
+        return self.format_yes_no(None)
+
     @staticmethod
     def format_yes_no(value: Union[bool, None]) -> str:
         icon_tpl = '<td><img src="%s/icon/%%s" alt="%%s"/></td>' % \
@@ -5,15 +5,15 @@ All checks that can be performed on a message in isolation.
 """
 
 import base64
-import binascii
 import hashlib
 import re
 import time
-from typing import Any, Callable, Dict, Tuple, Type, Union
+from typing import Any, Callable, Dict, List, Tuple, Type, Union
 from urllib.parse import urlsplit, urlunsplit, quote as urlquote
 import zlib
 
 from redbot.formatter import f_num
+from redbot.message.codings import CodingError, content_decoders
 from redbot.message.headers import HeaderProcessor
 from redbot.speak import Note, levels, categories, display_bytes
 from redbot.syntax import rfc3986
@@ -23,6 +23,9 @@ import thor
 
 ### configuration
 MAX_URI = 8000
+PAYLOAD_SAMPLE_LEN = 128 # how much of each sampled body chunk to keep (see active_check.range)
+
+URI_SYNTAX = re.compile(r"^\s*%s\s*$" % rfc3986.URI, re.VERBOSE)
 
 
 class HttpMessage(thor.events.EventEmitter):
@@ -30,7 +33,18 @@ class HttpMessage(thor.events.EventEmitter):
     Base class for HTTP message state.
 
     Emits "chunk" for each chunk of the response body (after decoding Content-Encoding).
+
+    The attributes set here are slotted, since every fetch keeps two messages (or more) around.
     """
+    __slots__ = (
+        'add_note', 'is_request', 'version', 'base_uri', 'start_time', 'complete',
+        'complete_time', 'headers', 'parsed_headers', 'header_length', 'payload', 'payload_size',
+        '_payload_buffer', 'payload_truncated', 'payload_recorded', 'payload_len', 'payload_md5',
+        'payload_sample', 'character_encoding', 'decoded_len', 'decoded_md5', 'decoded_sample',
+        'decoded_sample_size', '_decoded_sample_seen', 'decoded_sample_complete', '_decode_ok',
+        'transfer_length', 'trailers', 'http_error', '_md5_processor', '_md5_post_processor',
+        '_decoders')
+
     def __init__(self, add_note: AddNoteMethodType) -> None:
         thor.events.EventEmitter.__init__(self)
         if not hasattr(self, 'add_note'):
@@ -45,6 +59,10 @@ class HttpMessage(thor.events.EventEmitter):
         self.parsed_headers = {}        # type: HeaderDictType
         self.header_length = 0          # type: int
         self.payload = b""              # type: bytes   # Only used for 206 responses
+        self.payload_size = 1024 * 1024 # type: int     # how much of a 206 payload to keep
+        self._payload_buffer = bytearray() # type: bytearray
+        self.payload_truncated = False  # type: bool
+        self.payload_recorded = True    # type: bool    # False if the body isn't what was sent
         self.payload_len = 0            # type: int
         self.payload_md5 = None         # type: bytes
         self.payload_sample = []        # type: List[Tuple[int, bytes]]
@@ -61,9 +79,7 @@ class HttpMessage(thor.events.EventEmitter):
         self.http_error = None          # type: thor.http.error.HttpError
         self._md5_processor = hashlib.new('md5')
         self._md5_post_processor = hashlib.new('md5')
-        self._gzip_processor = zlib.decompressobj(-zlib.MAX_WBITS)
-        self._in_gzip_body = False
-        self._gzip_header_buffer = b""
+        self._decoders = None           # type: List[Tuple[str, Any]]
 
     def __repr__(self) -> str:
         status = [self.__class__.__module__ + "." + self.__class__.__name__]
@@ -71,15 +87,24 @@ class HttpMessage(thor.events.EventEmitter):
 
     def __getstate__(self) -> Dict[str, Any]:
         state = thor.events.EventEmitter.__getstate__(self)
+        for cls in self.__class__.__mro__:
+            for key in cls.__dict__.get('__slots__', ()):
+                if hasattr(self, key):
+                    state[key] = getattr(self, key)
         for key in [
                 '_md5_processor',
                 '_md5_post_processor',
-                '_gzip_processor',
+                '_decoders',
                 'add_note']:
             if key in state:
                 del state[key]
         return state
 
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        # the same as the unslotted default, so messages pickled before they were slotted load too
+        for key, value in state.items():
+            setattr(self, key, value)
+
     def process_raw_headers(self, headers: RawHeaderListType) -> None:
         """
         Feed a list of (bytes name, bytes value) header tuples in and process them.
@@ -106,14 +131,18 @@ class HttpMessage(thor.events.EventEmitter):
 
         decoded_sample is also populated.
         """
-        self.payload_sample.append((self.payload_len, chunk))
+        self.payload_sample.append((self.payload_len, chunk[:PAYLOAD_SAMPLE_LEN]))
         if len(self.payload_sample) > 4:
             self.payload_sample.pop(0)
         self._md5_processor.update(chunk)
         self.payload_len += len(chunk)
         if (not self.is_request) and self.status_code == "206":
             # only store 206; don't try to understand it
-            self.payload += chunk
+            room = self.payload_size - len(self._payload_buffer)
+            if len(chunk) > room:
+                self.payload_truncated = True
+                chunk = chunk[:max(room, 0)]
+            self._payload_buffer += chunk
         else:
             decoded_chunk = self._process_content_codings(chunk)
             if self._decode_ok:
@@ -141,8 +170,20 @@ class HttpMessage(thor.events.EventEmitter):
         self.trailers = trailers or []
         self.payload_md5 = self._md5_processor.digest()
         self.decoded_md5 = self._md5_post_processor.digest()
-
-        if self.is_request or \
+        # finished with these, and decoders can hold a lot of state
+        self._md5_processor = self._md5_post_processor = None
+        self._decoders = []
+        if self._payload_buffer:
+            self.payload = bytes(self._payload_buffer)
+            self._payload_buffer = bytearray()
+            if self.payload_truncated:
+                self.add_note('body', PAYLOAD_TRUNCATED,
+                              payload_size=f_num(self.payload_size),
+                              payload_len=f_num(self.payload_len))
+
+        if not self.payload_recorded:
+            pass # e.g., replayed from a HAR file; we can't check it
+        elif self.is_request or \
           (not self.is_head_response and self.status_code not in ['304']):
             # check payload basics
             if 'content-length' in self.parsed_headers:
@@ -165,97 +206,52 @@ class HttpMessage(thor.events.EventEmitter):
         """
         Decode a chunk according to the message's content-encoding header.
 
-        Currently supports gzip.
+        Supports the codings in redbot.message.codings.content_decoders (gzip, deflate and, if
+        the brotli module is available, br), in any combination.
         """
-        content_codings = self.parsed_headers.get('content-encoding', [])
-        content_codings.reverse()
-        for coding in content_codings:
-            if coding in ['gzip', 'x-gzip'] and self._decode_ok:
-                if not self._in_gzip_body:
-                    self._gzip_header_buffer += chunk
-                    try:
-                        chunk = self._read_gzip_header(self._gzip_header_buffer)
-                        self._in_gzip_body = True
-                    except IndexError:
-                        return b'' # not a full header yet
-                    except IOError as gzip_error:
-                        self.add_note('header-content-encoding',
-                                      BAD_GZIP,
-                                      gzip_error=str(gzip_error))
-                        self._decode_ok = False
-                        return b''
-                try:
-                    chunk = self._gzip_processor.decompress(chunk)
-                except zlib.error as zlib_error:
-                    self.add_note(
-                        'header-content-encoding',
-                        BAD_ZLIB,
-                        zlib_error=str(zlib_error),
-                        ok_zlib_len=f_num(self.payload_len),
-                        chunk_sample=display_bytes(chunk)
-                    )
+        if self._decoders is None:
+            self._decoders = []
+            for coding in reversed(self.parsed_headers.get('content-encoding', [])):
+                if coding == 'identity':
+                    continue
+                if coding not in content_decoders:
+                    # we can't handle other codecs, so punt on body processing.
                     self._decode_ok = False
-                    return b''
-            else:
-                # we can't handle other codecs, so punt on body processing.
+                    break
+                self._decoders.append((coding, content_decoders[coding]()))
+        if not self._decode_ok:
+            return b''
+        for coding, decoder in self._decoders:
+            try:
+                chunk = decoder.decode(chunk)
+            except IOError as gzip_error:
+                self.add_note('header-content-encoding',
+                              BAD_GZIP,
+                              gzip_error=str(gzip_error))
+                self._decode_ok = False
+                return b''
+            except (zlib.error, CodingError) as zlib_error:
+                self.add_note(
+                    'header-content-encoding',
+                    BAD_ZLIB,
+                    coding=coding,
+                    zlib_error=str(zlib_error),
+                    ok_zlib_len=f_num(self.payload_len),
+                    chunk_sample=display_bytes(chunk)
+                )
                 self._decode_ok = False
                 return b''
         self._md5_post_processor.update(chunk)
         self.decoded_len += len(chunk)
         return chunk
 
-    @staticmethod
-    def _read_gzip_header(content: bytes) -> bytes:
-        """
-        Parse a string for a GZIP header; if present, return remainder of
-        gzipped content.
-        """
-        # adapted from gzip.py
-        gz_flags = {
-            'FTEXT': 1,
-            'FHCRC': 2,
-            'FEXTRA': 4,
-            'FNAME': 8,
-            'FCOMMENT': 16
-        }
-        if len(content) < 10:
-            raise IndexError("Header not complete yet")
-        magic = content[:2]
-        if magic != b'\037\213':
-            raise IOError('Not a gzip header (magic is hex %s, should be 1f8b)' % \
-                binascii.b2a_hex(magic).decode('ascii'))
-        method = ord(content[2:3])
-        if method != 8:
-            raise IOError('Unknown compression method')
-        flag = ord(content[3:4])
-        content_l = list(content[10:])
-        if flag & gz_flags['FEXTRA']:
-            # Read & discard the extra field, if present
-            xlen = content_l.pop(0)
-            xlen = xlen + 256 * content_l.pop(0)
-            content_l = content_l[xlen:]
-        if flag & gz_flags['FNAME']:
-            # Read and discard a null-terminated string
-            # containing the filename
-            while True:
-                st1 = content_l.pop(0)
-                if not content_l or st1 == b'\000':
-                    break
-        if flag & gz_flags['FCOMMENT']:
-            # Read and discard a null-terminated string containing a comment
-            while True:
-                st2 = content_l.pop(0)
-                if not content_l or st2 == b'\000':
-                    break
-        if flag & gz_flags['FHCRC']:
-            content_l = content_l[2:]   # Read & discard the 16-bit header CRC
-        return bytes(content_l)
-
 
 class HttpRequest(HttpMessage):
     """
     A HTTP Request message.
     """
+    __slots__ = ('method', 'uri', 'iri')
+
     def __init__(self, add_note: AddNoteMethodType) -> None:
         HttpMessage.__init__(self, add_note)
         self.is_request = True # type: bool
@@ -273,7 +269,7 @@ class HttpRequest(HttpMessage):
         except (ValueError, UnicodeError) as why:
             self.http_error = thor.http.error.UrlError(why.args[0])
             return
-        if not re.match(r"^\s*%s\s*$" % rfc3986.URI, self.uri, re.VERBOSE):
+        if not URI_SYNTAX.match(self.uri):
             self.add_note('uri', URI_BAD_SYNTAX)
         if '#' in self.uri:
             # chop off the fragment
@@ -303,6 +299,9 @@ class HttpResponse(HttpMessage):
     """
     A HTTP Response message.
     """
+    __slots__ = ('is_head_response', 'status_code', 'status_phrase', 'freshness_lifetime', 'age',
+                 'store_shared', 'store_private')
+
     def __init__(self, add_note: AddNoteMethodType) -> None:
         HttpMessage.__init__(self, add_note)
         self.is_request = False
@@ -367,6 +366,14 @@ class STATUS_PHRASE_ENCODING(Note):
 The status phrase can only contain ASCII characters. REDbot has detected (and possibly removed)
 non-ASCII characters in it."""
 
+class PAYLOAD_TRUNCATED(Note):
+    category = categories.RANGE
+    level = levels.INFO
+    summary = "%(response)s was too large for REDbot to keep all of it."
+    text = """\
+REDbot only keeps the first %(payload_size)s bytes of partial content responses, but %(response)s
+was %(payload_len)s bytes long. Checks that look at its body only use the part that was kept."""
+
 class CL_CORRECT(Note):
     category = categories.GENERAL
     level = levels.GOOD
@@ -417,10 +424,10 @@ the error encountered was "`%(gzip_error)s`"."""
 class BAD_ZLIB(Note):
     category = categories.CONNEG
     level = levels.BAD
-    summary = "%(response)s was compressed using GZip, but the data was corrupt."
+    summary = "%(response)s was compressed using %(coding)s, but the data was corrupt."
     text = """\
-GZip-compressed responses use zlib compression to reduce the number of bytes transferred on the
-wire. However, this response could not be decompressed; the error encountered was
+Compressed responses reduce the number of bytes transferred on the wire. However, this response
+could not be decompressed using the `%(coding)s` content-coding; the error encountered was
 "`%(zlib_error)s`".
 
 %(ok_zlib_len)s bytes were decompressed successfully before this; the erroneous chunk starts with (in hex):
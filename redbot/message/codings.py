@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+"""
+Incremental decoders for HTTP content-codings.
+
+Each decoder has a decode() method that takes a chunk of encoded data and returns whatever it
+decodes to. Use content_decoders to find a decoder class for a content-coding.
+"""
+
+import binascii
+from typing import Any, Dict, Type # pylint: disable=unused-import
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class CodingError(Exception):
+    "The encoded data couldn't be decoded (for decoders that don't raise zlib.error)."
+    pass
+
+
+# gzip header flags (RFC 1952)
+FTEXT = 1
+FHCRC = 2
+FEXTRA = 4
+FNAME = 8
+FCOMMENT = 16
+
+GZIP_HEADER_STAGES = [
+    # (stage, flag that enables it)
+    ('xlen', FEXTRA),
+    ('name', FNAME),
+    ('comment', FCOMMENT),
+    ('hcrc', FHCRC)]
+
+
+class GzipDecoder(object):
+    """
+    Decode a gzip stream (which may contain several members) a chunk at a time.
+
+    The header is parsed as it arrives, however it's split across chunks, so the input is never
+    re-scanned or copied byte-by-byte.
+
+    As with the gzip module, NUL padding after a member is skipped, and anything after that which
+    isn't a gzip header is ignored.
+
+    decode() raises IOError if the first gzip header isn't valid, and zlib.error if the compressed
+    data isn't.
+    """
+    def __init__(self) -> None:
+        self._stage = 'fixed'             # where we are in the current member
+        self._need = 10                   # bytes left to read in a fixed-length stage
+        self._header = bytearray()        # the fixed-length header fields read so far
+        self._flags = 0
+        self._decompressor = None         # type: Any
+        self.members = 0                  # how many members have been started
+
+    def decode(self, chunk: bytes) -> bytes:
+        "Decode a chunk, returning any data it yields."
+        out = []
+        data = chunk
+        view = memoryview(data)
+        pos = 0
+        while pos < len(data):
+            if self._stage == 'done':
+                break
+            elif self._stage == 'padding':
+                while pos < len(data) and data[pos] == 0:
+                    pos += 1
+                if pos < len(data):
+                    self._stage, self._need = 'fixed', 10
+            elif self._stage == 'body':
+                out.append(self._decompressor.decompress(view[pos:]))
+                if not self._decompressor.eof:
+                    break
+                data = self._decompressor.unused_data
+                view = memoryview(data)
+                pos = 0
+                self._decompressor = None
+                self._stage, self._need = 'trailer', 8
+            elif self._stage in ['name', 'comment']:
+                end = data.find(b"\0", pos)
+                if end == -1:
+                    break
+                pos = end + 1
+                self._next_stage()
+            else:
+                taken = min(self._need, len(data) - pos)
+                if self._stage in ['fixed', 'xlen']:
+                    self._header += data[pos:pos + taken]
+                pos += taken
+                self._need -= taken
+                if self._need == 0:
+                    self._next_stage()
+        return b"".join(out)
+
+    def _next_stage(self) -> None:
+        "The current stage is complete; work out what comes next."
+        if self._stage == 'fixed':
+            magic = bytes(self._header[:2])
+            if self.members and (magic != b'\037\213' or self._header[2] != 8):
+                self._stage = 'done' # trailing garbage
+                return
+            if magic != b'\037\213':
+                raise IOError('Not a gzip header (magic is hex %s, should be 1f8b)' % \
+                    binascii.b2a_hex(magic).decode('ascii'))
+            if self._header[2] != 8:
+                raise IOError('Unknown compression method')
+            self._flags = self._header[3]
+            self.members += 1
+        elif self._stage == 'xlen':
+            self._stage, self._need = 'extra', self._header[10] + 256 * self._header[11]
+            if self._need:
+                return
+        elif self._stage == 'trailer':
+            self._stage = 'padding'
+            self._header = bytearray()
+            return
+        stages = [stage for stage, flag in GZIP_HEADER_STAGES]
+        if self._stage in stages:
+            later = GZIP_HEADER_STAGES[stages.index(self._stage) + 1:]
+        elif self._stage == 'extra':
+            later = GZIP_HEADER_STAGES[1:]
+        else:
+            later = GZIP_HEADER_STAGES
+        for stage, flag in later:
+            if self._flags & flag:
+                self._stage, self._need = stage, 2
+                return
+        self._stage = 'body'
+        self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+
+class DeflateDecoder(object):
+    """
+    Decode a deflate stream a chunk at a time.
+
+    The deflate content-coding is supposed to be the zlib format, but some servers send raw deflate
+    data instead; this looks at the start of the stream to tell which.
+
+    decode() raises zlib.error if the data isn't valid.
+    """
+    def __init__(self) -> None:
+        self._decompressor = None  # type: Any
+        self._start = b""
+
+    def decode(self, chunk: bytes) -> bytes:
+        "Decode a chunk, returning any data it yields."
+        if self._decompressor is None:
+            self._start += chunk
+            if len(self._start) < 2:
+                return b""
+            cmf, flg = self._start[0], self._start[1]
+            if cmf & 0x0f == 8 and (cmf * 256 + flg) % 31 == 0:
+                self._decompressor = zlib.decompressobj()
+            else:
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            chunk, self._start = self._start, b""
+        return self._decompressor.decompress(chunk)
+
+
+class BrotliDecoder(object):
+    """
+    Decode a brotli stream a chunk at a time. Only available if the brotli module is installed.
+
+    decode() raises CodingError if the data isn't valid.
+    """
+    def __init__(self) -> None:
+        self._decompressor = brotli.Decompressor()
+
+    def decode(self, chunk: bytes) -> bytes:
+        "Decode a chunk, returning any data it yields."
+        try:
+            return self._decompressor.process(chunk)
+        except brotli.error as why:
+            raise CodingError(str(why))
+
+
+content_decoders = {
+    'gzip': GzipDecoder,
+    'x-gzip': GzipDecoder,
+    'deflate': DeflateDecoder,
+} # type: Dict[str, Type]
+if brotli is not None:
+    content_decoders['br'] = BrotliDecoder
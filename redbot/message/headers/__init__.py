@@ -8,14 +8,17 @@ process_headers() will process a list of (key, val) tuples.
 
 from copy import copy
 from functools import partial
+import os
+import pkgutil
 import re
 import sys
-from typing import Any, Callable, List, Tuple, Type, Union, TYPE_CHECKING
+from typing import Any, Callable, Dict, List, Pattern, Set, Tuple, Type, Union, TYPE_CHECKING
 import unittest
 
 from redbot.syntax import rfc7230, rfc7231
 from redbot.formatter import f_num
-from redbot.type import StrHeaderListType, RawHeaderListType, HeaderDictType, AddNoteMethodType
+from redbot.type import StrHeaderListType, RawHeaderListType, HeaderDictType, AddNoteMethodType, \
+    SlottedType
 
 from ._utils import RE_FLAGS, parse_date, unquote_string, split_string, parse_params
 from ._notes import *
@@ -31,10 +34,21 @@ rfc6266 = "http://tools.ietf.org/html/rfc6266.html#section-4"
 ### configuration
 MAX_HDR_SIZE = 4 * 1024
 MAX_TTL_HDR = 8 * 1000
+MAX_HANDLER_CACHE = 1000 # unknown field names aren't cached beyond this many entries
 
+FIELD_NAME = re.compile(r"^%s$" % rfc7230.token, RE_FLAGS)
+LIST_SPLIT = re.compile(r'((?:[^",]|%s)+)(?=%s|\s*$)' % (
+    rfc7230.quoted_string, r"(?:\s*(?:,\s*)+)"), RE_FLAGS)
 
-class HttpHeader(object):
-    """A HTTP Header handler."""
+
+class HttpHeader(object, metaclass=SlottedType):
+    """
+    A HTTP Header handler.
+
+    One is made for each field in each message, so they're slotted; subclasses shouldn't add
+    instance attributes.
+    """
+    __slots__ = ('wire_name', 'message', 'norm_name', 'field_name', 'value')
     canonical_name = None # type: str
     description = None # type: str
     reference = None # type: str
@@ -45,15 +59,27 @@ class HttpHeader(object):
     valid_in_requests = None # type: bool
     valid_in_responses = None # type: bool
     no_coverage = False  # type: bool                   # Turns off coverage checks.
+    _syntax_re = None # type: Pattern                   # see compiled_syntax()
 
     def __init__(self, wire_name: str, message: 'HttpMessage') -> None:
         self.wire_name = wire_name.strip()
         self.message = message
         self.norm_name = self.wire_name.lower()
-        if self.canonical_name is None:
-            self.canonical_name = self.wire_name
+        self.field_name = self.canonical_name or self.wire_name # what to call it in notes
         self.value = [] # type: Any
 
+    @classmethod
+    def compiled_syntax(cls) -> Pattern:
+        """
+        Return the compiled regex for a single field value, compiling it the first time
+        it's asked for and caching it on the class.
+        """
+        if '_syntax_re' not in cls.__dict__:
+            element_syntax = isinstance(cls.syntax, rfc7230.list_rule) \
+              and cls.syntax.element or cls.syntax
+            cls._syntax_re = re.compile(r"^\s*(?:%s)\s*$" % element_syntax, RE_FLAGS)
+        return cls._syntax_re
+
     def parse(self, field_value: str, add_note: AddNoteMethodType) -> Any:
         """
         Given a string value and an add_note function, parse and return the result."""
@@ -79,9 +105,7 @@ class HttpHeader(object):
         for value in values:
           # check field value syntax
             if self.syntax:
-                element_syntax = isinstance(self.syntax, rfc7230.list_rule) \
-                  and self.syntax.element or self.syntax
-                if not re.match(r"^\s*(?:%s)\s*$" % element_syntax, value, RE_FLAGS):
+                if not self.compiled_syntax().match(value):
                     add_note(BAD_SYNTAX, ref_uri=self.reference)
             try:
                 parsed_value = self.parse(value.strip(), add_note)
@@ -92,12 +116,7 @@ class HttpHeader(object):
     @staticmethod
     def split_list_header(field_value: str) -> List[str]:
         "Split a header field value on commas. needs to conform to the #rule."
-        return [f.strip() for f in
-                re.findall(r'((?:[^",]|%s)+)(?=%s|\s*$)' % (
-                    rfc7230.quoted_string,
-                    r"(?:\s*(?:,\s*)+)"
-                ), field_value, RE_FLAGS)
-                if f] or []
+        return [f.strip() for f in LIST_SPLIT.findall(field_value) if f] or []
 
     def finish(self, message: 'HttpMessage', add_note: AddNoteMethodType) -> None:
         """
@@ -105,7 +124,7 @@ class HttpHeader(object):
         """
 
         # check field name syntax
-        if not re.match("^%s$" % rfc7230.token, self.wire_name, RE_FLAGS):
+        if not FIELD_NAME.match(self.wire_name):
             add_note(FIELD_NAME_BAD_SYNTAX)
         if self.deprecated:
             deprecation_ref = getattr(self, 'deprecation_ref', self.reference)
@@ -157,6 +176,10 @@ class HeaderProcessor(object):
         'x_cnection': 'connectiox',
         '_onnection': 'connectiox',
     }
+    # names of the modules in this package; see header_modules()
+    _header_modules = None # type: Set[str]
+    # lower-cased field name -> handler class, or None for unknown headers
+    _handlers = {} # type: Dict[str, Union[Type[HttpHeader], None]]
 
     def __init__(self, message: 'HttpMessage') -> None:
         self.message = message
@@ -205,18 +228,18 @@ class HeaderProcessor(object):
 
             header_handler = self.get_header_handler(str_name)
             field_add_note = partial(add_note, # type: ignore
-                                     field_name=header_handler.canonical_name)
+                                     field_name=header_handler.field_name)
             header_handler.handle_input(str_value, field_add_note)
 
             if header_size > MAX_HDR_SIZE:
-                add_note(HEADER_TOO_LARGE, field_name=header_handler.canonical_name,
+                add_note(HEADER_TOO_LARGE, field_name=header_handler.field_name,
                          header_size=f_num(header_size))
 
         # check each of the complete header values and get the parsed value
         for header_name, header_handler in list(self._header_handlers.items()):
             header_add_note = partial(self.message.add_note,
-                                      "header-%s" % header_handler.canonical_name,
-                                      field_name=header_handler.canonical_name)
+                                      "header-%s" % header_handler.field_name,
+                                      field_name=header_handler.field_name)
             header_handler.finish(self.message, header_add_note) # type: ignore
             parsed_headers[header_handler.norm_name] = header_handler.value
 
@@ -242,13 +265,25 @@ class HeaderProcessor(object):
 
         If default is true, return a dummy if one isn't found; otherwise, None.
         """
+        norm_name = header_name.lower()
+        try:
+            handler = HeaderProcessor._handlers[norm_name]
+        except KeyError:
+            handler = HeaderProcessor._load_header_handler(norm_name)
+            if handler is not None or len(HeaderProcessor._handlers) < MAX_HANDLER_CACHE:
+                HeaderProcessor._handlers[norm_name] = handler
+        if handler is None and default:
+            return UnknownHttpHeader
+        return handler
 
+    @staticmethod
+    def _load_header_handler(header_name: str) -> Union[Type[HttpHeader], None]:
+        """
+        Find the handler class for header_name, importing its module if necessary.
+        """
         name_token = HeaderProcessor.name_token(header_name)
         hdr_module = HeaderProcessor.find_header_module(name_token)
-        if hdr_module and hasattr(hdr_module, name_token):
-            return getattr(hdr_module, name_token)
-        if default:
-            return UnknownHttpHeader
+        return getattr(hdr_module, name_token, None)
 
     @staticmethod
     def find_header_module(header_name: str) -> Any:
@@ -256,10 +291,12 @@ class HeaderProcessor(object):
         Return a module for the given field name, or None if it can't be found.
         """
         name_token = HeaderProcessor.name_token(header_name)
-        if name_token[0] == '_':  # these are special
+        if name_token.startswith('_'):  # these are special
             return
         if name_token in HeaderProcessor.header_aliases:
             name_token = HeaderProcessor.header_aliases[name_token]
+        if name_token not in HeaderProcessor.header_modules():
+            return
         try:
             module_name = "redbot.message.headers.%s" % name_token
             __import__(module_name)
@@ -267,6 +304,17 @@ class HeaderProcessor(object):
         except (ImportError, KeyError, TypeError):
             return
 
+    @staticmethod
+    def header_modules() -> Set[str]:
+        """
+        Return the names of the header handler modules in this package, without importing them.
+        """
+        if HeaderProcessor._header_modules is None:
+            HeaderProcessor._header_modules = set([
+                name for (finder, name, is_pkg) in pkgutil.iter_modules([os.path.dirname(__file__)])
+                if not name.startswith('_')])
+        return HeaderProcessor._header_modules
+
     @staticmethod
     def name_token(header_name: str) -> str:
         """
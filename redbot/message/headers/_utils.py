@@ -2,7 +2,7 @@
 import calendar
 from email.utils import parsedate as lib_parsedate
 import re
-from typing import Callable, Dict, List, Tuple, Union # pylint: disable=unused-import
+from typing import Callable, Dict, List, Pattern, Tuple, Union # pylint: disable=unused-import
 from urllib.parse import unquote as urlunquote
 
 from redbot.syntax import rfc7231
@@ -13,12 +13,17 @@ from ._notes import PARAM_REPEATS, PARAM_SINGLE_QUOTED, PARAM_STAR_BAD, PARAM_ST
 
 RE_FLAGS = re.VERBOSE | re.IGNORECASE
 
+HTTP_DATE = re.compile(r"^%s$" % rfc7231.HTTP_date, RE_FLAGS)
+OBS_DATE = re.compile(r"^%s$" % rfc7231.obs_date, RE_FLAGS)
+QUOTED_PAIR = re.compile(r'\\(.)')
+_split_res = {} # type: Dict[Tuple[str, str], Pattern]  # compiled split_string() patterns
+
 def parse_date(value: str, add_note: AddNoteMethodType) -> int:
     """Parse a HTTP date. Raises ValueError if it's bad."""
-    if not re.match(r"^%s$" % rfc7231.HTTP_date, value, RE_FLAGS):
+    if not HTTP_DATE.match(value):
         add_note(BAD_DATE_SYNTAX)
         raise ValueError
-    if re.match(r"^%s$" % rfc7231.obs_date, value, RE_FLAGS):
+    if OBS_DATE.match(value):
         add_note(DATE_OBSOLETE)
     date_tuple = lib_parsedate(value)
     if date_tuple is None:
@@ -45,7 +50,7 @@ def unquote_string(instr: str) -> str:
         return instr
     if instr[0] == instr[-1] == '"':
         ninstr = instr[1:-1]
-        instr = re.sub(r'\\(.)', r'\1', ninstr)
+        instr = QUOTED_PAIR.sub(r'\1', ninstr)
     return instr
 
 def split_string(instr: str, item: str, split: str) -> List[str]:
@@ -59,9 +64,12 @@ def split_string(instr: str, item: str, split: str) -> List[str]:
     """
     if not instr:
         return []
-    return [h.strip() for h in re.findall(
-        r'%s(?=%s|\s*$)' % (item, split), instr, re.VERBOSE
-    )]
+    try:
+        split_re = _split_res[(item, split)]
+    except KeyError:
+        split_re = re.compile(r'%s(?=%s|\s*$)' % (item, split), re.VERBOSE)
+        _split_res[(item, split)] = split_re
+    return [h.strip() for h in split_re.findall(instr)]
 
 def parse_params(instr: str, add_note: AddNoteMethodType, nostar: Union[List[str], bool]=None,
                  delim: str=";") -> Dict[str, str]:
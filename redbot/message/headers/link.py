@@ -8,6 +8,7 @@ from redbot.speak import Note, categories, levels
 from redbot.syntax import rfc3986, rfc5988
 from redbot.type import AddNoteMethodType, ParamDictType
 
+URI_REFERENCE = re.compile(r"^\s*%s\s*$" % rfc3986.URI_reference, re.VERBOSE)
 
 class link(headers.HttpHeader):
     canonical_name = "Link"
@@ -35,8 +36,7 @@ statement of the form "[context IRI] has a [relation type] resource at [target I
         if 'rev' in param_dict:
             add_note(LINK_REV, link=link_value, rev=param_dict['rev'])
         if 'anchor' in param_dict: # URI-Reference
-            if not re.match(r"^\s*%s\s*$" % rfc3986.URI_reference,
-                            param_dict['anchor'], re.VERBOSE):
+            if not URI_REFERENCE.match(param_dict['anchor']):
                 add_note(LINK_BAD_ANCHOR, link=link_value, anchor=param_dict['anchor'])
         # TODO: check media-type in 'type'
         # TODO: check language tag in 'hreflang'
@@ -8,6 +8,7 @@ from redbot.speak import Note, categories, levels
 from redbot.syntax import rfc7231, rfc3986
 from redbot.type import AddNoteMethodType
 
+ABSOLUTE_URI = re.compile(r"^\s*%s\s*$" % rfc3986.URI, re.VERBOSE)
 
 class location(headers.HttpHeader):
     canonical_name = "Location"
@@ -26,7 +27,7 @@ In `201 Created` responses, it identifies a newly created resource."""
     def parse(self, field_value: str, add_note: AddNoteMethodType) -> str:
         if self.message.status_code not in ["201", "300", "301", "302", "303", "305", "307", "308"]:
             add_note(LOCATION_UNDEFINED)
-        if not re.match(r"^\s*%s\s*$" % rfc3986.URI, field_value, re.VERBOSE):
+        if not ABSOLUTE_URI.match(field_value):
             add_note(LOCATION_NOT_ABSOLUTE, full_uri=urljoin(self.message.base_uri, field_value))
         return field_value
 
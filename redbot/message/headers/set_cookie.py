@@ -2,15 +2,18 @@
 
 
 from calendar import timegm
-from re import match, split
+from functools import lru_cache
+import re
 from urllib.parse import urlsplit
-from typing import List, Tuple, Union
+from typing import Any, Callable, List, Tuple, Type, Union
 
 from redbot.message import headers
 from redbot.speak import Note, categories, levels
 from redbot.type import AddNoteMethodType
 
 CookieType = Tuple[str, str, List[Tuple[str, Union[str, int]]]]
+# as CookieType, but immutable, so that it can be cached
+CachedCookieType = Tuple[str, str, Tuple[Tuple[str, Union[str, int]], ...]]
 
 
 class set_cookie(headers.HttpHeader):
@@ -36,17 +39,55 @@ requests to the server."""
         return set_cookie_value
 
 
+# How many parsed Set-Cookie values to keep around.
+SET_COOKIE_CACHE_SIZE = 1024
+
 # TODO: properly escape notes
 def loose_parse(set_cookie_string: str, uri_path: str, current_time: float,
                 add_note: AddNoteMethodType) -> CookieType:
     """
     Parse a Set-Cookie string, as per RFC6265, Section 5.2.
+
+    The same cookies turn up on response after response (e.g., every subrequest and linked
+    resource), so results -- and the notes that they cause -- are kept in an LRU cache; see
+    _cached_parse.
     """
-    name = "Set-Cookie"
-    if ';' in set_cookie_string:
-        name_value_pair, unparsed_attributes = set_cookie_string.split(";", 1)
-    else:
-        name_value_pair, unparsed_attributes = set_cookie_string, ""
+    cookie, error, notes = _cached_parse(set_cookie_string, uri_path)
+    for note, vrs in notes:
+        add_note(note, **dict(vrs))
+    if cookie is None:
+        raise ValueError(error)
+    return (cookie[0], cookie[1], list(cookie[2]))
+
+
+NoteListType = Tuple[Tuple[Type[Note], Tuple[Tuple[str, Any], ...]], ...]
+
+@lru_cache(maxsize=SET_COOKIE_CACHE_SIZE)
+def _cached_parse(set_cookie_string: str,
+                  uri_path: str) -> Tuple[Union[CachedCookieType, None], str, NoteListType]:
+    """
+    Parse a Set-Cookie string, returning the cookie (or None), an error message if it couldn't be
+    parsed, and the notes found as (class, vars) pairs.
+    """
+    notes = [] # type: List[Tuple[Type[Note], Tuple[Tuple[str, Any], ...]]]
+    def add_note(note: Type[Note], **kw: Any) -> None:
+        notes.append((note, tuple(sorted(kw.items()))))
+    try:
+        cookie = _parse(set_cookie_string, uri_path, add_note)
+    except ValueError as why:
+        return None, str(why), tuple(notes)
+    return cookie, "", tuple(notes)
+
+
+def _parse(set_cookie_string: str, uri_path: str,
+           add_note: Callable[..., None]) -> CachedCookieType:
+    "Parse a Set-Cookie string; see loose_parse."
+    # splitting on ";" once is the same as splitting it off the front repeatedly, except that
+    # RFC6265 stops when nothing is left, so a trailing empty attribute is dropped.
+    parts = set_cookie_string.split(";")
+    name_value_pair, cookie_avs = parts[0], parts[1:]
+    if cookie_avs and cookie_avs[-1] == "":
+        cookie_avs.pop()
     try:
         name, value = name_value_pair.split("=", 1)
     except ValueError:
@@ -58,15 +99,8 @@ def loose_parse(set_cookie_string: str, uri_path: str, current_time: float,
         raise ValueError("Cookie doesn't have a name")
     cookie_name, cookie_value = name, value
     cookie_attribute_list = [] # type: List[Tuple[str, Union[str, int]]]
-    while unparsed_attributes != "":
-        if ";" in unparsed_attributes:
-            cookie_av, unparsed_attributes = unparsed_attributes.split(";", 1)
-        else:
-            cookie_av, unparsed_attributes = unparsed_attributes, ""
-        if "=" in cookie_av:
-            attribute_name, attribute_value = cookie_av.split("=", 1)
-        else:
-            attribute_name, attribute_value = cookie_av, ""
+    for cookie_av in cookie_avs:
+        attribute_name, _, attribute_value = cookie_av.partition("=")
         attribute_name = attribute_name.strip()
         attribute_value = attribute_value.strip()
         case_norm_attribute_name = attribute_name.lower()
@@ -100,13 +134,7 @@ def loose_parse(set_cookie_string: str, uri_path: str, current_time: float,
             cookie_attribute_list.append(("Domain", cookie_domain))
         elif case_norm_attribute_name == "path":
             if attribute_value == "" or attribute_value[0] != "/":
-                # use default path
-                if uri_path == "" or uri_path[0] != "/":
-                    cookie_path = "/"
-                if uri_path.count("/") < 2:
-                    cookie_path = "/"
-                else:
-                    cookie_path = uri_path[:uri_path.rindex("/")]
+                cookie_path = default_path(uri_path)
             else:
                 cookie_path = attribute_value
             cookie_attribute_list.append(("Path", cookie_path))
@@ -118,11 +146,20 @@ def loose_parse(set_cookie_string: str, uri_path: str, current_time: float,
             add_note(SET_COOKIE_UNKNOWN_ATTRIBUTE,
                      cookie_name=cookie_name,
                      attribute=attribute_name)
-    return (cookie_name, cookie_value, cookie_attribute_list)
+    return (cookie_name, cookie_value, tuple(cookie_attribute_list))
+
+
+def default_path(uri_path: str) -> str:
+    "Return the default cookie path for a request URI path, as per RFC6265, Section 5.1.4."
+    if uri_path == "" or uri_path[0] != "/" or uri_path.count("/") < 2:
+        return "/"
+    return uri_path[:uri_path.rindex("/")]
 
 
-DELIMITER = r'(?:[\x09\x20-\x2F\x3B-\x40\x5B-\x60\x7B-\x7E])'
-NON_DELIMITER = r'(?:[\x00-\x08\x0A-\x1F0-0\:a-zA-Z\x7F-\xFF])'
+DELIMITER = re.compile(r'(?:[\x09\x20-\x2F\x3B-\x40\x5B-\x60\x7B-\x7E])')
+DATE_TIME = re.compile(r'^(\d{2}):(\d{2}):(\d{2})(?:\D)?')
+DATE_DAY_OF_MONTH = re.compile(r'^(\d\d?)(?:\D)?')
+DATE_YEAR = re.compile(r'^(\d{2,4})(?:\D)?')
 MONTHS = {
     'jan': 1,
     'feb': 2,
@@ -144,29 +181,26 @@ def loose_date_parse(cookie_date: str) -> int:
     found_time = found_day_of_month = found_month = found_year = False
     hour_value = minute_value = second_value = None
     day_of_month_value = month_value = year_value = None
-    date_tokens = split(DELIMITER, cookie_date)
-    for date_token in date_tokens:
+    for date_token in DELIMITER.split(cookie_date):
         re_match = None
         if not found_time:
-            re_match = match(r'^(\d{2}:\d{2}:\d{2})(?:\D)?', date_token)
+            re_match = DATE_TIME.match(date_token)
             if re_match:
                 found_time = True
-                hour_value, minute_value, second_value = [
-                    int(v) for v in re_match.group(1).split(":")
-                ]
+                hour_value, minute_value, second_value = [int(v) for v in re_match.groups()]
                 continue
         if not found_day_of_month:
-            re_match = match(r'^(\d\d?)(?:\D)?', date_token)
+            re_match = DATE_DAY_OF_MONTH.match(date_token)
             if re_match:
                 found_day_of_month = True
                 day_of_month_value = int(re_match.group(1))
                 continue
-        if not found_month and date_token[:3].lower() in list(MONTHS.keys()):
+        if not found_month and date_token[:3].lower() in MONTHS:
             found_month = True
             month_value = MONTHS[date_token[:3].lower()]
             continue
         if not found_year:
-            re_match = match(r'^(\d{2,4})(?:\D)?', date_token)
+            re_match = DATE_YEAR.match(date_token)
             if re_match:
                 found_year = True
                 year_value = int(re_match.group(1))
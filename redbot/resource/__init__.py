@@ -11,14 +11,17 @@ See webui.py for the Web front-end.
 """
 
 import sys
-from typing import Set, Tuple, Union
+from typing import Iterator, Set, Tuple, Union
 from urllib.parse import urljoin
 
 import thor
 
 from redbot.formatter import f_num
 from redbot.message import link_parse
-from redbot.resource.fetch import RedFetcher
+from redbot.resource.cookie_jar import CookieJar
+from redbot.resource.crawl import CrawlScheduler
+from redbot.resource.fetch import FetchLimits, RedFetcher
+from redbot.resource.timing import CheckProfiler
 from redbot.resource.active_check import active_checks
 
 
@@ -31,44 +34,123 @@ class HttpResource(RedFetcher):
     After processing the response-specific attributes of RedFetcher will be populated, as well as
     its notes; see that class for details.
 
-    if descend is true, the response will be parsed for links and HttpResources started for each
-    link, enumerated in .linked.
+    if descend is true, the response will be parsed for links, and HttpResources checked for them
+    (as scheduled by .crawler), enumerated in .linked.
 
-    Emits "check_done" when everything has finished.
+    Emits "linked_done" with each linked HttpResource and its tag as it finishes,
+    "own_checks_done" once the resource itself and its active checks are finished (linked
+    resources may still be running), and "check_done" when everything has finished.
+
+    Each fetch -- the resource itself, its subrequests and its linked resources -- gets a copy of
+    .limits, and they all draw on the same .budget.
+
+    If send_cookies is true, the cookies that the response sets are kept in .cookie_jar, and sent
+    by subrequests and linked resources.
+
+    As well as the phases of its own fetch, .timing records the whole "check", each active check
+    (e.g., "active:Partial Content") from start to finish, and "link_parse". If profile is true,
+    the check is run under cProfile; see .profiler.
+
+    If .replay is set (see redbot.resource.replay), subrequests and linked resources use it too.
     """
     check_name = "default"
     response_phrase = "This response"
+    send_cookies = False
+    profile = False
 
     def __init__(self, descend: bool=False) -> None:
         RedFetcher.__init__(self)
+        self.budget = FetchLimits()  # type: FetchLimits
+        if self.send_cookies:
+            self.cookie_jar = CookieJar()
         self.descend = descend       # type: bool
         self.check_done = False      # type: bool
+        self.own_checks_done = False # type: bool
         self.partial_support = None  # type: bool
         self.inm_support = None      # type: bool
         self.ims_support = None      # type: bool
         self.gzip_support = None     # type: bool
         self.gzip_savings = 0        # type: int
+        self.coding_support = {}     # type: Dict[str, bool]  # by content-coding
+        self.coding_savings = {}     # type: Dict[str, int]   # percent saved, by content-coding
         self._task_map = set([None]) # type: Set[RedFetcher]   # None is the original request
         self.subreqs = {ac.check_name:ac(self) for ac in active_checks}  # type: ignore
+        self.response.once("headers_available", self.run_early_checks)
         self.response.once("content_available", self.run_active_checks)
         def finish_check() -> None:
+            if self.response.http_error is not None or not self.response.complete:
+                for active_check in self.subreqs.values():
+                    active_check.abandon()
             self.finish_check(None)
         self.on("fetch_done", finish_check)
         self.links = {}              # type: Dict[str, Set[str]]
         self.link_count = 0          # type: int
         self.linked = []             # type: List[Tuple[HttpResource, str]]  # linked HttpResources
+        self.crawler = None          # type: CrawlScheduler
+        self.crawl_depth = 0         # type: int   # how many links from the top resource
+        self.profiler = None         # type: CheckProfiler
         self._link_parser = link_parse.HTMLLinkParser(self.response, [self.process_link])
-        self.response.on("chunk", self._link_parser.feed)
+        self.response.on("chunk", self._parse_links)
 #        self.show_task_map(True) # for debugging
 
+    def check(self) -> None:
+        self.timing.start("check")
+        if self.profile and self.crawl_depth == 0:
+            self.profiler = CheckProfiler()
+        RedFetcher.check(self)
+
+    def _parse_links(self, chunk: bytes) -> None:
+        with self.timing.phase("link_parse"):
+            self._link_parser.feed(chunk)
+
+    def run_early_checks(self) -> None:
+        """
+        Response headers are available; start the subordinate requests that don't need the body
+        (e.g., conneg check), so that they run alongside it.
+        """
+        if self.cookie_jar is not None and self.crawl_depth == 0:
+            self.cookie_jar.set_cookies(self.request.uri,
+                                        self.response.parsed_headers.get('set-cookie', []))
+        for active_check in list(self.subreqs.values()):
+            if not active_check.needs_body:
+                self._start_active_check(active_check)
+
     def run_active_checks(self) -> None:
         """
-        Response is available; perform subordinate requests (e.g., conneg check).
+        Response is available; perform the remaining subordinate requests (e.g., range check).
         """
         if self.response.complete:
             for active_check in list(self.subreqs.values()):
-                self.add_check(active_check)
-                active_check.check()
+                if active_check.needs_body:
+                    self._start_active_check(active_check)
+
+    def _start_active_check(self, active_check: RedFetcher) -> None:
+        self.timing.start("active:%s" % active_check.check_name)
+        self.add_check(active_check)
+        active_check.check()
+
+    def fetchers(self) -> Iterator[RedFetcher]:
+        "Iterate over this resource, its subrequests and its linked resources."
+        yield self
+        for subreq in self.subreqs.values():
+            yield subreq
+        for linked, tag in self.linked:
+            yield from linked.fetchers()
+
+    @property
+    def request_count(self) -> int:
+        "How many requests this check made (including subrequests and linked resources)."
+        return len([f for f in self.fetchers() if f.fetch_started])
+
+    @property
+    def pool_hits(self) -> int:
+        "How many of this check's fetches reused a pooled connection."
+        return len([f for f in self.fetchers() if f.conn_reused is True])
+
+    @property
+    def pool_misses(self) -> int:
+        "How many of this check's fetches needed a new connection."
+        return len([f for f in self.fetchers() if f.conn_reused is False])
 
     def add_check(self, *resources: RedFetcher) -> None:
         "Remember a subordinate check on one or more HttpResource instance."
@@ -87,12 +169,27 @@ class HttpResource(RedFetcher):
             self._task_map.remove(resource)
         except KeyError:
             raise KeyError("* Can't find %s in task map: %s" % (resource, self._task_map))
+        if resource in self.subreqs.values():
+            self.timing.end("active:%s" % resource.check_name)
+        if not self.own_checks_done and \
+          self._task_map.isdisjoint([None] + list(self.subreqs.values())):
+            self.own_checks_done = True
+            self.emit('own_checks_done')
         tasks_left = len(self._task_map)
 #        self.emit("status", u"Checks remaining: %i" % tasks_left)
         if tasks_left == 0:
+            self.timing.end("check")
+            if self.profiler is not None:
+                self.profiler.stop()
             self.check_done = True
             self.emit('check_done')
 
+    def _watch_linked(self, linked: 'HttpResource', tag: str) -> None:
+        "Tell listeners about a linked resource when it finishes."
+        @thor.events.on(linked)
+        def check_done() -> None:
+            self.emit('linked_done', linked, tag)
+
     def show_task_map(self, watch: bool=False) -> Union[str, None]:
         """
         Show the task map for debugging.
@@ -109,11 +206,29 @@ class HttpResource(RedFetcher):
         if tag not in self.links:
             self.links[tag] = set()
         if self.descend and tag not in ['a'] and link not in self.links[tag]:
-            linked = HttpResource()
-            linked.set_request(urljoin(base, link), req_hdrs=self.request.headers)
-            self.linked.append((linked, tag))
-            self.add_check(linked)
-            linked.check()
+            if self.crawler is None:
+                self.crawler = CrawlScheduler(self)
+            self.crawler.add_link(self, urljoin(base, link), tag)
         self.links[tag].add(link)
         if not self.response.base_uri:
             self.response.base_uri = base
+
+    def add_linked(self, uri: str, tag: str, referer: 'HttpResource') -> 'HttpResource':
+        """
+        Add an HttpResource for a link to uri that was found in referer's tag, to be checked as part
+        of this one. It's up to the caller to start it.
+        """
+        linked = HttpResource()
+        req_hdrs = referer.request.headers
+        if referer.jar_cookie_sent:
+            # it'll get its own from the jar
+            req_hdrs = [(name, value) for (name, value) in req_hdrs if name.lower() != 'cookie']
+        linked.set_request(uri, req_hdrs=req_hdrs)
+        linked.limits = self.limits.copy()
+        linked.budget = self.budget
+        linked.cookie_jar = self.cookie_jar
+        linked.replay = self.replay
+        self.linked.append((linked, tag))
+        self._watch_linked(linked, tag)
+        self.add_check(linked)
+        return linked
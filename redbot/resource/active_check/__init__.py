@@ -6,9 +6,11 @@ and validation.
 """
 
 
-from redbot.resource.active_check.conneg import ConnegCheck
+from redbot.resource.active_check.conneg import ConnegCheck, BrotliConnegCheck, \
+  DeflateConnegCheck
 from redbot.resource.active_check.range import RangeRequest
 from redbot.resource.active_check.etag_validate import ETagValidate
 from redbot.resource.active_check.lm_validate import LmValidate
 
-active_checks = [ConnegCheck, RangeRequest, ETagValidate, LmValidate]
+active_checks = [ConnegCheck, BrotliConnegCheck, DeflateConnegCheck, RangeRequest, ETagValidate,
+                 LmValidate]
@@ -12,6 +12,7 @@ from typing import List, Tuple, Type, Union, TYPE_CHECKING
 
 from redbot.resource.fetch import RedFetcher
 from redbot.speak import Note, levels, categories
+from redbot.type import RawHeaderListType
 if TYPE_CHECKING:
     from redbot.resource import HttpResource # pylint: disable=cyclic-import,unused-import
 
@@ -23,14 +24,27 @@ class SubRequest(RedFetcher, metaclass=ABCMeta):
     """
     Base class for a subrequest of a "main" HttpResource, made to perform
     additional behavioural tests on the resource.
+
+    Unless needs_body is set, the subrequest is started as soon as the base response's headers
+    are available. Either way, done() isn't called until the base response is finished; its work
+    is timed as the "analysis" phase. If the base fetch ends without a complete response, the
+    subrequest is abandoned.
+
+    If body_needed() says that done() can do without the response body, the rest of the response
+    isn't downloaded (unless it's smaller than skip_body_size, when it's cheaper to read it and
+    keep the connection); body_skipped is set.
     """
     check_name = "undefined"
     response_phrase = "undefined"
+    needs_body = False  # Does the request depend on the base response body?
+    skip_body_size = 64 * 1024
 
     def __init__(self, base_resource: 'HttpResource') -> None:
         self.base = base_resource  # type: HttpResource
         RedFetcher.__init__(self)
         self.check_done = False
+        self.abandoned = False
+        self.body_skipped = False
         self.on('fetch_done', self._check_done)
 
     @abstractmethod
@@ -38,16 +52,80 @@ class SubRequest(RedFetcher, metaclass=ABCMeta):
         """The subrequest is done, process it. Must be overridden."""
         raise NotImplementedError
 
+    def body_needed(self) -> bool:
+        """
+        Called when the response headers are available. Override to return False if done() won't
+        need the response body.
+        """
+        return True
+
+    def same_representation(self) -> bool:
+        """
+        Does the response have the same status and strong ETag as the base response? If so, its
+        body is the same as the base response's.
+        """
+        etag = self.response.parsed_headers.get('etag', None)
+        return self.response.status_code == self.base.response.status_code \
+          and etag is not None and not etag[0] \
+          and etag == self.base.response.parsed_headers.get('etag', None)
+
+    def _response_start(self, status: bytes, phrase: bytes,
+                        res_headers: RawHeaderListType) -> None:
+        RedFetcher._response_start(self, status, phrase, res_headers)
+        if self.fetch_done or self.response.is_head_response or self.body_needed():
+            return
+        length = self.response.parsed_headers.get('content-length', None)
+        if length is not None and length < self.skip_body_size:
+            return
+        self.emit("status", "skipped body of %s (%s)" % (self.request.uri, self.check_name))
+        self.body_skipped = True
+        self._stop_exchange()
+        self.response.payload_recorded = False
+        self.response.body_done(True)
+        self._fetch_done()
+
     def _check_done(self) -> None:
-        if self.preflight():
-            self.done()
+        if self.check_done:
+            return
+        if not self.abandoned and not self.base.fetch_done:
+            # we started early; done() needs the whole base response. If the base fetch ends
+            # without one, it abandons us.
+            self.base.on('fetch_done', self._check_done)
+            return
+        if not self.abandoned and self.preflight():
+            with self.timing.phase("analysis"):
+                self.done()
         self.check_done = True
         self.emit("check_done")
 
+    def abandon(self) -> None:
+        "The base response couldn't be fetched, so this check is no use; stop it."
+        self.abandoned = True
+        if self.fetch_started and not self.fetch_done:
+            self._stop_exchange()
+            self._fetch_done()
+        elif self.fetch_done:
+            self._check_done()
+
+    def not_recorded(self) -> None:
+        "When replaying, skip checks that weren't recorded."
+        self.abandoned = True
+        self._fetch_done()
+
+    def run_continue(self, allowed: bool) -> None:
+        if self.abandoned:
+            self._fetch_done()
+            return
+        RedFetcher.run_continue(self, allowed)
+
     def check(self) -> None:
         modified_headers = self.modify_request_headers(list(self.base.request.headers))
         RedFetcher.set_request(self, self.base.request.uri, self.base.request.method,
                                modified_headers, self.base.request.payload)
+        self.limits = self.base.limits.copy()
+        self.budget = self.base.budget
+        self.cookie_jar = self.base.cookie_jar
+        self.replay = self.base.replay
         RedFetcher.check(self)
 
     @abstractmethod
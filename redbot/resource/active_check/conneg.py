@@ -7,6 +7,7 @@ Subrequest for content negotiation checks.
 
 from redbot.resource.active_check.base import SubRequest
 from redbot.formatter import f_num
+from redbot.message import HttpResponse
 from redbot.speak import Note, categories, levels
 from redbot.type import StrHeaderListType
 
@@ -14,13 +15,21 @@ from redbot.type import StrHeaderListType
 class ConnegCheck(SubRequest):
     """
     See if content negotiation for compression is supported, and how.
+
+    This checks gzip. Subclasses check other content-codings; they set compare_responses to False
+    to only record whether the coding is supported and how much it saves, since the other aspects
+    of negotiation (status, headers, Vary, ETag, body) are the same no matter which coding is
+    asked for.
     """
     check_name = "Content Negotiation"
     response_phrase = "The compressed response"
+    coding = 'gzip'
+    coding_aliases = ['gzip', 'x-gzip']
+    compare_responses = True
 
     def modify_request_headers(self, base_headers: StrHeaderListType) -> StrHeaderListType:
         return [h for h in base_headers if h[0].lower() != 'accept-encoding'] \
-            + [('accept-encoding', 'gzip')]
+            + [('accept-encoding', self.coding)]
 
     def preflight(self) -> bool:
         if 'accept-encoding' in [k.lower() for (k, v) in self.base.request.headers]:
@@ -29,6 +38,11 @@ class ConnegCheck(SubRequest):
             return False
         return True
 
+    def body_needed(self) -> bool:
+        # Only compressed responses are compared with the base response.
+        codings = self.response.parsed_headers.get('content-encoding', [])
+        return bool([c for c in self.coding_aliases if c in codings])
+
     def done(self) -> None:
         negotiated = self.response
         bare = self.base.response
@@ -37,66 +51,116 @@ class ConnegCheck(SubRequest):
             self.add_base_note('', CONNEG_SUBREQ_PROBLEM, problem=negotiated.http_error.desc)
             return
 
-        # see if it was compressed when not negotiated
-        no_conneg_vary_headers = bare.parsed_headers.get('vary', [])
-        if 'gzip' in bare.parsed_headers.get('content-encoding', []) \
-          or 'x-gzip' in bare.parsed_headers.get('content-encoding', []):
-            self.add_base_note('header-vary header-content-encoding', CONNEG_GZIP_WITHOUT_ASKING)
-        if 'gzip' not in negotiated.parsed_headers.get('content-encoding', []) \
-          and 'x-gzip' not in negotiated.parsed_headers.get('content-encoding', []):
-            self.base.gzip_support = False
-        else: # Apparently, content negotiation is happening.
-            # check status
-            if bare.status_code != negotiated.status_code:
-                self.add_base_note('status', VARY_STATUS_MISMATCH,
-                                   neg_status=negotiated.status_code,
-                                   noneg_status=bare.status_code)
+        if self.compare_responses:
+            self.check_bare(bare)
+        negotiated_codings = negotiated.parsed_headers.get('content-encoding', [])
+        if not [c for c in self.coding_aliases if c in negotiated_codings]:
+            self.set_support(False)
+            return
+
+        # Apparently, content negotiation is happening.
+        if self.compare_responses:
+            if not self.check_negotiation(bare, negotiated):
                 return  # Can't be sure what's going on...
+        elif bare.status_code != negotiated.status_code:
+            return
+
+        # check compression efficiency
+        if negotiated.payload_len > 0 and bare.payload_len > 0:
+            savings = int(100 * (
+                (float(bare.payload_len) - negotiated.payload_len) / bare.payload_len))
+        elif negotiated.payload_len > 0 and bare.payload_len == 0:
+            # weird. # TODO: figure out if we need to say something else.
+            return
+        else:
+            savings = 0
+        self.set_support(True, savings)
+        if savings >= 0:
+            self.add_base_note('header-content-encoding', CONNEG_GZIP_GOOD,
+                               coding=self.coding,
+                               savings=savings,
+                               orig_size=f_num(bare.payload_len),
+                               gzip_size=f_num(negotiated.payload_len))
+        else:
+            self.add_base_note('header-content-encoding', CONNEG_GZIP_BAD,
+                               coding=self.coding,
+                               savings=abs(savings),
+                               orig_size=f_num(bare.payload_len),
+                               gzip_size=f_num(negotiated.payload_len))
+
+    def set_support(self, supported: bool, savings: int=None) -> None:
+        "Record whether our coding is supported, and what it saves, on the base resource."
+        self.base.coding_support[self.coding] = supported
+        if savings is not None:
+            self.base.coding_savings[self.coding] = savings
+        if self.coding == 'gzip':
+            self.base.gzip_support = supported
+            if savings is not None:
+                self.base.gzip_savings = savings
+
+    def check_bare(self, bare: HttpResponse) -> None:
+        "See if the response was compressed when not negotiated."
+        if [c for c in bare.parsed_headers.get('content-encoding', []) if c != 'identity']:
+            self.add_base_note('header-vary header-content-encoding', CONNEG_GZIP_WITHOUT_ASKING)
+
+    def check_negotiation(self, bare: HttpResponse, negotiated: HttpResponse) -> bool:
+        """
+        Compare the negotiated response with the bare one. Returns False if they're too different
+        to say anything more.
+        """
+        # check status
+        if bare.status_code != negotiated.status_code:
+            self.add_base_note('status', VARY_STATUS_MISMATCH,
+                               neg_status=negotiated.status_code,
+                               noneg_status=bare.status_code)
+            return False
 
-            # check headers that should be invariant
-            for hdr in ['content-type']:
-                if bare.parsed_headers.get(hdr) != negotiated.parsed_headers.get(hdr, None):
-                    self.add_base_note('header-%s' % hdr, VARY_HEADER_MISMATCH, header=hdr)
-
-            # check Vary headers
-            vary_headers = negotiated.parsed_headers.get('vary', [])
-            if (not "accept-encoding" in vary_headers) and (not "*" in vary_headers):
-                self.add_base_note('header-vary', CONNEG_NO_VARY)
-            if no_conneg_vary_headers != vary_headers:
-                self.add_base_note('header-vary', VARY_INCONSISTENT,
-                                   conneg_vary=", ".join(vary_headers),
-                                   no_conneg_vary=", ".join(no_conneg_vary_headers))
-
-            # check body
-            if bare.decoded_md5 != negotiated.payload_md5:
-                self.add_base_note('body', VARY_BODY_MISMATCH)
-
-            # check ETag
-            if bare.parsed_headers.get('etag', 1) == negotiated.parsed_headers.get('etag', 2):
-                if not self.base.response.parsed_headers['etag'][0]: # strong
-                    self.add_base_note('header-etag', VARY_ETAG_DOESNT_CHANGE)
-
-            # check compression efficiency
-            if negotiated.payload_len > 0 and bare.payload_len > 0:
-                savings = int(100 * (
-                    (float(bare.payload_len) - negotiated.payload_len) / bare.payload_len))
-            elif negotiated.payload_len > 0 and bare.payload_len == 0:
-                # weird. # TODO: figure out if we need to say something else.
-                return
-            else:
-                savings = 0
-            self.base.gzip_support = True
-            self.base.gzip_savings = savings
-            if savings >= 0:
-                self.add_base_note('header-content-encoding', CONNEG_GZIP_GOOD,
-                                   savings=savings,
-                                   orig_size=f_num(bare.payload_len),
-                                   gzip_size=f_num(negotiated.payload_len))
-            else:
-                self.add_base_note('header-content-encoding', CONNEG_GZIP_BAD,
-                                   savings=abs(savings),
-                                   orig_size=f_num(bare.payload_len),
-                                   gzip_size=f_num(negotiated.payload_len))
+        # check headers that should be invariant
+        for hdr in ['content-type']:
+            if bare.parsed_headers.get(hdr) != negotiated.parsed_headers.get(hdr, None):
+                self.add_base_note('header-%s' % hdr, VARY_HEADER_MISMATCH, header=hdr)
+
+        # check Vary headers
+        no_conneg_vary_headers = bare.parsed_headers.get('vary', [])
+        vary_headers = negotiated.parsed_headers.get('vary', [])
+        if (not "accept-encoding" in vary_headers) and (not "*" in vary_headers):
+            self.add_base_note('header-vary', CONNEG_NO_VARY)
+        if no_conneg_vary_headers != vary_headers:
+            self.add_base_note('header-vary', VARY_INCONSISTENT,
+                               conneg_vary=", ".join(vary_headers),
+                               no_conneg_vary=", ".join(no_conneg_vary_headers))
+
+        # check body
+        if bare.decoded_md5 != negotiated.decoded_md5:
+            self.add_base_note('body', VARY_BODY_MISMATCH)
+
+        # check ETag
+        if bare.parsed_headers.get('etag', 1) == negotiated.parsed_headers.get('etag', 2):
+            if not self.base.response.parsed_headers['etag'][0]: # strong
+                self.add_base_note('header-etag', VARY_ETAG_DOESNT_CHANGE)
+        return True
+
+
+class BrotliConnegCheck(ConnegCheck):
+    """
+    See if content negotiation for brotli compression is supported.
+    """
+    check_name = "Brotli Negotiation"
+    response_phrase = "The brotli-compressed response"
+    coding = 'br'
+    coding_aliases = ['br']
+    compare_responses = False
+
+
+class DeflateConnegCheck(ConnegCheck):
+    """
+    See if content negotiation for deflate compression is supported.
+    """
+    check_name = "Deflate Negotiation"
+    response_phrase = "The deflate-compressed response"
+    coding = 'deflate'
+    coding_aliases = ['deflate']
+    compare_responses = False
 
 
 class CONNEG_SUBREQ_PROBLEM(Note):
@@ -113,7 +177,7 @@ Trying again might fix it."""
 class CONNEG_GZIP_GOOD(Note):
     category = categories.CONNEG
     level = levels.GOOD
-    summary = 'Content negotiation for gzip compression is supported, saving %(savings)s%%.'
+    summary = 'Content negotiation for %(coding)s compression is supported, saving %(savings)s%%.'
     text = """\
 HTTP supports compression of responses by negotiating for `Content-Encoding`. When REDbot asked for
 a compressed response, the resource provided one, saving %(savings)s%% of its original size (from
@@ -124,14 +188,15 @@ The compressed response's headers are displayed."""
 class CONNEG_GZIP_BAD(Note):
     category = categories.CONNEG
     level = levels.WARN
-    summary = 'Content negotiation for gzip compression makes the response %(savings)s%% larger.'
+    summary = 'Content negotiation for %(coding)s compression makes the response %(savings)s%% \
+larger.'
     text = """\
 HTTP supports compression of responses by negotiating for `Content-Encoding`. When REDbot asked for
 a compressed response, the resource provided one, but it was %(savings)s%% _larger_ than the
 original response; from %(orig_size)s to %(gzip_size)s bytes.
 
 Often, this happens when the uncompressed response is very small, or can't be compressed more;
-since gzip compression has some overhead, it can make the response larger. Turning compression
+since compression has some overhead, it can make the response larger. Turning compression
 **off** for this resource may slightly improve response times and save bandwidth.
 
 The compressed response's headers are displayed."""
@@ -158,7 +223,7 @@ select the response.
 class CONNEG_GZIP_WITHOUT_ASKING(Note):
     category = categories.CONNEG
     level = levels.WARN
-    summary = "A gzip-compressed response was sent when it wasn't asked for."
+    summary = "A compressed response was sent when it wasn't asked for."
     text = """\
 HTTP supports compression of responses by negotiating for `Content-Encoding`. Even though RED
 didn't ask for a compressed response, the resource provided one anyway.
@@ -37,6 +37,9 @@ class ETagValidate(SubRequest):
             self.base.inm_support = False
             return False
 
+    def body_needed(self) -> bool:
+        return not self.same_representation()
+
     def done(self) -> None:
         if not self.response.complete:
             self.add_base_note('', ETAG_SUBREQ_PROBLEM, problem=self.response.http_error.desc)
@@ -48,7 +51,7 @@ class ETagValidate(SubRequest):
             self.check_missing_hdrs([
                 'cache-control', 'content-location', 'etag', 'expires', 'vary'], MISSING_HDRS_304)
         elif self.response.status_code == self.base.response.status_code:
-            if self.response.payload_md5 == self.base.response.payload_md5:
+            if self.body_skipped or self.response.payload_md5 == self.base.response.payload_md5:
                 self.base.inm_support = False
                 self.add_base_note('header-etag', INM_FULL)
             else: # bodies are different
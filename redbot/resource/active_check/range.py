@@ -19,6 +19,7 @@ class RangeRequest(SubRequest):
     "Check for partial content support (if advertised)"
     check_name = "Partial Content"
     response_phrase = "The partial response"
+    needs_body = True  # the range to ask for comes from the end of the body
     def __init__(self, resource: 'HttpResource') -> None:
         self.range_start = None   # type: int
         self.range_end = None     # type: int
@@ -67,7 +68,10 @@ class RangeRequest(SubRequest):
                                      'expires', 'vary'], MISSING_HDRS_206)
             if self.response.parsed_headers.get('etag', None) == \
               self.base.response.parsed_headers.get('etag', None):
-                if self.response.payload == self.range_target:
+                # a truncated payload is far longer than the range asked for, so it can't match;
+                # the retained prefix is still enough to show what was received.
+                if not self.response.payload_truncated and \
+                  self.response.payload == self.range_target:
                     self.base.partial_support = True
                     self.add_base_note('header-accept-ranges', RANGE_CORRECT)
                 else:
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+"""
+A cookie jar for a check.
+
+When a HttpResource has a CookieJar, the cookies set by its response are stored in it, and its
+subrequests and linked resources send them back, so that sites that answer differently depending
+on cookies answer all of a check's requests in the same way.
+"""
+
+from typing import Dict, List, Tuple, Union # pylint: disable=unused-import
+from urllib.parse import urlsplit
+
+import thor
+
+from redbot.message.headers.set_cookie import CookieType, default_path
+from redbot.type import StrHeaderListType
+
+
+class StoredCookie(object):
+    "A cookie in a CookieJar; see RFC6265, Section 5.3."
+    def __init__(self, name: str, value: str, domain: str, host_only: bool, path: str,
+                 expires: float, secure: bool, order: int) -> None:
+        self.name = name
+        self.value = value
+        self.domain = domain
+        self.host_only = host_only
+        self.path = path
+        self.expires = expires  # None for session cookies
+        self.secure = secure
+        self.order = order      # for sorting cookies with the same path length
+
+    def matches(self, scheme: str, host: str, path: str, now: float) -> bool:
+        "Should this cookie be sent in a request for scheme, host and path at time now?"
+        if self.expires is not None and self.expires <= now:
+            return False
+        if self.secure and scheme != "https":
+            return False
+        if self.host_only:
+            if host != self.domain:
+                return False
+        elif not domain_match(host, self.domain):
+            return False
+        return path_match(path, self.path)
+
+
+class CookieJar(object):
+    """
+    Cookies from Set-Cookie response headers, for sending in later requests.
+
+    Cookies are taken from parsed Set-Cookie header values (see set_cookie.loose_parse), and
+    selected for a request as per RFC6265, Sections 5.3 and 5.4. There's no public suffix list,
+    so a Domain attribute is only checked against the host that set it.
+    """
+    def __init__(self) -> None:
+        self.cookies = {} # type: Dict[Tuple[str, str, str], StoredCookie]  # by name, domain, path
+        self._order = 0
+
+    def __len__(self) -> int:
+        return len(self.cookies)
+
+    def set_cookies(self, uri: str, cookies: List[CookieType], now: float=None) -> None:
+        "Store parsed Set-Cookie values from a response to a request for uri."
+        if now is None:
+            now = thor.time()
+        try:
+            parsed = urlsplit(uri)
+            host = (parsed.hostname or "").lower()
+        except ValueError:
+            return
+        for name, value, attributes in cookies:
+            self._set_cookie(host, parsed.path, name, value, attributes, now)
+
+    def _set_cookie(self, host: str, uri_path: str, name: str, value: str,
+                    attributes: List[Tuple[str, Union[str, int]]], now: float) -> None:
+        "Store a single cookie."
+        try:
+            (name + value).encode('ascii')
+        except UnicodeError:
+            return # it couldn't be sent
+        expires = None    # type: float
+        max_age = None    # type: int
+        domain = ""
+        path = None       # type: str
+        secure = False
+        for attr_name, attr_value in attributes: # the last of each attribute wins
+            if attr_name == "Expires":
+                expires = attr_value # type: ignore
+            elif attr_name == "Max-Age":
+                max_age = attr_value # type: ignore
+            elif attr_name == "Domain":
+                domain = str(attr_value).lower()
+            elif attr_name == "Path":
+                path = str(attr_value)
+            elif attr_name == "Secure":
+                secure = True
+        if max_age is not None:
+            expires = now + max_age
+        if domain:
+            if not domain_match(host, domain):
+                return
+            host_only = False
+        else:
+            domain, host_only = host, True
+        if path is None:
+            path = default_path(uri_path)
+        key = (name, domain, path)
+        if expires is not None and expires <= now:
+            self.cookies.pop(key, None)
+            return
+        old = self.cookies.get(key)
+        if old is not None:
+            order = old.order
+        else:
+            order, self._order = self._order, self._order + 1
+        self.cookies[key] = StoredCookie(name, value, domain, host_only, path, expires, secure,
+                                         order)
+
+    def cookie_header(self, uri: str, now: float=None) -> Union[str, None]:
+        "Return the Cookie header value to send in a request for uri, or None if there isn't one."
+        if not self.cookies:
+            return None
+        if now is None:
+            now = thor.time()
+        try:
+            parsed = urlsplit(uri)
+            host = (parsed.hostname or "").lower()
+        except ValueError:
+            return None
+        scheme, path = parsed.scheme.lower(), parsed.path or "/"
+        cookies = [cookie for cookie in self.cookies.values()
+                   if cookie.matches(scheme, host, path, now)]
+        if not cookies:
+            return None
+        cookies.sort(key=lambda cookie: (-len(cookie.path), cookie.order))
+        return "; ".join(["%s=%s" % (cookie.name, cookie.value) for cookie in cookies])
+
+    def add_cookies(self, uri: str, headers: StrHeaderListType) -> Tuple[StrHeaderListType, bool]:
+        """
+        Return headers for a request for uri with a Cookie header from the jar added, and whether
+        one was. Requests that already have a Cookie header are left alone.
+        """
+        if 'cookie' in [name.lower() for (name, value) in headers]:
+            return headers, False
+        cookie = self.cookie_header(uri)
+        if cookie is None:
+            return headers, False
+        return headers + [("Cookie", cookie)], True
+
+
+def domain_match(host: str, domain: str) -> bool:
+    "Does host domain-match domain? See RFC6265, Section 5.1.3."
+    if host == domain:
+        return True
+    return host.endswith("." + domain) and not host.replace(".", "").isdigit() \
+        and ":" not in host
+
+
+def path_match(request_path: str, cookie_path: str) -> bool:
+    "Does request_path path-match cookie_path? See RFC6265, Section 5.1.4."
+    if request_path == cookie_path:
+        return True
+    if request_path.startswith(cookie_path):
+        return cookie_path.endswith("/") or request_path[len(cookie_path)] == "/"
+    return False
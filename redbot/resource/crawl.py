@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+
+"""
+Crawl scheduling for descending checks.
+
+A descending HttpResource hands the links it finds to a CrawlScheduler, which decides which of
+them become linked resources, and when each one is started.
+"""
+
+from collections import defaultdict
+import heapq
+import itertools
+import re
+from typing import Dict, List, Match, Set, Tuple, TYPE_CHECKING
+from urllib.parse import urlsplit, urlunsplit
+
+import thor
+
+from redbot.speak import Note, categories, levels
+if TYPE_CHECKING:
+    from redbot.resource import HttpResource # pylint: disable=cyclic-import,unused-import
+
+OriginType = Tuple[str, str, int]
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class CrawlScheduler(object):
+    """
+    Schedule the linked resources of a descending check.
+
+    Links are normalised (see normalize_uri) and each is only checked once, however many times
+    and under whichever tags it appears. Linked resources wait in a frontier ordered by tag
+    (stylesheets and scripts first, images last), then by the order they were found, and are
+    started subject to:
+
+      - max_resources: how many linked resources to check in all
+      - max_depth: how many links away from the top resource to go; 1 only checks its links
+      - max_origin_checks: how many linked resources to check at once on each origin
+      - origin_delay: how many seconds to leave between starting checks on an origin
+
+    Every linked resource is added to the top resource's .linked as soon as it's found, whatever
+    its depth, so that the top resource isn't done until they all are.
+    """
+    tag_priority = {
+        'link': 0,
+        'script': 1,
+        'frame': 2,
+        'iframe': 2,
+        'img': 3} # type: Dict[str, int]
+    max_resources = 250
+    max_depth = 1
+    max_origin_checks = 3
+    origin_delay = 0.0
+
+    def __init__(self, root: 'HttpResource') -> None:
+        self.root = root
+        self.seen = set()         # type: Set[str]
+        self.frontier = []        # type: List[Tuple[int, int, 'HttpResource']]
+        self.active = defaultdict(int) # type: Dict[OriginType, int]
+        self.next_start = {}      # type: Dict[OriginType, float]
+        self.scheduled = 0        # how many linked resources have been added
+        self.skipped = 0          # how many links weren't checked because of max_resources
+        self._order = itertools.count()
+        self._timer = None        # type: thor.loop.ScheduledEvent
+        self._pumping = False
+        self._pump_again = False
+
+    def add_link(self, referer: 'HttpResource', uri: str, tag: str) -> None:
+        "A link to uri was found in referer's tag; check it, if it's new and allowed."
+        depth = referer.crawl_depth + 1
+        if depth > self.max_depth:
+            return
+        key = normalize_uri(uri)
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        if self.scheduled >= self.max_resources:
+            if self.skipped == 0:
+                self.root.add_note('', LINKED_LIMIT, max_resources=self.max_resources)
+            self.skipped += 1
+            return
+        self.scheduled += 1
+        linked = self.root.add_linked(uri, tag, referer)
+        linked.crawl_depth = depth
+        if depth < self.max_depth:
+            linked.descend = True
+            linked.crawler = self
+        heapq.heappush(self.frontier, (self.tag_priority.get(tag, len(self.tag_priority)),
+                                       next(self._order), linked))
+        self.pump()
+
+    def pump(self) -> None:
+        "Start whatever the frontier allows now, and arrange to come back for anything delayed."
+        if self._pumping:
+            # a check finished synchronously while starting; go around again when we're done.
+            self._pump_again = True
+            return
+        self._pumping = True
+        try:
+            self._pump_again = True
+            while self._pump_again:
+                self._pump_again = False
+                self._pump()
+        finally:
+            self._pumping = False
+
+    def _pump(self) -> None:
+        "Go through the frontier once."
+        if self._timer:
+            self._timer.delete()
+            self._timer = None
+        now = thor.time()
+        waiting = []
+        wake = None
+        while self.frontier:
+            item = heapq.heappop(self.frontier)
+            origin = uri_origin(item[2].request.uri)
+            if self.active[origin] >= self.max_origin_checks:
+                waiting.append(item)
+                continue
+            start = self.next_start.get(origin, 0)
+            if start > now:
+                waiting.append(item)
+                wake = start if wake is None else min(wake, start)
+                continue
+            self._start(item[2], origin)
+            now = thor.time()
+        for item in waiting:
+            heapq.heappush(self.frontier, item)
+        if wake is not None:
+            self._timer = thor.schedule(wake - now, self.pump)
+
+    def _start(self, linked: 'HttpResource', origin: OriginType) -> None:
+        "Start checking a linked resource."
+        self.active[origin] += 1
+        self.next_start[origin] = thor.time() + self.origin_delay
+        @thor.events.on(linked)
+        def check_done() -> None:
+            self.active[origin] -= 1
+            self.pump()
+        linked.check()
+
+
+def uri_origin(uri: str) -> OriginType:
+    "Return the (scheme, host, port) origin of uri."
+    try:
+        parsed = urlsplit(uri)
+        port = parsed.port
+    except (TypeError, ValueError):
+        return ('', '', None)
+    scheme = parsed.scheme.lower()
+    return (scheme, (parsed.hostname or '').lower(), port or DEFAULT_PORTS.get(scheme, None))
+
+
+def normalize_uri(uri: str) -> str:
+    """
+    Normalise uri so that equivalent URIs compare equal: the scheme and host are lowercased,
+    default ports and fragments are removed, an empty HTTP path becomes '/' and percent-encoding
+    is uppercased.
+    """
+    try:
+        parsed = urlsplit(uri)
+        port = parsed.port
+    except (TypeError, ValueError):
+        return uri
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower()
+    if ':' in host:
+        host = "[%s]" % host
+    if port is not None and port != DEFAULT_PORTS.get(scheme, None):
+        host = "%s:%s" % (host, port)
+    if parsed.username is not None:
+        userinfo = parsed.username
+        if parsed.password is not None:
+            userinfo += ":" + parsed.password
+        host = "%s@%s" % (userinfo, host)
+    path = parsed.path
+    if not path and scheme in DEFAULT_PORTS:
+        path = "/"
+    path = _pct_re.sub(_pct_upper, path)
+    query = _pct_re.sub(_pct_upper, parsed.query)
+    return urlunsplit((scheme, host, path, query, ''))
+
+_pct_re = re.compile(r"%[0-9a-fA-F]{2}")
+def _pct_upper(match: Match[str]) -> str:
+    return match.group(0).upper()
+
+
+class LINKED_LIMIT(Note):
+    category = categories.GENERAL
+    level = levels.INFO
+    summary = "REDbot didn't check all of the linked resources."
+    text = """\
+When checking the resources that this response links to, REDbot stops after %(max_resources)s of
+them. The rest aren't shown."""
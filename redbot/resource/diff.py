@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+"""
+Comparing two checks of the same resource.
+
+diff_results() takes two finished checks -- HttpResources, or SavedResources loaded from saved
+results -- and works out which notes and response headers changed between them, without rendering
+either. Notes are compared by compact keys (see note_key), so it's cheap enough to compare
+thousands of pairs in a batch.
+"""
+
+from collections import Counter, OrderedDict
+import json
+from typing import Any, Dict, List, Tuple # pylint: disable=unused-import
+
+from redbot.speak import Note
+
+NoteKeyType = Tuple[str, str, str]
+
+
+def note_key(note: Note) -> NoteKeyType:
+    "Return a compact, hashable key for note: its class name, subject and (serialised) vars."
+    return (note.__class__.__name__, note.subject,
+            json.dumps(note.vars, sort_keys=True, separators=(',', ':'), default=str))
+
+
+class ResultDiff(object):
+    """
+    The differences between an old and a new check of a resource:
+
+      - status: (old, new) status codes, if they differ
+      - added_notes, removed_notes: notes only found in the new or old check
+      - changed_notes: (old, new) notes with the same class and subject, but different vars
+      - added_headers, removed_headers: response header names only found in the new or old check
+      - changed_headers: header name -> (old values, new values)
+
+    Headers in ignore_headers (which change on every response) aren't compared.
+    """
+    ignore_headers = ['date', 'age'] # type: List[str]
+
+    def __init__(self, old: Any, new: Any) -> None:
+        self.old = old
+        self.new = new
+        self.status = None            # type: Tuple[str, str]
+        self.added_notes = []         # type: List[Note]
+        self.removed_notes = []       # type: List[Note]
+        self.changed_notes = []       # type: List[Tuple[Note, Note]]
+        self.added_headers = []       # type: List[str]
+        self.removed_headers = []     # type: List[str]
+        self.changed_headers = OrderedDict() # type: Dict[str, Tuple[List[str], List[str]]]
+        if old.response.status_code != new.response.status_code:
+            self.status = (old.response.status_code, new.response.status_code)
+        self._diff_notes()
+        self._diff_headers()
+
+    @property
+    def changed(self) -> bool:
+        "Whether anything differs."
+        return bool(self.status or self.added_notes or self.removed_notes or self.changed_notes \
+                    or self.added_headers or self.removed_headers or self.changed_headers)
+
+    def _diff_notes(self) -> None:
+        old_notes = [(note_key(note), note) for note in self.old.notes]
+        new_notes = [(note_key(note), note) for note in self.new.notes]
+        old_keys = Counter([key for (key, note) in old_notes])
+        new_keys = Counter([key for (key, note) in new_notes])
+        removed = self._only_in(old_notes, old_keys - new_keys)
+        added = self._only_in(new_notes, new_keys - old_keys)
+        # pair up notes that just have different vars
+        added_by_name = OrderedDict() # type: Dict[Tuple[str, str], List[Note]]
+        for note in added:
+            added_by_name.setdefault((note.__class__.__name__, note.subject), []).append(note)
+        for note in removed:
+            candidates = added_by_name.get((note.__class__.__name__, note.subject))
+            if candidates:
+                self.changed_notes.append((note, candidates.pop(0)))
+            else:
+                self.removed_notes.append(note)
+        self.added_notes = [note for notes in added_by_name.values() for note in notes]
+
+    @staticmethod
+    def _only_in(notes: List[Tuple[NoteKeyType, Note]], keys: Counter) -> List[Note]:
+        "Return the notes whose keys are in keys, as many times as they're counted, in order."
+        out = []
+        for key, note in notes:
+            if keys[key] > 0:
+                keys[key] -= 1
+                out.append(note)
+        return out
+
+    def _diff_headers(self) -> None:
+        old_hdrs = self._header_dict(self.old.response.headers)
+        new_hdrs = self._header_dict(self.new.response.headers)
+        for name in old_hdrs:
+            if name not in new_hdrs:
+                self.removed_headers.append(name)
+            elif old_hdrs[name] != new_hdrs[name]:
+                self.changed_headers[name] = (old_hdrs[name], new_hdrs[name])
+        self.added_headers = [name for name in new_hdrs if name not in old_hdrs]
+
+    def _header_dict(self, headers: List[Tuple[str, str]]) -> Dict[str, List[str]]:
+        "Collect (name, value) headers into lowercased name -> values, in order."
+        out = OrderedDict() # type: Dict[str, List[str]]
+        for name, value in headers:
+            name = name.lower()
+            if name in self.ignore_headers:
+                continue
+            out.setdefault(name, []).append(value.strip())
+        return out
+
+    def record(self) -> Dict[str, Any]:
+        "Summarise the differences as a JSON-serialisable dictionary."
+        old_hdrs = self._header_dict(self.old.response.headers)
+        new_hdrs = self._header_dict(self.new.response.headers)
+        record = {
+            'old': self.old.request.uri,
+            'new': self.new.request.uri,
+            'changed': self.changed,
+            'added_notes': [_note_summary(note) for note in self.added_notes],
+            'removed_notes': [_note_summary(note) for note in self.removed_notes],
+            'changed_notes': [{'old': _note_summary(old), 'new': _note_summary(new)}
+                              for (old, new) in self.changed_notes],
+            'added_headers': {name: new_hdrs[name] for name in self.added_headers},
+            'removed_headers': {name: old_hdrs[name] for name in self.removed_headers},
+            'changed_headers': {name: {'old': old, 'new': new}
+                                for (name, (old, new)) in self.changed_headers.items()}
+        } # type: Dict[str, Any]
+        if self.status:
+            record['status'] = {'old': self.status[0], 'new': self.status[1]}
+        return record
+
+
+def _note_summary(note: Note) -> Dict[str, Any]:
+    return {'note': note.__class__.__name__, 'subject': note.subject,
+            'level': note.level.value, 'vars': note.vars}
+
+
+def diff_results(old: Any, new: Any) -> ResultDiff:
+    """
+    Compare two finished checks (HttpResources or SavedResources) of a resource.
+    """
+    return ResultDiff(old, new)
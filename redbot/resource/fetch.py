@@ -6,24 +6,73 @@ problems and other interesting characteristics. It only makes one request,
 based upon the provided headers.
 """
 
-from typing import Any, Dict, List, Tuple, Type, Union
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, List, Set, Tuple, Type, Union, TYPE_CHECKING
 
 import thor
+from thor.http.client import HttpClientExchange
+from thor.http.common import ERROR
 import thor.http.error as httperr
 
 from redbot import __version__
+from redbot.formatter import f_num
 from redbot.speak import Note, levels, categories
 from redbot.message import HttpRequest, HttpResponse
 from redbot.message.status import StatusChecker
 from redbot.message.cache import checkCaching
+from redbot.resource.cookie_jar import CookieJar
 from redbot.resource.robot_fetch import RobotFetcher
+from redbot.resource.timing import PhaseTimer
 from redbot.type import StrHeaderListType, RawHeaderListType
+if TYPE_CHECKING:
+    from redbot.resource.replay import Recording, ReplayExchange # pylint: disable=unused-import
 
 
 UA_STRING = "RED/%s (https://redbot.org/)" % __version__
+OriginType = Tuple[bytes, bytes, int]
+
+class RedHttpClientExchange(HttpClientExchange):
+    "Thor HttpClientExchange that tells RedHttpClient when it's finished with its origin."
+    conn_reused = None # type: bool   # True if a pooled connection was used.
+    aborted = False
+    connect_time = None # type: float  # when a connection was attached.
+
+    def abort(self) -> None:
+        """
+        Stop the exchange without emitting anything more. Its connection is closed, since it
+        can't be reused part-way through a response.
+        """
+        self.aborted = True
+        self._input_state = ERROR
+        self._clear_read_timeout()
+        if self.tcp_conn and self.tcp_conn.tcp_connected:
+            self.tcp_conn.close()
+        self.tcp_conn = None
+        self._dead_conn()
+
+    def _handle_connect(self, tcp_conn: thor.tcp.TcpConnection) -> None:
+        if self.aborted:
+            # we gave up while waiting for the connection; someone else can use it.
+            self.client._release_conn(tcp_conn, self.scheme)
+            return
+        self.connect_time = thor.time()
+        HttpClientExchange._handle_connect(self, tcp_conn)
+
+    def _dead_conn(self) -> None:
+        self.client.exchange_done(self)
+
 
 class RedHttpClient(thor.http.HttpClient):
-    "Thor HttpClient for RedFetcher"
+    """
+    Thor HttpClient for RedFetcher.
+
+    Keeps a per-origin pool of persistent connections, so that subrequests and linked resources
+    reuse warm connections rather than opening new ones. For each origin:
+      - at most max_server_conn exchanges are in flight; others wait for a connection
+      - at most max_idle_conns connections are kept idle
+      - idle connections are closed after idle_timeout seconds
+    When a proxy is set, idle connections are pooled by the proxy they go to.
+    """
 
     def __init__(self, loop: thor.loop.LoopBase=None) -> None:
         thor.http.HttpClient.__init__(self, loop)
@@ -31,6 +80,150 @@ class RedHttpClient(thor.http.HttpClient):
         self.read_timeout = 15
         self.retry_delay = 1
         self.careful = False
+        self.idle_timeout = 30
+        self.max_idle_conns = 4
+        self.max_server_conn = 6
+        self.pool_hits = 0
+        self.pool_misses = 0
+        self._active = defaultdict(set)   # type: Dict[OriginType, Set[RedHttpClientExchange]]
+        self._waiting = defaultdict(deque) # type: Dict[OriginType, deque]
+
+    def exchange(self) -> RedHttpClientExchange:
+        return RedHttpClientExchange(self)
+
+    def _attach_conn(self, origin: OriginType, handle_connect: Callable,
+                     handle_connect_error: Callable, connect_timeout: int) -> None:
+        "Find an idle connection for origin, or create a new one if there's room."
+        exchange = handle_connect.__self__  # type: ignore
+        active = self._active[origin]
+        if exchange not in active and len(active) >= self.max_server_conn:
+            self._waiting[origin].append((handle_connect, handle_connect_error, connect_timeout))
+            return
+        active.add(exchange)
+        conn_origin = self._conn_origin(origin)
+        while self._idle_conns[conn_origin]:
+            tcp_conn = self._idle_conns[conn_origin].pop()
+            if tcp_conn.tcp_connected:
+                self._clear_listeners(tcp_conn, 'data', 'pause', 'close')
+                tcp_conn.pause(True)
+                if hasattr(tcp_conn, "_idler"):
+                    tcp_conn._idler.delete()
+                self.pool_hits += 1
+                exchange.conn_reused = True
+                handle_connect(tcp_conn)
+                return
+        self.pool_misses += 1
+        exchange.conn_reused = False
+        self._new_conn(conn_origin, handle_connect, handle_connect_error, connect_timeout)
+
+    def _release_conn(self, tcp_conn: thor.tcp.TcpConnection, scheme: bytes) -> None:
+        "Add an idle connection back to the pool, if there's room for it."
+        self._clear_listeners(tcp_conn, 'close')
+        if not tcp_conn.tcp_connected:
+            return
+        origin = self._conn_origin((scheme, tcp_conn.host, tcp_conn.port))
+        idle_conns = self._idle_conns[origin]
+        if self.idle_timeout <= 0 or len(idle_conns) >= self.max_idle_conns:
+            tcp_conn.close()
+            return
+        def idle_close() -> None:
+            "Remove the connection from the pool when it closes."
+            if hasattr(tcp_conn, "_idler"):
+                tcp_conn._idler.delete()
+            try:
+                idle_conns.remove(tcp_conn)
+            except ValueError:
+                pass
+        tcp_conn.on('close', idle_close)
+        tcp_conn._idler = self.loop.schedule(self.idle_timeout, tcp_conn.close)
+        idle_conns.append(tcp_conn)
+
+    def _conn_origin(self, origin: OriginType) -> OriginType:
+        "The origin to connect to for origin; i.e., the proxy, if there is one."
+        if self.proxy_host and self.proxy_port:
+            scheme = b'https' if self.proxy_tls else b'http'
+            return (scheme, self.proxy_host, self.proxy_port)
+        return origin
+
+    @staticmethod
+    def _clear_listeners(tcp_conn: thor.tcp.TcpConnection, *events: str) -> None:
+        "Remove the listeners that exchanges added to tcp_conn, leaving its own in place."
+        for event in events:
+            for listener in list(tcp_conn.listeners(event)):
+                if getattr(listener, '__self__', None) is not tcp_conn:
+                    tcp_conn.removeListener(event, listener)
+
+    def exchange_done(self, exchange: RedHttpClientExchange) -> None:
+        "An exchange no longer needs its connection; let a waiting one go."
+        origin = exchange.origin
+        active = self._active.get(origin, None)
+        if active is None:
+            return
+        active.discard(exchange)
+        waiting = self._waiting.get(origin, None)
+        if waiting and exchange.aborted:
+            for queued in [q for q in waiting if q[0].__self__ is exchange]:
+                waiting.remove(queued)
+        while waiting and len(active) < self.max_server_conn:
+            self._attach_conn(origin, *waiting.popleft())
+        if not active:
+            self._active.pop(origin, None)
+        if waiting is not None and not waiting:
+            self._waiting.pop(origin, None)
+
+    def _dead_conn(self, origin: OriginType) -> None:
+        # We track exchanges rather than connections; see exchange_done.
+        pass
+
+
+class FetchLimits(object):
+    """
+    Limits on the response body bytes, header bytes and seconds that a fetch can use. A limit of
+    None isn't enforced.
+
+    A RedFetcher has its own limits, and can also share a budget with other fetches (e.g., an
+    HttpResource's subrequests and linked resources); use() counts against both.
+    """
+    def __init__(self, max_body_bytes: int=None, max_header_bytes: int=None,
+                 max_time: float=None) -> None:
+        self.max_body_bytes = max_body_bytes
+        self.max_header_bytes = max_header_bytes
+        self.max_time = max_time
+        self.body_bytes = 0
+        self.header_bytes = 0
+        self.start_time = None  # type: float
+
+    def copy(self) -> 'FetchLimits':
+        "Return new FetchLimits with the same limits, but nothing used yet."
+        return FetchLimits(self.max_body_bytes, self.max_header_bytes, self.max_time)
+
+    def start(self) -> None:
+        "Start the clock, if it isn't already running."
+        if self.start_time is None:
+            self.start_time = thor.time()
+
+    def time_left(self) -> Union[float, None]:
+        "Seconds left before the time limit, or None if there isn't one."
+        if self.max_time is None:
+            return None
+        if self.start_time is None:
+            return self.max_time
+        return max(self.start_time + self.max_time - thor.time(), 0)
+
+    def use(self, body_bytes: int=0, header_bytes: int=0) -> None:
+        "Count bytes used."
+        self.body_bytes += body_bytes
+        self.header_bytes += header_bytes
+
+    def exceeded(self) -> Union[str, None]:
+        "If a limit has been exceeded, describe it; otherwise, return None."
+        if self.max_header_bytes is not None and self.header_bytes > self.max_header_bytes:
+            return "%s bytes of headers" % f_num(self.max_header_bytes)
+        if self.max_body_bytes is not None and self.body_bytes > self.max_body_bytes:
+            return "%s bytes of body" % f_num(self.max_body_bytes)
+        if self.time_left() == 0:
+            return "%g seconds" % self.max_time
+        return None
 
 
 class RedFetcher(thor.events.EventEmitter):
@@ -43,6 +236,15 @@ class RedFetcher(thor.events.EventEmitter):
 
     If provided, 'name' indicates the type of the request, and is used to
     help set notes and status events appropriately.
+
+    If the fetch goes over its limits or its budget (see FetchLimits), the exchange is stopped
+    and response.http_error is set to a FetchLimitError.
+
+    The phases of the fetch -- "robots", "connect", "first_byte", "headers" and "body" -- are
+    timed in .timing; see PhaseTimer.
+
+    If .replay is set to a Recording, the response is taken from it instead of the network (and
+    robots.txt isn't consulted); if it wasn't recorded, not_recorded() is called.
     """
     check_name = "undefined"
     response_phrase = "undefined"
@@ -57,14 +259,23 @@ class RedFetcher(thor.events.EventEmitter):
         self.request = HttpRequest(self.ignore_note)  # type: HttpRequest
         self.nonfinal_responses = []                  # type: List[HttpResponse]
         self.response = HttpResponse(self.add_note)   # type: HttpResponse
-        self.exchange = None                          # type: thor.http.ClientExchange
+        self.exchange = None # type: Union[RedHttpClientExchange, ReplayExchange]
+        self.conn_reused = None                       # type: bool
         self.follow_robots_txt = True # Should we pay attention to robots file?
         self.fetch_started = False
         self.fetch_done = False
+        self.limits = FetchLimits()                   # type: FetchLimits  # for this fetch
+        self.budget = None                            # type: FetchLimits  # shared with others
+        self.cookie_jar = None                        # type: CookieJar
+        self.jar_cookie_sent = False  # Did the request's Cookie header come from cookie_jar?
+        self.replay = None                            # type: Recording
+        self._limit_timer = None                      # type: thor.loop.ScheduledEvent
+        self.timing = PhaseTimer(self)                # type: PhaseTimer
 
     def __getstate__(self) -> Dict[str, Any]:
         state = thor.events.EventEmitter.__getstate__(self)
         del state['exchange']
+        del state['_limit_timer']
         return state
 
     def __repr__(self) -> str:
@@ -119,8 +330,9 @@ class RedFetcher(thor.events.EventEmitter):
             self._fetch_done()
             return
 
-        if self.follow_robots_txt:
-            self.robot_fetcher.once("robot-%s" % self.request.uri, self.run_continue)
+        if self.follow_robots_txt and self.replay is None:
+            self.timing.start("robots")
+            self.robot_fetcher.on("robot-%s" % self.request.uri, self.run_continue)
             self.robot_fetcher.check_robots(self.request.uri)
         else:
             self.run_continue(True)
@@ -129,16 +341,42 @@ class RedFetcher(thor.events.EventEmitter):
         """
         Continue after getting the robots file.
         """
+        self.timing.end("robots")
         if not allowed:
             self.response.http_error = RobotsTxtError()
             self._fetch_done()
             return
 
+        replayed = None # type: ReplayExchange
+        if self.replay is not None:
+            replayed = self.replay.exchange(self.request)
+            if replayed is None:
+                self.not_recorded()
+                return
+
         self.fetch_started = True
 
+        timers = []
+        for limits in self._all_limits():
+            limits.start()
+            if limits.time_left() is not None:
+                timers.append((limits.time_left(), limits))
+        if self._over_limit():
+            return
+        if timers:
+            time_left, limits = min(timers, key=lambda timer: timer[0])
+            self._limit_timer = thor.schedule(time_left, self._stop_fetch,
+                                              "%g seconds" % limits.max_time)
+
         if 'user-agent' not in [i[0].lower() for i in self.request.headers]:
             self.request.headers.append(("User-Agent", UA_STRING))
-        self.exchange = self.client.exchange()
+        if self.cookie_jar is not None:
+            self.request.headers, self.jar_cookie_sent = self.cookie_jar.add_cookies(
+                self.request.uri, self.request.headers)
+        if replayed is not None:
+            self.exchange = replayed
+        else:
+            self.exchange = self.client.exchange()
         self.exchange.on('response_nonfinal', self._response_nonfinal)
         self.exchange.once('response_start', self._response_start)
         self.exchange.on('response_body', self._response_body)
@@ -146,17 +384,28 @@ class RedFetcher(thor.events.EventEmitter):
         self.exchange.on('error', self._response_error)
         self.emit("status", "fetching %s (%s)" % (self.request.uri, self.check_name))
         req_hdrs = [(k.encode('ascii'), v.encode('ascii')) for (k, v) in self.request.headers]
+        self.timing.start("first_byte")
         self.exchange.request_start(
             self.request.method.encode('ascii'), self.request.uri.encode('ascii'), req_hdrs)
-        self.request.start_time = thor.time()
+        if self.fetch_done:
+            # the exchange failed synchronously (e.g., an unsupported URL scheme).
+            return
+        self.request.start_time = replayed.start_time if replayed is not None else thor.time()
         if self.request.payload != None:
             self.exchange.request_body(self.request.payload)
             self.transfer_out += len(self.request.payload)
         self.exchange.request_done([])
 
+    def not_recorded(self) -> None:
+        "The request isn't in .replay. Can be overridden."
+        self.response.http_error = NotRecordedError()
+        self._fetch_done()
+
     def _response_nonfinal(self, status: bytes, phrase: bytes, 
                            res_headers: RawHeaderListType) -> None:
         "Got a non-final response."
+        if self._over_limit(header_bytes=self.exchange.input_header_length):
+            return
         nfres = HttpResponse(self.add_note)
         nfres.process_top_line(self.exchange.res_version, status, phrase)
         nfres.process_raw_headers(res_headers)
@@ -166,23 +415,41 @@ class RedFetcher(thor.events.EventEmitter):
     def _response_start(self, status: bytes, phrase: bytes,
                         res_headers: RawHeaderListType) -> None:
         "Process the response start-line and headers."
-        self.response.start_time = thor.time()
-        self.response.process_top_line(self.exchange.res_version, status, phrase)
-        self.response.process_raw_headers(res_headers)
-        StatusChecker(self.response, self.request)
-        checkCaching(self.response, self.request)
+        if self._over_limit(header_bytes=self.exchange.input_header_length):
+            return
+        if self.replay is not None:
+            self.response.start_time = self.exchange.response_time
+            self.response.payload_recorded = self.exchange.body_recorded
+        else:
+            self.response.start_time = thor.time()
+        self.conn_reused = self.exchange.conn_reused
+        connect_time = getattr(self.exchange, 'connect_time', None)
+        if connect_time is not None:  # replayed exchanges don't connect
+            self.timing.span("connect", self.timing["first_byte"].start, connect_time)
+        self.timing.end("first_byte", self.response.start_time)
+        with self.timing.phase("headers"):
+            self.response.process_top_line(self.exchange.res_version, status, phrase)
+            self.response.process_raw_headers(res_headers)
+            StatusChecker(self.response, self.request)
+            checkCaching(self.response, self.request)
 
     def _response_body(self, chunk: bytes) -> None:
         "Process a chunk of the response body."
         self.transfer_in += len(chunk)
-        self.response.feed_body(chunk)
+        if self._over_limit(body_bytes=len(chunk)):
+            return
+        with self.timing.phase("body"):
+            self.response.feed_body(chunk)
 
     def _response_done(self, trailers: List[Tuple[bytes, bytes]]) -> None:
         "Finish analysing the response, handling any parse errors."
         self.emit("status", "fetched %s (%s)" % (self.request.uri, self.check_name))
         self.response.transfer_length = self.exchange.input_transfer_length
         self.response.header_length = self.exchange.input_header_length
-        self.response.body_done(True, trailers)
+        with self.timing.phase("body"):
+            self.response.body_done(True, trailers)
+        if self.replay is not None:
+            self.response.complete_time = self.exchange.complete_time
         self._fetch_done()
 
     def _response_error(self, error: httperr.HttpError) -> None:
@@ -203,7 +470,41 @@ class RedFetcher(thor.events.EventEmitter):
             self.response.http_error = error
         self._fetch_done()
 
+    def _all_limits(self) -> List[FetchLimits]:
+        "The limits that apply to this fetch."
+        return [limits for limits in [self.limits, self.budget] if limits is not None]
+
+    def _over_limit(self, body_bytes: int=0, header_bytes: int=0) -> bool:
+        "Count bytes used by this fetch; if that's over a limit, stop it and return True."
+        exceeded = None
+        for limits in self._all_limits():
+            limits.use(body_bytes, header_bytes)
+            exceeded = exceeded or limits.exceeded()
+        if exceeded:
+            self._stop_fetch(exceeded)
+            return True
+        return False
+
+    def _stop_fetch(self, limit: str) -> None:
+        "Stop fetching because limit has been reached."
+        self.emit("status", "stopped fetching %s (%s) - %s limit" % (
+            self.request.uri, self.check_name, limit))
+        self.add_note('', FETCH_LIMIT, limit=limit)
+        self.response.http_error = FetchLimitError(limit)
+        self._stop_exchange()
+        self._fetch_done()
+
+    def _stop_exchange(self) -> None:
+        "Stop the exchange (if there is one), ignoring anything more from it."
+        if self.exchange:
+            self.exchange.removeListeners(
+                'response_nonfinal', 'response_start', 'response_body', 'response_done', 'error')
+            self.exchange.abort()
+
     def _fetch_done(self) -> None:
+        if self._limit_timer:
+            self._limit_timer.delete()
+            self._limit_timer = None
         if not self.fetch_done:
             self.fetch_done = True
             self.emit("fetch_done")
@@ -214,6 +515,26 @@ class RobotsTxtError(httperr.HttpError):
     server_status = ("502", "Gateway Error")
 
 
+class NotRecordedError(httperr.HttpError):
+    desc = "Not in the recording being replayed"
+    server_status = ("502", "Gateway Error")
+
+
+class FetchLimitError(httperr.HttpError):
+    desc = "REDbot's fetch limit was reached"
+    server_status = ("502", "Gateway Error")
+
+
+class FETCH_LIMIT(Note):
+    category = categories.CONNECTION
+    level = levels.WARN
+    summary = "REDbot stopped fetching %(response)s."
+    text = """\
+REDbot limits how much it will download and how long it will wait when checking a resource. While
+fetching %(response)s, it reached its limit of %(limit)s, so it stopped.
+
+Results that depend on the rest of the response (or on any further requests) aren't available."""
+
 class BODY_NOT_ALLOWED(Note):
     category = categories.CONNECTION
     level = levels.BAD
@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+
+"""
+Replaying recorded exchanges, instead of fetching them.
+
+A Recording holds exchanges read from a HAR file or from raw HTTP transcripts (see load). When a
+HttpResource's .replay is set to one, it -- along with its subrequests and linked resources -- gets
+its responses from the recording rather than the network, so that they can be analysed at CPU
+speed. Fetches that weren't recorded fail with a NotRecordedError, except for active checks, which
+are skipped.
+
+HAR files hold response bodies after any content-coding has been removed, and sometimes don't hold
+them at all. Coded bodies are coded again (so that they can still be decoded and parsed for links),
+but since they won't be exactly what was sent, their length and digest aren't checked.
+"""
+
+from base64 import b64decode
+from calendar import timegm
+from collections import defaultdict
+from email.utils import mktime_tz, parsedate_tz
+import gzip
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union # pylint: disable=unused-import
+from urllib.parse import urldefrag
+import zlib
+
+import thor
+from thor.events import EventEmitter
+
+from redbot.batch import BatchChecker
+from redbot.message import HttpRequest
+from redbot.resource import HttpResource
+from redbot.type import RawHeaderListType, StrHeaderListType
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CHUNK_SIZE = 8192  # how big the body chunks replayed from HAR files are
+
+
+class ReplayFormatError(ValueError):
+    "A recording couldn't be read."
+    pass
+
+
+class RecordedExchange(object):
+    """
+    A request and the response to it, as recorded.
+
+    Request attributes are strings, as for HttpRequest; the response's start line and headers
+    are bytes, as thor would deliver them, and its body is a list of chunks (with any
+    transfer-coding removed). body_recorded is False if the body isn't exactly what was sent.
+    """
+    def __init__(self, method: str, uri: str, req_headers: StrHeaderListType,
+                 req_body: Union[bytes, None], version: bytes, status: bytes, phrase: bytes,
+                 headers: RawHeaderListType, chunks: List[bytes], start_time: float,
+                 elapsed: float=0.0, wait: float=0.0, body_recorded: bool=True) -> None:
+        self.method = method
+        self.uri = uri
+        self.req_headers = req_headers
+        self.req_body = req_body
+        self.version = version
+        self.status = status
+        self.phrase = phrase
+        self.headers = headers
+        self.chunks = chunks
+        self.start_time = start_time
+        self.response_time = start_time + wait
+        self.complete_time = start_time + max(elapsed, wait)
+        self.body_recorded = body_recorded
+
+    def __repr__(self) -> str:
+        return "<RecordedExchange %s %s %s>" % (
+            self.method, self.uri, self.status.decode('ascii', 'replace'))
+
+
+class Recording(object):
+    """
+    A collection of RecordedExchanges, looked up by request.
+
+    A request matches a recorded one if it has the same method and URI, and the same values for
+    the headers in match_headers -- i.e., the ones that active checks change. Other headers
+    (e.g., User-Agent, Cookie) are ignored.
+    """
+    match_headers = ['accept-encoding', 'if-match', 'if-modified-since', 'if-none-match',
+                     'if-range', 'range']
+
+    def __init__(self, exchanges: Iterable[RecordedExchange]=None) -> None:
+        self.exchanges = []  # type: List[RecordedExchange]
+        self._index = defaultdict(list)  # type: Dict[Tuple[str, str], List[RecordedExchange]]
+        for exchange in exchanges or []:
+            self.add(exchange)
+
+    def __len__(self) -> int:
+        return len(self.exchanges)
+
+    def add(self, exchange: RecordedExchange) -> None:
+        "Add a recorded exchange."
+        self.exchanges.append(exchange)
+        self._index[(exchange.method, _uri_key(exchange.uri))].append(exchange)
+
+    def find(self, method: str, uri: str,
+             headers: StrHeaderListType=None) -> Union[RecordedExchange, None]:
+        """
+        Return the first exchange recorded for method and uri. If headers is given, it has to
+        match them too.
+        """
+        candidates = self._index.get((method, _uri_key(uri)), [])
+        if headers is None:
+            return candidates[0] if candidates else None
+        selecting = self._selecting(headers)
+        for candidate in candidates:
+            if self._selecting(candidate.req_headers) == selecting:
+                return candidate
+        return None
+
+    def exchange(self, request: HttpRequest) -> Union['ReplayExchange', None]:
+        "Return an exchange replaying the response to request, or None if it wasn't recorded."
+        recorded = self.find(request.method, request.uri, request.headers)
+        if recorded is None:
+            return None
+        return ReplayExchange(recorded)
+
+    def _selecting(self, headers: StrHeaderListType) -> List[Tuple[str, str]]:
+        return sorted([(name.lower(), value.strip()) for (name, value) in headers
+                       if name.lower() in self.match_headers])
+
+
+class ReplayExchange(EventEmitter):
+    """
+    Stands in for a RedHttpClientExchange, replaying a RecordedExchange.
+    """
+    conn_reused = None # type: bool
+    aborted = False
+
+    def __init__(self, recorded: RecordedExchange) -> None:
+        EventEmitter.__init__(self)
+        self.recorded = recorded
+        self.res_version = recorded.version
+        self.input_header_length = \
+            len(b"HTTP/ %s %s\r\n\r\n" % (recorded.status, recorded.phrase)) + \
+            len(recorded.version) + \
+            sum([len(name) + len(value) + 4 for (name, value) in recorded.headers])
+        self.input_transfer_length = sum([len(chunk) for chunk in recorded.chunks])
+        self.start_time = recorded.start_time
+        self.response_time = recorded.response_time
+        self.complete_time = recorded.complete_time
+        self.body_recorded = recorded.body_recorded
+        self._scheduled = None # type: thor.loop.ScheduledEvent
+
+    def request_start(self, method: bytes, uri: bytes, req_hdrs: RawHeaderListType) -> None:
+        pass
+
+    def request_body(self, chunk: bytes) -> None:
+        pass
+
+    def request_done(self, trailers: RawHeaderListType) -> None:
+        self._scheduled = thor.schedule(0, self._replay)
+
+    def _replay(self) -> None:
+        self._scheduled = None
+        recorded = self.recorded
+        self.emit('response_start', recorded.status, recorded.phrase, list(recorded.headers))
+        for chunk in recorded.chunks:
+            if self.aborted:
+                return
+            self.emit('response_body', chunk)
+        if not self.aborted:
+            self.emit('response_done', [])
+
+    def abort(self) -> None:
+        "Stop replaying."
+        self.aborted = True
+        if self._scheduled:
+            self._scheduled.delete()
+            self._scheduled = None
+
+
+def replay_resource(recording: Recording, recorded: RecordedExchange,
+                    descend: bool=False) -> HttpResource:
+    "Return a HttpResource that will check recorded (and anything it needs) from recording."
+    resource = HttpResource(descend=descend)
+    resource.set_request(recorded.uri, recorded.method, list(recorded.req_headers),
+                         recorded.req_body)
+    resource.replay = recording
+    return resource
+
+
+class ReplayChecker(BatchChecker):
+    """
+    Check every exchange in a Recording, as BatchChecker does for URLs.
+    """
+    def __init__(self, recording: Recording, concurrency: int=10, descend: bool=False) -> None:
+        BatchChecker.__init__(self, concurrency=concurrency, descend=descend)
+        self.recording = recording
+
+    def resources(self) -> Iterator[HttpResource]:
+        for recorded in self.recording.exchanges:
+            yield replay_resource(self.recording, recorded, self.descend)
+
+
+def load(path: str) -> List[RecordedExchange]:
+    """
+    Read the exchanges recorded in the file at path; either a HAR file (if it ends in .har or
+    looks like JSON) or a raw HTTP transcript.
+    """
+    with open(path, 'rb') as fd:
+        data = fd.read()
+    if path.lower().endswith(".har") or data.lstrip()[:1] == b"{":
+        try:
+            har = json.loads(data.decode('utf-8-sig'))
+        except (ValueError, UnicodeDecodeError) as why:
+            raise ReplayFormatError("Not a HAR file: %s" % why)
+        return load_har(har)
+    return load_transcript(data)
+
+
+def load_har(har: Dict[str, Any]) -> List[RecordedExchange]:
+    "Return the exchanges recorded in a parsed HAR file."
+    try:
+        entries = har['log']['entries']
+    except (KeyError, TypeError):
+        raise ReplayFormatError("HAR file has no entries")
+    exchanges = []
+    for entry in entries:
+        try:
+            exchanges.append(_har_exchange(entry))
+        except (KeyError, TypeError, ValueError) as why:
+            raise ReplayFormatError("Bad HAR entry: %s" % why)
+    return exchanges
+
+
+def _har_exchange(entry: Dict[str, Any]) -> RecordedExchange:
+    request, response = entry['request'], entry['response']
+    req_headers = [(hdr['name'], hdr['value']) for hdr in request.get('headers', [])
+                   if not hdr['name'].startswith(':')]
+    req_body = None # type: Union[bytes, None]
+    if request.get('postData', {}).get('text') is not None:
+        req_body = request['postData']['text'].encode('utf-8')
+    headers = [(hdr['name'].encode('latin-1'), hdr['value'].encode('latin-1'))
+               for hdr in response.get('headers', []) if not hdr['name'].startswith(':')]
+    content = response.get('content', {})
+    body, body_recorded = b"", True
+    if content.get('text') is not None:
+        if content.get('encoding') == "base64":
+            body = b64decode(content['text'])
+        else:
+            body = content['text'].encode('utf-8')
+        codings = [coding.strip().lower()
+                   for value in _header_values(headers, b'content-encoding')
+                   for coding in value.decode('latin-1').split(",")]
+        for coding in codings:
+            if coding in ['', 'identity']:
+                continue
+            body_recorded = False
+            body = _encode(coding, body)
+    elif content.get('size', 0) > 0:
+        body_recorded = False
+    timings = entry.get('timings', {})
+    wait = sum([max(timings.get(phase, 0), 0)
+                for phase in ['blocked', 'dns', 'connect', 'send', 'wait']]) / 1000
+    version = re.search(r"(\d+(?:\.\d+)?)", response.get('httpVersion', "")) # type: Any
+    return RecordedExchange(
+        request['method'], request['url'], req_headers, req_body,
+        version.group(1).encode('ascii') if version else b"1.1",
+        str(response['status']).encode('ascii'),
+        response.get('statusText', "").encode('latin-1', 'replace'),
+        headers,
+        [body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)],
+        _parse_iso_date(entry['startedDateTime']),
+        max(entry.get('time', 0), 0) / 1000,
+        wait,
+        body_recorded)
+
+
+def _encode(coding: str, body: bytes) -> bytes:
+    "Apply a content-coding to body."
+    if coding in ['gzip', 'x-gzip']:
+        return gzip.compress(body)
+    if coding == 'deflate':
+        return zlib.compress(body)
+    if coding == 'br' and brotli is not None:
+        return brotli.compress(body)
+    return body # we can't; REDbot won't be able to decode it either.
+
+
+ISO_DATE = re.compile(
+    r"^(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(\.\d+)?(Z|[+-]\d\d:?\d\d)?$")
+
+def _parse_iso_date(value: str) -> float:
+    "Parse a HAR (ISO 8601) date into seconds since the epoch."
+    match = ISO_DATE.match(value.strip())
+    if not match:
+        raise ValueError("Bad date: %s" % value)
+    timestamp = timegm(tuple([int(part) for part in match.groups()[:6]])) # type: float
+    if match.group(7):
+        timestamp += float(match.group(7))
+    offset = match.group(8)
+    if offset and offset != "Z":
+        sign = -1 if offset[0] == "-" else 1
+        offset = offset[1:].replace(":", "")
+        timestamp -= sign * (int(offset[:2]) * 3600 + int(offset[2:]) * 60)
+    return timestamp
+
+
+def load_transcript(data: bytes, start_time: float=None) -> List[RecordedExchange]:
+    """
+    Return the exchanges in a raw HTTP/1.x transcript: one or more requests, each followed by its
+    response(s), as they were sent on a connection. Requests in origin-form are assumed to be
+    for http:// URIs.
+
+    Each exchange's time is taken from start_time if given, or else its response's Date header.
+    """
+    exchanges = []
+    rest = data
+    while rest.strip():
+        (method, target, _), req_raw_headers, rest = _read_head(rest.lstrip(b"\r\n"))
+        req_body, rest = _read_body(req_raw_headers, rest, is_request=True)
+        while True:
+            (version, status, phrase), headers, rest = _read_head(rest)
+            if not status.startswith(b"1") or status == b"101":
+                break # skip non-final responses
+        if method == b"HEAD" or status[:1] == b"1" or status in [b"204", b"304"]:
+            body = b""
+        else:
+            body, rest = _read_body(headers, rest, is_request=False)
+        uri = target.decode('ascii', 'replace')
+        if uri.startswith("/"):
+            host = (_header_values(req_raw_headers, b'host') or [b""])[0]
+            uri = "http://%s%s" % (host.decode('ascii', 'replace'), uri)
+        when = start_time
+        if when is None:
+            date = parsedate_tz((_header_values(headers, b'date') or [b""])[0].decode('latin-1'))
+            when = mktime_tz(date) if date else thor.time()
+        exchanges.append(RecordedExchange(
+            method.decode('ascii', 'replace'), uri,
+            [(name.decode('latin-1'), value.decode('latin-1'))
+             for (name, value) in req_raw_headers],
+            req_body or None,
+            version.split(b"/", 1)[-1], status, phrase, headers,
+            [body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)],
+            when))
+    return exchanges
+
+
+HEAD_END = re.compile(b"\r?\n\r?\n")
+
+def _read_head(data: bytes) -> Tuple[List[bytes], RawHeaderListType, bytes]:
+    "Read a message head from data; return the start line's parts, the headers and the rest."
+    match = HEAD_END.search(data)
+    if not match:
+        raise ReplayFormatError("Transcript ends in the middle of a message head")
+    lines = data[:match.start()].splitlines()
+    start_line = lines[0].split(None, 2)
+    if len(start_line) < 2:
+        raise ReplayFormatError("Bad start line: %r" % lines[0][:80])
+    if len(start_line) == 2:
+        start_line.append(b"")
+    headers = [] # type: RawHeaderListType
+    for line in lines[1:]:
+        if line[:1] in [b" ", b"\t"] and headers:
+            name, value = headers.pop()
+            headers.append((name, value + b" " + line.strip()))
+        elif b":" in line:
+            name, value = line.split(b":", 1)
+            headers.append((name.strip(), value.strip()))
+    return start_line, headers, data[match.end():]
+
+
+def _read_body(headers: RawHeaderListType, data: bytes,
+               is_request: bool) -> Tuple[bytes, bytes]:
+    "Read a message body from data, as framed by headers; return it and the rest."
+    codings = b",".join(_header_values(headers, b'transfer-encoding')).lower()
+    if codings.rstrip().endswith(b"chunked"):
+        return _dechunk(data)
+    lengths = _header_values(headers, b'content-length')
+    if lengths:
+        try:
+            length = int(lengths[0])
+        except ValueError:
+            raise ReplayFormatError("Bad Content-Length: %r" % lengths[0][:40])
+        return data[:length], data[length:]
+    if is_request:
+        return b"", data
+    return data, b""  # delimited by the connection closing
+
+
+def _dechunk(data: bytes) -> Tuple[bytes, bytes]:
+    "Remove chunked transfer-coding from data; return the body and the rest."
+    body = [] # type: List[bytes]
+    while True:
+        line_end = data.find(b"\n")
+        if line_end < 0:
+            raise ReplayFormatError("Transcript ends in the middle of a chunked body")
+        try:
+            size = int(data[:line_end].split(b";", 1)[0].strip(), 16)
+        except ValueError:
+            raise ReplayFormatError("Bad chunk size: %r" % data[:min(line_end, 40)])
+        data = data[line_end + 1:]
+        if size == 0:
+            match = re.match(b"(?:[^\r\n]+\r?\n)*\r?\n", data)  # trailers
+            return b"".join(body), data[match.end():] if match else b""
+        body.append(data[:size])
+        data = data[size:]
+        if data[:2] == b"\r\n":
+            data = data[2:]
+        elif data[:1] == b"\n":
+            data = data[1:]
+
+
+def _header_values(headers: RawHeaderListType, name: bytes) -> List[bytes]:
+    return [value for (hdr_name, value) in headers if hdr_name.lower() == name]
+
+
+def _uri_key(uri: str) -> str:
+    "Normalise uri for looking up exchanges, as HttpRequest.set_iri does."
+    try:
+        return urldefrag(HttpRequest.iri_to_uri(uri))[0]
+    except (ValueError, UnicodeError):
+        return uri
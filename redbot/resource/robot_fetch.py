@@ -6,16 +6,16 @@ REDbot Robot Fetcher.
 Fetches robots.txt for a given URL.
 """
 
-import hashlib
+from collections import OrderedDict
 from os import path
-from typing import Union
+from typing import Dict, Tuple, Union
 from urllib.robotparser import RobotFileParser
 from urllib.parse import urlsplit
 
 import thor
 
 from redbot import __version__
-from redbot.cache_file import CacheFile
+from redbot.cache_file import CacheDb
 from redbot.type import RawHeaderListType
 
 UA_STRING = "RED/%s (https://redbot.org/)" % __version__
@@ -29,9 +29,11 @@ class RobotFetcher(thor.events.EventEmitter):
     response_phrase = "The robots.txt response"
     freshness_lifetime = 30 * 60
     client = thor.http.HttpClient()
-    robot_checkers = {} # type: Dict[str, RobotChecker]  # cache of robots.txt checkers
+    robot_checkers = OrderedDict() # type: Dict[str, Tuple[float, RobotChecker]]  # LRU, by origin
+    max_robot_checkers = 10000  # how many robots.txt checkers to keep in memory
     robot_cache_dir = None # type: str
     robot_lookups = {} # type: Dict[str, set]
+    _robot_db = None # type: CacheDb
 
     def check_robots(self, url: str, sync: bool=False) -> Union[bool, None]:
         """
@@ -40,9 +42,8 @@ class RobotFetcher(thor.events.EventEmitter):
         When sync is true, the result is returned. Sync does not go to network; if
         there is not a local (memory or cache) robots.txt, it will return True.
 
-        When it's false, the "robot" event will be emitted, with two arguments:
-          - the URL
-          - True if it's allowed, False if not
+        When it's false, the "robot-<url>" event will be emitted with True if it's allowed,
+        False if not. Its listeners are removed once it has been emitted, so use on(), not once().
         """
 
         origin = url_to_origin(url)
@@ -50,19 +51,20 @@ class RobotFetcher(thor.events.EventEmitter):
             if sync:
                 return True
             else:
-                self.emit("robot-%s" % url, True)
+                self._emit_result(url, True)
                 return None
-        origin_hash = hashlib.sha1(origin.encode('ascii', 'replace')).hexdigest()
 
-        if origin in self.robot_checkers:
-            return self._robot_check(url, self.robot_checkers[origin], sync)
+        checker = self._get_checker(origin)
+        if checker is not None:
+            return self._robot_check(url, checker, sync)
 
-        if self.robot_cache_dir:
-            robot_fd = CacheFile(path.join(self.robot_cache_dir, origin_hash))
-            cached_robots_txt = robot_fd.read()
-            if cached_robots_txt != None:
-                self._load_checker(origin, cached_robots_txt)
-                return self._robot_check(url, self.robot_checkers[origin], sync)
+        robot_db = self._get_db()
+        if robot_db:
+            cached = robot_db.read(origin)
+            if cached is not None:
+                cached_robots_txt, expires = cached
+                checker = self._load_checker(origin, cached_robots_txt, expires)
+                return self._robot_check(url, checker, sync)
 
         if sync:
             return True
@@ -88,17 +90,17 @@ class RobotFetcher(thor.events.EventEmitter):
                 else:
                     robots_txt = exchange.res_body
 
-                self._load_checker(origin, robots_txt)
-                if self.robot_cache_dir:
-                    robot_fd = CacheFile(path.join(self.robot_cache_dir, origin_hash))
-                    robot_fd.write(robots_txt, self.freshness_lifetime)
+                checker = self._load_checker(origin, robots_txt)
+                robot_db = self._get_db()
+                if robot_db:
+                    robot_db.write(origin, robots_txt, self.freshness_lifetime)
 
                 while True:
                     try:
                         check_url = self.robot_lookups[origin].pop()
                     except KeyError:
                         break
-                    self._robot_check(check_url, self.robot_checkers[origin])
+                    self._robot_check(check_url, checker)
                 del self.robot_lookups[origin]
 
             @thor.on(exchange)
@@ -112,20 +114,44 @@ class RobotFetcher(thor.events.EventEmitter):
                                    [(b'User-Agent', UA_STRING.encode('ascii'))])
             exchange.request_done([])
 
-    def _load_checker(self, origin: str, robots_txt: bytes) -> None:
-        """Load a checker for an origin, given its robots.txt file."""
-        if robots_txt == "": # empty or non-200
+    def _get_db(self) -> Union[CacheDb, None]:
+        """Return the on-disk robots.txt cache, if there is one."""
+        if not self.robot_cache_dir:
+            return None
+        db_path = path.join(self.robot_cache_dir, "robots.sqlite")
+        if RobotFetcher._robot_db is None or RobotFetcher._robot_db.path != db_path:
+            RobotFetcher._robot_db = CacheDb(db_path)
+        return RobotFetcher._robot_db
+
+    def _get_checker(self, origin: str) -> Union[RobotChecker, None]:
+        """Return a fresh checker for origin from memory, or None."""
+        try:
+            expires, checker = self.robot_checkers[origin]
+        except KeyError:
+            return None
+        if expires <= thor.time():
+            del self.robot_checkers[origin]
+            return None
+        self.robot_checkers.move_to_end(origin)
+        return checker
+
+    def _load_checker(self, origin: str, robots_txt: bytes, expires: float=None) -> RobotChecker:
+        """
+        Load a checker for an origin, given its robots.txt file. It's kept in memory until
+        expires, or for freshness_lifetime if that isn't given.
+        """
+        if robots_txt == b"": # empty or non-200
             checker = DummyChecker() # type: RobotChecker
         else:
             checker = RobotFileParser()
             checker.parse(robots_txt.decode('ascii', 'replace').splitlines())
-        self.robot_checkers[origin] = checker
-        def del_checker() -> None:
-            try:
-                del self.robot_checkers[origin]
-            except:
-                pass
-        thor.schedule(self.freshness_lifetime, del_checker)
+        if expires is None:
+            expires = thor.time() + self.freshness_lifetime
+        self.robot_checkers[origin] = (expires, checker)
+        self.robot_checkers.move_to_end(origin)
+        while len(self.robot_checkers) > self.max_robot_checkers:
+            self.robot_checkers.popitem(last=False)
+        return checker
 
     def _robot_check(self, url: str, robots_checker: RobotChecker,
                      sync: bool=False) -> Union[bool, None]:
@@ -134,8 +160,19 @@ class RobotFetcher(thor.events.EventEmitter):
         if sync:
             return result
         else:
-            self.emit("robot-%s" % url, result)
+            self._emit_result(url, result)
 
+    def _emit_result(self, url: str, result: bool) -> None:
+        """
+        Tell the listeners for url whether it can be fetched, removing them first; if listeners
+        removed themselves while the event was emitted, others waiting for the same url would be
+        skipped.
+        """
+        event = "robot-%s" % url
+        listeners = list(self.listeners(event))
+        self.removeListeners(event)
+        for listener in listeners:
+            listener(result)
 
 
 def url_to_origin(url: str) -> Union[str, None]:
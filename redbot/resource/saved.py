@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+
+"""
+Saved test results.
+
+Rather than pickling a whole HttpResource (with all of its event emitters, parsers and child
+fetchers), save() writes just what the formatters need, as JSON lines:
+
+  - a header line, carrying the format version and the tags of any linked resources,
+  - one line for the resource itself, and
+  - one line for each linked resource, in the same order as their tags.
+
+load() returns a SavedResource that looks enough like a finished HttpResource to be bound to a
+formatter. Each record is only decoded when one of its attributes is first used, so rendering a
+saved descend result doesn't pay for linked resources that aren't shown.
+"""
+
+from base64 import b64decode, b64encode
+from importlib import import_module
+import json
+from typing import Any, Callable, Dict, IO, List, Tuple, Type # pylint: disable=unused-import
+
+import thor.http.error as httperr
+
+from redbot.speak import Note
+
+FORMAT_NAME = "redbot-saved"
+FORMAT_VERSION = 1
+
+REQUEST_FIELDS = ['method', 'uri', 'iri', 'version', 'headers', 'start_time', 'complete']
+RESPONSE_FIELDS = [
+    'version', 'status_code', 'status_phrase', 'headers', 'parsed_headers', 'base_uri',
+    'is_head_response', 'complete', 'start_time', 'complete_time', 'header_length',
+    'payload_len', 'payload_truncated', 'decoded_len', 'transfer_length', 'character_encoding',
+    'decoded_sample_complete', 'freshness_lifetime', 'age', 'store_shared', 'store_private']
+BYTES_FIELDS = ['decoded_sample', 'payload']
+RESOURCE_FIELDS = [
+    'check_name', 'descend', 'partial_support', 'inm_support', 'ims_support', 'gzip_support',
+    'gzip_savings', 'coding_support', 'coding_savings', 'link_count', 'transfer_in',
+    'transfer_out']
+
+
+class SavedFormatError(ValueError):
+    "The saved result isn't in a format that we can read."
+    pass
+
+
+def save(resource: Any, fd: IO[bytes]) -> None:
+    """
+    Write a finished HttpResource (and any linked resources) to the binary file-like fd.
+    """
+    linked = getattr(resource, 'linked', [])
+    header = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'linked': [tag for (linked_resource, tag) in linked]
+    }
+    fd.write(_dump_line(header))
+    fd.write(_dump_line(_resource_record(resource, full=True)))
+    for linked_resource, tag in linked:
+        fd.write(_dump_line(_resource_record(linked_resource, full=False)))
+
+
+def load(fd: IO[bytes]) -> 'SavedResource':
+    """
+    Read a saved result from the binary file-like fd, returning a SavedResource.
+
+    Raises SavedFormatError if fd doesn't contain a saved result in a version we understand.
+    """
+    lines = fd.read().split(b"\n")
+    try:
+        header = json.loads(lines[0].decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise SavedFormatError("Not a saved result")
+    if not isinstance(header, dict) or header.get('format') != FORMAT_NAME:
+        raise SavedFormatError("Not a saved result")
+    if header.get('version') != FORMAT_VERSION:
+        raise SavedFormatError("Unsupported saved result version %s" % header.get('version'))
+    tags = header.get('linked', [])
+    if len(lines) < len(tags) + 2:
+        raise SavedFormatError("Saved result is truncated")
+    resource = SavedResource(lines[1])
+    resource.linked = [(SavedResource(line), tag) for (line, tag) in zip(lines[2:], tags)]
+    return resource
+
+
+class SavedMessage(object):
+    """
+    A saved HTTP request or response, with the attributes of HttpMessage that formatters use.
+    """
+    def __init__(self, record: Dict[str, Any]) -> None:
+        self.method = None              # type: str
+        self.uri = None                 # type: str
+        self.iri = None                 # type: str
+        self.version = ""               # type: str
+        self.status_code = None         # type: str
+        self.status_phrase = ""         # type: str
+        self.headers = []               # type: List[Tuple[str, str]]
+        self.parsed_headers = {}        # type: Dict[str, Any]
+        self.base_uri = ""              # type: str
+        self.is_head_response = False   # type: bool
+        self.complete = False           # type: bool
+        self.start_time = None          # type: float
+        self.complete_time = None       # type: float
+        self.header_length = 0          # type: int
+        self.payload = b""              # type: bytes
+        self.payload_len = 0            # type: int
+        self.payload_truncated = False  # type: bool
+        self.decoded_sample = b""       # type: bytes
+        self.decoded_sample_complete = True # type: bool
+        self.decoded_len = 0            # type: int
+        self.transfer_length = 0        # type: int
+        self.character_encoding = None  # type: str
+        self.freshness_lifetime = None  # type: int
+        self.age = None                 # type: int
+        self.store_shared = None        # type: bool
+        self.store_private = None       # type: bool
+        self.http_error = None          # type: httperr.HttpError
+        for field in REQUEST_FIELDS + RESPONSE_FIELDS:
+            if field in record:
+                setattr(self, field, record[field])
+        self.headers = [tuple(hdr) for hdr in self.headers] # type: ignore
+        for field in BYTES_FIELDS:
+            if field in record:
+                setattr(self, field, b64decode(record[field]))
+        if record.get('http_error'):
+            self.http_error = _load_error(*record['http_error'])
+
+
+class SavedFetch(object):
+    """
+    A saved RedFetcher (e.g., an active check's subrequest).
+    """
+    check_done = True
+
+    def __init__(self, record: Dict[str, Any]) -> None:
+        self.check_name = record.get('check_name')
+        self.fetch_started = record.get('fetch_started', True)
+        self.notes = _load_notes(record.get('notes', []))
+        self.request = SavedMessage(record.get('request', {}))
+        self.response = SavedMessage(record.get('response', {}))
+        self.nonfinal_responses = [SavedMessage(r) for r in record.get('nonfinal', [])]
+
+
+class SavedResource(object):
+    """
+    A saved HttpResource. Its record is decoded the first time any attribute is used.
+    """
+    check_done = True
+
+    def __init__(self, line: bytes) -> None:
+        self._line = line
+        self.linked = []  # type: List[Tuple[SavedResource, str]]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_') or '_line' not in self.__dict__:
+            raise AttributeError(name)
+        self._decode()
+        return object.__getattribute__(self, name)
+
+    def _decode(self) -> None:
+        "Decode our record and populate attributes."
+        try:
+            record = json.loads(self._line.decode('utf-8'))
+        except (ValueError, UnicodeDecodeError):
+            raise SavedFormatError("Corrupt saved resource")
+        del self._line
+        for field in RESOURCE_FIELDS:
+            setattr(self, field, record.get(field))
+        self.notes = _load_notes(record.get('notes', []))
+        self.request = SavedMessage(record.get('request', {}))
+        self.response = SavedMessage(record.get('response', {}))
+        self.nonfinal_responses = [SavedMessage(r) for r in record.get('nonfinal', [])]
+        self.subreqs = {name: SavedFetch(sub) for (name, sub) in record.get('subreqs', {}).items()}
+        self.links = record.get('links', {})
+
+
+def _dump_line(obj: Any) -> bytes:
+    "Serialise obj as a single line of JSON. Anything JSON can't represent is stringified."
+    return json.dumps(obj, separators=(',', ':'), default=str).encode('utf-8') + b"\n"
+
+
+def _message_record(message: Any, fields: List[str], full: bool) -> Dict[str, Any]:
+    "Summarise a HttpMessage as a dictionary."
+    record = {field: getattr(message, field) for field in fields \
+              if hasattr(message, field)} # type: Dict[str, Any]
+    if full:
+        for field in BYTES_FIELDS:
+            value = getattr(message, field, b"")
+            if value:
+                record[field] = b64encode(value).decode('ascii')
+    if getattr(message, 'http_error', None) is not None:
+        error = message.http_error
+        record['http_error'] = ("%s:%s" % (error.__class__.__module__, error.__class__.__name__),
+                                error.detail)
+    return record
+
+
+def _fetch_record(fetch: Any, full: bool) -> Dict[str, Any]:
+    "Summarise a RedFetcher as a dictionary."
+    return {
+        'check_name': fetch.check_name,
+        'fetch_started': fetch.fetch_started,
+        'notes': [_note_record(note) for note in fetch.notes],
+        'request': _message_record(fetch.request, REQUEST_FIELDS, False),
+        'response': _message_record(fetch.response, RESPONSE_FIELDS, full),
+        'nonfinal': [_message_record(r, RESPONSE_FIELDS, False) for r in fetch.nonfinal_responses]
+    }
+
+
+def _resource_record(resource: Any, full: bool) -> Dict[str, Any]:
+    """
+    Summarise a HttpResource as a dictionary. If full is false, body samples and subrequests are
+    omitted; this is used for linked resources, which are only ever shown in summary.
+    """
+    record = _fetch_record(resource, full)
+    for field in RESOURCE_FIELDS:
+        record[field] = getattr(resource, field, None)
+    if full:
+        record['subreqs'] = {name: _fetch_record(sub, True) \
+                             for (name, sub) in getattr(resource, 'subreqs', {}).items()}
+        record['links'] = {tag: sorted(links) \
+                           for (tag, links) in getattr(resource, 'links', {}).items()}
+    return record
+
+
+def _note_record(note: Note) -> Tuple[str, str, Dict[str, Any]]:
+    "Summarise a Note as its class, subject and vars."
+    return ("%s:%s" % (note.__class__.__module__, note.__class__.__name__), note.subject, note.vars)
+
+
+_saved_classes = {} # type: Dict[str, Type[Note]]
+def _find_class(path: str) -> Any:
+    "Given a 'module:name' path, return the class it names, or None."
+    if path not in _saved_classes:
+        module_name, _, class_name = path.partition(":")
+        try:
+            module = import_module(module_name)
+        except ImportError:
+            _saved_classes[path] = None
+        else:
+            _saved_classes[path] = getattr(module, class_name, None)
+    return _saved_classes[path]
+
+
+def _load_notes(records: List[Tuple[str, str, Dict[str, Any]]]) -> List[Note]:
+    "Rebuild Notes from their records, skipping any that no longer exist."
+    notes = []
+    for path, subject, vrs in records:
+        note_class = _find_class(path)
+        if note_class is None:
+            continue
+        notes.append(note_class(subject, vrs))
+    return notes
+
+
+def _load_error(path: str, detail: str) -> httperr.HttpError:
+    "Rebuild a HttpError from its record."
+    error_class = _find_class(path)
+    if error_class is None or not issubclass(error_class, httperr.HttpError):
+        error_class = httperr.HttpError
+    return error_class(detail)
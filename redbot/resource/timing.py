@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+"""
+Per-phase timing for fetches and checks.
+
+Each RedFetcher has a PhaseTimer in .timing, which records when each phase of its work started
+and ended (e.g., the robots.txt lookup, waiting for the first byte, processing headers), along
+with the CPU time spent in the phases that REDbot does itself.
+
+To watch phases as they finish, add a callable to phase_hooks; it will be called with the
+fetcher and the Phase. To profile whole checks, see CheckProfiler.
+"""
+
+import cProfile
+import pstats
+import time
+from typing import Any, Callable, Dict, IO, Iterator, List, Union # pylint: disable=unused-import
+from contextlib import contextmanager
+
+import thor
+
+# Callables to tell about each phase as it finishes; called with (fetcher, phase).
+phase_hooks = [] # type: List[Callable[[Any, Phase], None]]
+
+# CPU time used by phases nested inside the ones currently running, innermost last.
+_nested_cpu = [] # type: List[float]
+
+
+class Phase(object):
+    """
+    A phase of a fetch or check.
+
+    start and end are wall-clock times; cpu is the CPU time spent in it, or None if it's a
+    phase spent waiting on something else (e.g., the network). cpu doesn't include time spent in
+    phases nested inside it (e.g., starting subrequests when the headers are processed), even if
+    they belong to another fetcher.
+
+    A phase that runs more than once (e.g., processing each body chunk) covers the first start to
+    the last end, and its cpu is the total; count is how many times it ran.
+    """
+    def __init__(self, name: str, start: float) -> None:
+        self.name = name
+        self.start = start
+        self.end = None     # type: float
+        self.cpu = None     # type: float
+        self.count = 0
+
+    def __repr__(self) -> str:
+        return "<Phase %s %s>" % (self.name, self.record())
+
+    @property
+    def elapsed(self) -> Union[float, None]:
+        "Wall-clock seconds from start to end, or None if the phase hasn't finished."
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def record(self) -> Dict[str, Any]:
+        "Summarise the phase as a dictionary."
+        return {'start': self.start, 'elapsed': self.elapsed, 'cpu': self.cpu,
+                'count': self.count}
+
+
+class PhaseTimer(object):
+    """
+    Records the phases of a fetcher's work, in the order that they started.
+    """
+    def __init__(self, owner: Any) -> None:
+        self.owner = owner
+        self.phases = {} # type: Dict[str, Phase]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state['owner']
+        return state
+
+    def __iter__(self) -> Iterator[Phase]:
+        return iter(sorted(self.phases.values(), key=lambda phase: phase.start))
+
+    def __getitem__(self, name: str) -> Phase:
+        return self.phases[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.phases
+
+    def start(self, name: str, when: float=None) -> None:
+        "Note that phase name has started (if it hasn't already)."
+        if name not in self.phases:
+            self.phases[name] = Phase(name, when or thor.time())
+
+    def end(self, name: str, when: float=None) -> None:
+        "Note that phase name has ended. If it hasn't been started, nothing happens."
+        phase = self.phases.get(name)
+        if phase is None:
+            return
+        phase.end = when or thor.time()
+        phase.count += 1
+        self._done(phase)
+
+    def span(self, name: str, start: float, end: float) -> None:
+        "Record a waiting phase from start to end."
+        self.start(name, start)
+        self.end(name, end)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        "Time the CPU-bound work in the with block as phase name."
+        self.start(name)
+        cpu_start = time.process_time()
+        _nested_cpu.append(0.0)
+        try:
+            yield
+        finally:
+            cpu = time.process_time() - cpu_start
+            nested = _nested_cpu.pop()
+            if _nested_cpu:
+                _nested_cpu[-1] += cpu
+            phase = self.phases[name]
+            phase.cpu = (phase.cpu or 0) + cpu - nested
+            self.end(name)
+
+    def record(self) -> Dict[str, Dict[str, Any]]:
+        "Summarise the phases as a dictionary, by name."
+        return {phase.name: phase.record() for phase in self}
+
+    def _done(self, phase: Phase) -> None:
+        for hook in phase_hooks:
+            hook(self.owner, phase)
+
+
+class CheckProfiler(object):
+    """
+    Run cProfile for the duration of a HttpResource's check.
+
+    Since checks are interleaved in the event loop, anything else that's running at the same
+    time will be profiled too; for clean results, profile one check at a time. The resource calls
+    stop() when its check is done.
+    """
+    def __init__(self) -> None:
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self) -> None:
+        "Stop profiling."
+        self.profile.disable()
+
+    def stats(self, out: IO[str]=None) -> pstats.Stats:
+        "Return the profile's statistics, writing reports to out if given."
+        return pstats.Stats(self.profile, stream=out)
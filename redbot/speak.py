@@ -11,13 +11,18 @@ it need to be escaped to be safe for use in HTML.
 from binascii import b2a_hex
 from cgi import escape as cgi_escape
 from enum import Enum
-from functools import partial
-from typing import Any, Dict, Union
+from functools import lru_cache, partial
+from typing import Any, Dict, Tuple, Union
 
 from markdown import markdown
 
+from redbot.type import SlottedType
+
 e_html = partial(cgi_escape, quote=True)
 
+# How many rendered note texts to keep around.
+NOTE_TEXT_CACHE_SIZE = 2048
+
 class categories(Enum):
     "Note classifications."
     GENERAL = "General"
@@ -35,11 +40,15 @@ class levels(Enum):
     BAD = 'bad'
     INFO = 'info'
 
-class Note(object):
+class Note(object, metaclass=SlottedType):
     """
     A note about an HTTP resource, representation, or other component
     related to the URI under test.
+
+    There can be a great many of these, so they're slotted; subclasses shouldn't add instance
+    attributes.
     """
+    __slots__ = ('subject', 'vars')
     category = None # type: categories
     level = None # type: levels
     summary = ""
@@ -48,6 +57,14 @@ class Note(object):
         self.subject = subject
         self.vars = vrs or {}
 
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'subject': self.subject, 'vars': self.vars}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        # also reads notes pickled before they were slotted, whose state was their __dict__
+        self.subject = state['subject']
+        self.vars = state['vars']
+
     def __eq__(self, other: Any) -> bool:
         return bool(self.__class__ == other.__class__ \
            and self.vars == other.vars \
@@ -68,9 +85,20 @@ class Note(object):
 
         The resulting string is already HTML-encoded.
         """
-        return markdown(self.text % dict(
-            [(k, e_html(str(v))) for k, v in list(self.vars.items())]
-        ), output_format="html5")
+        return render_note_text(self.text, tuple(sorted(
+            [(k, str(v)) for k, v in list(self.vars.items())]
+        )))
+
+
+@lru_cache(maxsize=NOTE_TEXT_CACHE_SIZE)
+def render_note_text(text: str, vrs: Tuple[Tuple[str, str], ...]) -> str:
+    """
+    Render a note's text template as HTML, given its vars as sorted (name, str value) pairs.
+
+    The same notes turn up again and again (especially when descending), so results are kept in
+    an LRU cache; see render_note_text.cache_info() for hit rates.
+    """
+    return markdown(text % dict([(k, e_html(v)) for k, v in vrs]), output_format="html5")
 
 
 def display_bytes(inbytes: bytes, encoding: str='utf-8', truncate: int=40) -> str:
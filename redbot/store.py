@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+"""
+A store of check results, for finding out what REDbot said about a URL (or about a lot of URLs)
+in the past.
+
+ResultStore keeps a summary of each check -- the URL, when it was checked, the status, sizes and
+timings, and the class name, subject and level of each note -- in a sqlite database, indexed by
+URL, time and note, so that questions like "which URLs got FRESHNESS_NONE last night?" can be
+answered without loading saved results.
+"""
+
+import os
+import sqlite3
+from typing import Any, Dict, List, Tuple, TYPE_CHECKING
+
+import thor
+
+if TYPE_CHECKING:
+    from redbot.resource import HttpResource # pylint: disable=cyclic-import,unused-import
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS checks ("
+    "id INTEGER PRIMARY KEY, parent INTEGER, uri TEXT, checked REAL, status TEXT, "
+    "complete INTEGER, error TEXT, payload_len INTEGER, transfer_in INTEGER, "
+    "transfer_out INTEGER, elapsed REAL, test_id TEXT)",
+    "CREATE TABLE IF NOT EXISTS notes ("
+    "check_id INTEGER, note TEXT, subject TEXT, level TEXT)",
+    "CREATE INDEX IF NOT EXISTS checks_uri ON checks (uri, checked)",
+    "CREATE INDEX IF NOT EXISTS checks_checked ON checks (checked)",
+    "CREATE INDEX IF NOT EXISTS notes_note ON notes (note, check_id)",
+    "CREATE INDEX IF NOT EXISTS notes_check ON notes (check_id, note, level)"]
+
+CHECK_FIELDS = ['id', 'parent', 'uri', 'checked', 'status', 'complete', 'error', 'payload_len',
+                'transfer_in', 'transfer_out', 'elapsed', 'test_id']
+NOTE_FIELDS = ['note', 'subject', 'level']
+
+
+class ResultStore(object):
+    """
+    Check results in a single sqlite file. It can be shared by several processes (e.g., the
+    workers of the Web UI, or several batch runs).
+
+    Unlike CacheDb, errors are not discarded; callers that don't want to fail because results
+    can't be stored should catch sqlite3.Error.
+    """
+    def __init__(self, my_path: str) -> None:
+        self.path = my_path
+        self._conn = None # type: sqlite3.Connection
+        self._pid = None  # type: int
+
+    def _connect(self) -> sqlite3.Connection:
+        "Get a connection for this process, creating the database if necessary."
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def record(self, resource: 'HttpResource', test_id: str=None) -> int:
+        """
+        Store the results of a finished HttpResource (and of any linked resources, which refer to
+        it as their parent), returning the id of its check.
+        """
+        # imported here so that querying doesn't have to load everything needed for checking.
+        from redbot.batch import result_record # pylint: disable=cyclic-import
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            check_id = self._insert(conn, resource, result_record(resource), None, test_id)
+            conn.execute("COMMIT")
+        except:
+            conn.execute("ROLLBACK")
+            raise
+        return check_id
+
+    def _insert(self, conn: sqlite3.Connection, resource: 'HttpResource', record: Dict[str, Any],
+                parent: int, test_id: str) -> int:
+        "Insert a result_record for resource, and those of its linked resources."
+        checked = resource.request.start_time or thor.time()
+        cursor = conn.execute(
+            "INSERT INTO checks (parent, uri, checked, status, complete, error, payload_len, "
+            "transfer_in, transfer_out, elapsed, test_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (parent, record['uri'], checked, record['status'], record['complete'],
+             record.get('error'), record['payload_len'], record['transfer_in'],
+             record['transfer_out'], record.get('time'), test_id))
+        check_id = cursor.lastrowid
+        conn.executemany("INSERT INTO notes (check_id, note, subject, level) VALUES (?, ?, ?, ?)",
+                         [(check_id, note['note'], note['subject'], note['level'])
+                          for note in record['notes']])
+        linked = [linked for (linked, tag) in getattr(resource, 'linked', [])]
+        for linked_resource, linked_record in zip(linked, record.get('linked', [])):
+            self._insert(conn, linked_resource, linked_record, check_id, test_id)
+        return check_id
+
+    def checks(self, uri: str=None, note: str=None, level: str=None, since: float=None,
+               until: float=None, status: str=None, top_only: bool=False,
+               limit: int=None) -> List[Dict[str, Any]]:
+        """
+        Return stored checks, most recent first, as dictionaries with the keys in CHECK_FIELDS.
+
+        uri, status and note (a Note class name, e.g. 'FRESHNESS_NONE') select checks with that
+        value; level only counts notes at that level (e.g., 'bad'). since and until are unix times;
+        top_only leaves out linked resources.
+        """
+        clauses, args = self._where(uri, note, level, since, until, status, top_only)
+        query = "SELECT %s FROM checks%s ORDER BY checked DESC, id DESC" % (
+            ", ".join(CHECK_FIELDS), clauses)
+        if limit is not None:
+            query += " LIMIT ?"
+            args.append(limit)
+        rows = self._connect().execute(query, args)
+        return [dict(zip(CHECK_FIELDS, row)) for row in rows]
+
+    def uris(self, note: str=None, level: str=None, since: float=None, until: float=None,
+             status: str=None, top_only: bool=False) -> List[Tuple[str, int]]:
+        """
+        Return the distinct URIs of the checks selected (as in checks()), each with how many
+        times it was checked, most often checked first.
+        """
+        clauses, args = self._where(None, note, level, since, until, status, top_only)
+        query = "SELECT uri, COUNT(*) FROM checks%s GROUP BY uri ORDER BY COUNT(*) DESC, uri" % \
+            clauses
+        return [(uri, count) for (uri, count) in self._connect().execute(query, args)]
+
+    def notes(self, check_id: int) -> List[Dict[str, Any]]:
+        "Return the notes of a stored check, as dictionaries with the keys in NOTE_FIELDS."
+        rows = self._connect().execute(
+            "SELECT %s FROM notes WHERE check_id = ? ORDER BY rowid" % ", ".join(NOTE_FIELDS),
+            (check_id,))
+        return [dict(zip(NOTE_FIELDS, row)) for row in rows]
+
+    def note_counts(self, since: float=None, until: float=None, level: str=None,
+                    top_only: bool=False) -> List[Tuple[str, int]]:
+        "Return how many of the selected checks had each note, most common first."
+        clauses, args = self._where(None, None, None, since, until, None, top_only)
+        conditions = []
+        if clauses:
+            conditions.append("check_id IN (SELECT id FROM checks%s)" % clauses)
+        if level is not None:
+            conditions.append("level = ?")
+            args.append(level)
+        query = "SELECT note, COUNT(DISTINCT check_id) FROM notes"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " GROUP BY note ORDER BY COUNT(DISTINCT check_id) DESC, note"
+        return [(note, count) for (note, count) in self._connect().execute(query, args)]
+
+    @staticmethod
+    def _where(uri: str, note: str, level: str, since: float, until: float, status: str,
+               top_only: bool) -> Tuple[str, List[Any]]:
+        "Build a WHERE clause (and its arguments) selecting checks."
+        conditions = []  # type: List[str]
+        args = []        # type: List[Any]
+        if uri is not None:
+            conditions.append("checks.uri = ?")
+            args.append(uri)
+        if since is not None:
+            conditions.append("checks.checked >= ?")
+            args.append(since)
+        if until is not None:
+            conditions.append("checks.checked < ?")
+            args.append(until)
+        if status is not None:
+            conditions.append("checks.status = ?")
+            args.append(status)
+        if top_only:
+            conditions.append("checks.parent IS NULL")
+        if note is not None or level is not None:
+            note_conditions = []  # type: List[str]
+            if note is not None:
+                note_conditions.append("note = ?")
+                args.append(note)
+            if level is not None:
+                note_conditions.append("level = ?")
+                args.append(level)
+            conditions.append("checks.id IN (SELECT check_id FROM notes WHERE %s)" % \
+                              " AND ".join(note_conditions))
+        if not conditions:
+            return "", args
+        return " WHERE " + " AND ".join(conditions), args
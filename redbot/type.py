@@ -6,3 +6,15 @@ RawHeaderListType = List[Tuple[bytes, bytes]]
 HeaderDictType = Dict[str, Any]
 ParamDictType = Dict[str, str]
 AddNoteMethodType = Callable[..., None]
+
+
+class SlottedType(type):
+    """
+    Metaclass for classes that use __slots__ to keep their (many) instances small.
+
+    Subclasses that don't declare __slots__ themselves get an empty one, so that their instances
+    don't get a __dict__ after all.
+    """
+    def __new__(mcs, name: str, bases: Tuple[type, ...], namespace: Dict[str, Any]) -> type:
+        namespace.setdefault('__slots__', ())
+        return type.__new__(mcs, name, bases, namespace)
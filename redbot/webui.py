@@ -7,18 +7,21 @@ A Web UI for RED, the Resource Expert Droid.
 import gzip
 import os
 import pickle as pickle
+import sqlite3
 import sys
 import tempfile
 import time
-from typing import Any, Callable, Tuple, Union # pylint: disable=unused-import
+from typing import Any, Callable, Dict, Tuple, Union # pylint: disable=unused-import
 from urllib.parse import parse_qs, urlsplit
 import zlib
 
 import thor
 from redbot import __version__
 from redbot.message import HttpRequest
-from redbot.resource import HttpResource
+from redbot.resource import HttpResource, saved
+from redbot.resource.fetch import FetchLimits
 from redbot.resource.robot_fetch import RobotFetcher
+from redbot.store import ResultStore
 from redbot.formatter import find_formatter, html
 from redbot.formatter.html import e_url
 from redbot.type import RawHeaderListType, StrHeaderListType # pylint: disable=unused-import
@@ -109,8 +112,13 @@ class RedWebUi(object):
             return
         is_saved = mtime > thor.time()
         try:
-            top_resource = pickle.load(fd)
-        except (pickle.PickleError, IOError, EOFError):
+            try:
+                top_resource = saved.load(fd)
+            except saved.SavedFormatError:
+                # saved before the current format; fall back to the old pickle.
+                fd.seek(0)
+                top_resource = pickle.load(fd)
+        except (pickle.PickleError, IOError, EOFError, ValueError, zlib.error):
             self.response_start(b"500", b"Internal Server Error", [
                 (b"Content-Type", b"text/html; charset=%s" % self.charset_bytes),
                 (b"Cache-Control", b"max-age=600, must-revalidate")])
@@ -154,6 +162,11 @@ class RedWebUi(object):
         self.timeout = thor.schedule(self.config.max_runtime, self.timeoutError,
                                      top_resource.show_task_map)
         top_resource.set_request(self.test_uri, req_hdrs=self.req_hdrs)
+        top_resource.limits = FetchLimits(self.config.fetch_max_body,
+                                          self.config.fetch_max_headers,
+                                          self.config.fetch_max_time)
+        top_resource.budget = FetchLimits(self.config.check_max_body, None,
+                                          self.config.check_max_time)
         formatter = find_formatter(self.format, 'html', self.descend)(
             self.ui_uri, self.config.lang, self.output,
             allow_save=test_id, is_saved=False, test_id=test_id, descend=self.descend)
@@ -196,10 +209,15 @@ class RedWebUi(object):
             if test_id:
                 try:
                     tmp_file = gzip.open(path, 'w')
-                    pickle.dump(top_resource, tmp_file)
+                    saved.save(top_resource, tmp_file)
                     tmp_file.close()
-                except (IOError, zlib.error, pickle.PickleError):
+                except (IOError, zlib.error, ValueError):
                     pass # we don't cry if we can't store it.
+            if self.config.result_store:
+                try:
+                    get_store(self.config.result_store).record(top_resource, test_id)
+                except sqlite3.Error as why:
+                    self.error_log("Can't record results: %s" % why)
             ti = sum([i.transfer_in for i, t in top_resource.linked], top_resource.transfer_in)
             to = sum([i.transfer_out for i, t in top_resource.linked], top_resource.transfer_out)
             if ti + to > self.config.log_traffic:
@@ -266,6 +284,14 @@ class RedWebUi(object):
 
 
 
+_stores = {} # type: Dict[str, ResultStore]
+def get_store(path: str) -> ResultStore:
+    "Get the ResultStore for path, keeping it so that its connection is reused."
+    if path not in _stores:
+        _stores[path] = ResultStore(path)
+    return _stores[path]
+
+
 # adapted from cgitb.Hook
 def except_handler_factory(config: Any, out: Callable[[str], None]=None,
                            qs: str=None) -> Callable[..., None]:
@@ -10,7 +10,7 @@ setup(name='redbot',
       url='https://redbot.org/project/',
       packages=find_packages(),
       package_dir={'redbot': 'redbot'},
-      scripts=['bin/redbot', 'bin/webui.py'],
+      scripts=['bin/redbot', 'bin/redbot_query', 'bin/webui.py'],
       package_data={
               'redbot': ['assets/*', 'assets/icon/*', 'assets/logo/*']
       },
@@ -18,6 +18,9 @@ setup(name='redbot',
           'thor >= 0.3.4',
           'markdown >= 2.6.5'
       ],
+      extras_require={
+          'brotli': ['brotli']
+      },
       classifiers=[
         'Programming Language :: Python :: 3.5',
         'Development Status :: 4 - Beta',
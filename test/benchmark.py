@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+
+"""
+Benchmark the analysis pipeline over a corpus of recorded responses.
+
+Each response in the corpus is replayed -- without touching the network -- through each stage of
+the pipeline in turn:
+
+  headers      HttpResponse.process_top_line and process_raw_headers
+  body         HttpResponse.feed_body (with the recorded chunks) and body_done
+  status       StatusChecker
+  caching      checkCaching
+  format-*     rendering the analysed HttpResource with each formatter
+
+For each stage, the number of responses processed per second is reported, along with the memory
+allocated while processing one (peak and still held afterwards, as seen by tracemalloc).
+
+The corpus is a file with one JSON object per line, with the members:
+
+  name         a label for the response
+  method, uri, req_headers    the request (headers as [name, value] lists)
+  time         when the response was received (seconds since the epoch)
+  version, status, phrase     the response's status line
+  headers      the response headers, as [name, value] lists
+  chunks       the response body, as a list of base64-encoded chunks (after any transfer-coding
+               has been removed, as thor would deliver them)
+
+Use --save to write the results to a file, and --compare to check a later run against them;
+a stage that has slowed by more than --threshold percent is a regression, and makes the exit
+status 1.
+"""
+
+from base64 import b64decode
+from collections import OrderedDict
+import gc
+import json
+from optparse import OptionParser
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple # pylint: disable=unused-import
+
+from redbot.formatter import find_formatter
+from redbot.message import HttpRequest, HttpResponse
+from redbot.message.cache import checkCaching
+from redbot.message.status import StatusChecker
+from redbot.resource import HttpResource
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "benchmark_corpus.jsonl")
+RESULTS_VERSION = 1
+FORMATS = ['text', 'html', 'har']
+
+
+class Recorded(object):
+    "A recorded request/response exchange from the corpus."
+    def __init__(self, record: Dict[str, Any]) -> None:
+        self.name = record['name']
+        self.method = record.get('method', "GET")
+        self.uri = record['uri']
+        self.req_headers = [tuple(hdr) for hdr in record.get('req_headers', [])]
+        self.time = record['time']
+        self.version = record.get('version', "1.1").encode('ascii')
+        self.status = record['status'].encode('ascii')
+        self.phrase = record.get('phrase', "").encode('ascii')
+        self.headers = [(name.encode('latin-1'), value.encode('latin-1'))
+                        for (name, value) in record['headers']]
+        self.chunks = [b64decode(chunk) for chunk in record.get('chunks', [])]
+
+
+def load_corpus(path: str) -> List[Recorded]:
+    "Read the corpus at path."
+    with open(path) as fd:
+        return [Recorded(json.loads(line)) for line in fd if line.strip()]
+
+
+def make_note(subject: str, note: Any, **kw: Any) -> None:
+    "Create a note, as RedFetcher.add_note does, but don't keep it."
+    note(subject, kw)
+
+
+def new_request(recorded: Recorded) -> HttpRequest:
+    request = HttpRequest(make_note)
+    request.method = recorded.method
+    request.set_iri(recorded.uri)
+    request.set_headers(recorded.req_headers)
+    request.start_time = recorded.time
+    return request
+
+
+def new_response(recorded: Recorded) -> HttpResponse:
+    response = HttpResponse(make_note)
+    response.base_uri = recorded.uri
+    response.is_head_response = recorded.method == "HEAD"
+    response.start_time = recorded.time
+    return response
+
+
+def process_headers(recorded: Recorded, response: HttpResponse) -> None:
+    response.process_top_line(recorded.version, recorded.status, recorded.phrase)
+    response.process_raw_headers(recorded.headers)
+
+
+def headers_done(recorded: Recorded) -> HttpResponse:
+    "Return a response that has been through the headers stage."
+    response = new_response(recorded)
+    process_headers(recorded, response)
+    return response
+
+
+def process_body(recorded: Recorded, response: HttpResponse) -> None:
+    for chunk in recorded.chunks:
+        response.feed_body(chunk)
+    response.body_done(True)
+
+
+def analysed(recorded: Recorded) -> Tuple[HttpRequest, HttpResponse]:
+    "Return the request and a response that has been through the headers and body stages."
+    response = headers_done(recorded)
+    process_body(recorded, response)
+    return new_request(recorded), response
+
+
+def analysed_resource(recorded: Recorded) -> HttpResource:
+    "Return a HttpResource that has been through the whole pipeline, without any active checks."
+    resource = HttpResource()
+    resource.set_request(recorded.uri, recorded.method, recorded.req_headers)
+    resource.request.start_time = recorded.time
+    response = resource.response
+    response.removeListeners('headers_available', 'content_available')
+    response.start_time = recorded.time
+    process_headers(recorded, response)
+    StatusChecker(response, resource.request)
+    checkCaching(response, resource.request)
+    process_body(recorded, response)
+    resource.check_done = True
+    return resource
+
+
+class Stage(object):
+    """
+    A stage of the pipeline. prepare(recorded) sets up what's needed to run it, and isn't timed;
+    run(recorded, prepared) runs it.
+    """
+    def __init__(self, name: str, prepare: Callable[[Recorded], Any],
+                 run: Callable[[Recorded, Any], None]) -> None:
+        self.name = name
+        self.prepare = prepare
+        self.run = run
+
+
+def format_stage(name: str) -> Stage:
+    formatter_class = find_formatter(name, 'text', False)
+    resources = {} # type: Dict[str, HttpResource]
+    def prepare(recorded: Recorded) -> Any:
+        if recorded.name not in resources:
+            resources[recorded.name] = analysed_resource(recorded)
+        return formatter_class("", "en", lambda out: None)
+    def run(recorded: Recorded, formatter: Any) -> None:
+        formatter.bind_resource(resources[recorded.name])
+    return Stage("format-%s" % name, prepare, run)
+
+
+STAGES = [
+    Stage("headers", new_response, process_headers),
+    Stage("body", headers_done, process_body),
+    Stage("status", analysed, lambda recorded, exchange: StatusChecker(exchange[1], exchange[0])),
+    Stage("caching", analysed, lambda recorded, exchange: checkCaching(exchange[1], exchange[0])),
+] + [format_stage(name) for name in FORMATS]
+
+
+def time_stage(stage: Stage, corpus: List[Recorded], iterations: int, repeat: int) -> float:
+    "Return how many responses per second stage processes, at best."
+    best = None # type: float
+    for _ in range(repeat):
+        work = [] # type: List[Tuple[Recorded, Any]]
+        for _ in range(iterations):
+            work.extend([(recorded, stage.prepare(recorded)) for recorded in corpus])
+        gc.collect()
+        start = time.perf_counter()
+        for recorded, prepared in work:
+            stage.run(recorded, prepared)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return len(corpus) * iterations / best
+
+
+def measure_allocations(stage: Stage, corpus: List[Recorded]) -> Tuple[float, float]:
+    "Return the average KB allocated at peak, and still held afterwards, for stage per response."
+    peak_total = held_total = 0
+    tracemalloc.start()
+    try:
+        for recorded in corpus:
+            prepared = stage.prepare(recorded)
+            tracemalloc.clear_traces()
+            stage.run(recorded, prepared)
+            held, peak = tracemalloc.get_traced_memory()
+            peak_total += peak
+            held_total += held
+    finally:
+        tracemalloc.stop()
+    return peak_total / len(corpus) / 1024, held_total / len(corpus) / 1024
+
+
+def run_benchmark(corpus: List[Recorded], stages: List[Stage], iterations: int,
+                  repeat: int) -> Dict[str, Dict[str, float]]:
+    results = OrderedDict() # type: Dict[str, Dict[str, float]]
+    for stage in stages:
+        stage.run(corpus[0], stage.prepare(corpus[0])) # warm up
+        ops = time_stage(stage, corpus, iterations, repeat)
+        peak_kb, held_kb = measure_allocations(stage, corpus)
+        results[stage.name] = {'ops_per_sec': ops, 'peak_kb': peak_kb, 'held_kb': held_kb}
+    return results
+
+
+def report(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]=None,
+           threshold: float=10) -> List[str]:
+    "Print results, comparing them with baseline if given. Return the stages that regressed."
+    regressed = []
+    header = "%-14s %12s %10s %10s" % ("stage", "ops/sec", "peak KB", "held KB")
+    if baseline is not None:
+        header += " %12s %8s" % ("baseline", "change")
+    print(header)
+    for name, result in results.items():
+        line = "%-14s %12.1f %10.1f %10.1f" % (
+            name, result['ops_per_sec'], result['peak_kb'], result['held_kb'])
+        if baseline is not None and name in baseline:
+            before = baseline[name]['ops_per_sec']
+            change = (result['ops_per_sec'] - before) / before * 100
+            line += " %12.1f %+7.1f%%" % (before, change)
+            if change < -threshold:
+                line += "  REGRESSION"
+                regressed.append(name)
+        print(line)
+    return regressed
+
+
+def main() -> None:
+    opt_parser = OptionParser(usage="Usage: %prog [options]")
+    opt_parser.add_option("-c", "--corpus", action="store", dest="corpus", default=DEFAULT_CORPUS,
+                          help="the corpus of recorded responses to use")
+    opt_parser.add_option("-n", "--iterations", action="store", type="int", dest="iterations",
+                          default=20, help="how many times to process the corpus per run")
+    opt_parser.add_option("-r", "--repeat", action="store", type="int", dest="repeat", default=3,
+                          help="how many runs to take the best of")
+    opt_parser.add_option("--stage", action="append", dest="stages", default=[],
+                          help="only run this stage (can be given more than once)")
+    opt_parser.add_option("--save", action="store", dest="save",
+                          help="save the results to this file, as a baseline")
+    opt_parser.add_option("--compare", action="store", dest="compare",
+                          help="compare the results with a baseline saved with --save")
+    opt_parser.add_option("--threshold", action="store", type="float", dest="threshold",
+                          default=10, help="how many percent slower a stage can be before it "
+                          "counts as a regression (with --compare)")
+    (options, args) = opt_parser.parse_args()
+
+    stages = STAGES
+    if options.stages:
+        stages = [stage for stage in STAGES if stage.name in options.stages]
+        if not stages:
+            opt_parser.error("Unknown stage; choose from: %s" % ", ".join(
+                [stage.name for stage in STAGES]))
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as fd:
+            saved = json.load(fd, object_pairs_hook=OrderedDict)
+        if saved.get('version') != RESULTS_VERSION:
+            opt_parser.error("%s isn't a baseline saved by this version." % options.compare)
+        baseline = saved['stages']
+
+    corpus = load_corpus(options.corpus)
+    print("%i responses from %s" % (len(corpus), options.corpus))
+    results = run_benchmark(corpus, stages, options.iterations, options.repeat)
+    regressed = report(results, baseline, options.threshold)
+
+    if options.save:
+        with open(options.save, 'w') as fd:
+            json.dump({'version': RESULTS_VERSION, 'corpus': os.path.basename(options.corpus),
+                       'stages': results}, fd, indent=2, sort_keys=True)
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+
+"""
+Load-test the fetcher against the stand-in origin server (see origin_server.py).
+
+Runs a number of HttpResource checks of a scenario, with a number of them in flight at once, and
+reports:
+
+  latency      the 50th and 99th percentile time for a whole check (including active checks and,
+               with --descend, assets)
+  throughput   checks completed per second
+  memory       how much the process' peak memory grew, per check in flight; with --trace-memory,
+               the peak allocated by Python (as seen by tracemalloc) instead, which is more exact
+               but slows things down
+
+Unless --origin is given, the origin server is started in another process for the duration of
+the run, so that it doesn't compete with the checks for the event loop.
+
+Usage: load_test.py [options] [name=value ...]
+  e.g., load_test.py -n 200 -c 20 -s slow delay=0.05
+"""
+
+import math
+from optparse import OptionParser
+import os
+import resource as rusage
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List # pylint: disable=unused-import
+
+import thor
+
+from redbot.batch import BatchChecker
+from redbot.resource import HttpResource # pylint: disable=unused-import
+
+from origin_server import SCENARIOS
+
+ORIGIN_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "origin_server.py")
+
+
+def start_origin(port: int) -> subprocess.Popen:
+    "Start the origin server on port, and wait until it's listening."
+    origin = subprocess.Popen([sys.executable, ORIGIN_SERVER, str(port)])
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.5).close()
+            return origin
+        except socket.error:
+            if origin.poll() is not None:
+                break
+            time.sleep(0.1)
+    origin.kill()
+    sys.stderr.write("The origin server didn't start.\n")
+    sys.exit(1)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    "Return the pct percentile of values (nearest rank)."
+    ordered = sorted(values)
+    rank = max(int(math.ceil(pct / 100.0 * len(ordered))), 1)
+    return ordered[rank - 1]
+
+
+def max_rss_kb() -> float:
+    "The process' peak resident memory so far, in KB."
+    maxrss = rusage.getrusage(rusage.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin": # bytes, rather than KB
+        return maxrss / 1024
+    return maxrss
+
+
+def run_load(url: str, checks: int, concurrency: int, descend: bool=False,
+             trace_memory: bool=False) -> Dict[str, Any]:
+    "Check url checks times, concurrency at once. Return the results."
+    latencies = [] # type: List[float]
+    errors = [] # type: List[str]
+    batch = BatchChecker([url] * checks, concurrency, descend)
+
+    @thor.events.on(batch)
+    def check_done(resource: HttpResource) -> None:
+        if resource.response.http_error is not None:
+            errors.append(resource.response.http_error.desc)
+        elif not resource.response.complete:
+            errors.append("response incomplete")
+        elif "check" in resource.timing and resource.timing["check"].elapsed is not None:
+            latencies.append(resource.timing["check"].elapsed)
+
+    @thor.events.on(batch)
+    def batch_done() -> None:
+        thor.stop()
+
+    if trace_memory:
+        tracemalloc.start()
+    rss_before = max_rss_kb()
+    batch.run()
+    thor.run()
+    if trace_memory:
+        memory = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    else:
+        memory = max_rss_kb() - rss_before
+
+    return {
+        'checks': batch.checked,
+        'errors': errors,
+        'p50': percentile(latencies, 50) if latencies else None,
+        'p99': percentile(latencies, 99) if latencies else None,
+        'throughput': batch.throughput,
+        'memory_kb': memory / min(concurrency, checks),
+    }
+
+
+def report(results: Dict[str, Any]) -> None:
+    print("checks:      %i (%i errors)" % (results['checks'], len(results['errors'])))
+    if results['p50'] is not None:
+        print("latency:     p50 %2.3f s, p99 %2.3f s" % (results['p50'], results['p99']))
+    print("throughput:  %2.1f checks/sec" % results['throughput'])
+    print("memory:      %2.1f KB per check in flight" % results['memory_kb'])
+    for error in sorted(set(results['errors'])):
+        print("  error: %s (%i)" % (error, results['errors'].count(error)))
+
+
+def main() -> None:
+    opt_parser = OptionParser(usage="Usage: %prog [options] [name=value ...]")
+    opt_parser.add_option("-n", "--checks", action="store", type="int", dest="checks",
+                          default=100, help="how many checks to run")
+    opt_parser.add_option("-c", "--concurrency", action="store", type="int", dest="concurrency",
+                          default=10, help="how many checks to run at once")
+    opt_parser.add_option("-s", "--scenario", action="store", dest="scenario", default="basic",
+                          help="the origin server scenario to check")
+    opt_parser.add_option("-a", "--descend", action="store_true", dest="descend", default=False,
+                          help="check assets too (e.g., with the 'page' scenario)")
+    opt_parser.add_option("-p", "--port", action="store", type="int", dest="port", default=8081,
+                          help="the port to run the origin server on")
+    opt_parser.add_option("--origin", action="store", dest="origin",
+                          help="use the origin server already running at this URL")
+    opt_parser.add_option("--trace-memory", action="store_true", dest="trace_memory",
+                          default=False, help="measure memory with tracemalloc")
+    (options, args) = opt_parser.parse_args()
+    if options.checks < 1 or options.concurrency < 1:
+        opt_parser.error("Checks and concurrency must be at least 1.")
+    if options.scenario not in SCENARIOS:
+        opt_parser.error("Unknown scenario %s; try one of: %s" % (
+            options.scenario, ", ".join(sorted(SCENARIOS))))
+
+    origin = None
+    base = options.origin
+    if base is None:
+        origin = start_origin(options.port)
+        base = "http://127.0.0.1:%i/" % options.port
+    url = "%s%s" % (base.rstrip("/") + "/", options.scenario)
+    if args:
+        url += "?" + "&".join(args)
+    print("%s, %i checks, %i at once" % (url, options.checks, options.concurrency))
+    try:
+        results = run_load(url, options.checks, options.concurrency, options.descend,
+                           options.trace_memory)
+    finally:
+        if origin is not None:
+            origin.terminate()
+            origin.wait()
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
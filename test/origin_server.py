@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+
+"""
+A stand-in origin server, for testing RedFetcher against deterministic behaviour.
+
+Runs on thor's TCP server and writes responses itself, so that it can misbehave in ways a real
+HTTP server library won't (e.g., bad chunking).
+
+What it does is chosen by the request path, which names a scenario in SCENARIOS (e.g., /conneg,
+/slow); query parameters override the scenario's options, e.g., /slow?delay=0.5&size=1000.
+The options are:
+
+  size         bytes of body (before any content-coding)
+  html         serve a HTML page linking to `links` assets (under /basic), rather than text
+  links        how many assets the HTML page links to
+  gzip         gzip the body when Accept-Encoding allows it (conneg)
+  ranges       honour byte-range requests
+  validate     send ETag and Last-Modified, and answer conditional requests with 304 (or, if 2,
+               ignore them and send the whole response again)
+  chunked      use chunked transfer-coding rather than Content-Length
+  bad_chunk    send a malformed chunk part-way through the body, then close
+  piece        how many bytes of body to write at once
+  delay        seconds to wait between writing pieces of body
+  headers      how many extra headers to send
+  header_size  how big each extra header's value is
+  bomb         send a gzip body that decompresses to this many bytes, whatever was asked for
+  max_age      the Cache-Control max-age
+
+Other scenarios can be added to SCENARIOS before calling serve().
+
+Usage: origin_server.py [port]
+"""
+
+from email.utils import formatdate
+import gzip
+import hashlib
+import sys
+from typing import Any, Dict, List, Tuple # pylint: disable=unused-import
+from urllib.parse import parse_qsl, urlsplit
+
+import thor
+
+DEFAULTS = {
+    'size': 10000,
+    'html': 0,
+    'links': 0,
+    'gzip': 0,
+    'ranges': 0,
+    'validate': 0,
+    'chunked': 0,
+    'bad_chunk': 0,
+    'piece': 16384,
+    'delay': 0.0,
+    'headers': 0,
+    'header_size': 100,
+    'bomb': 0,
+    'max_age': 60,
+} # type: Dict[str, Any]
+
+SCENARIOS = {
+    'basic': {},
+    'conneg': {'gzip': 1},
+    'no-conneg': {'gzip': 0},
+    'ranges': {'ranges': 1},
+    'validate': {'validate': 1},
+    'no-validate': {'validate': 2, 'size': 1024 * 1024},
+    'chunked': {'chunked': 1},
+    'bad-chunk': {'chunked': 1, 'bad_chunk': 1, 'piece': 1000},
+    'slow': {'delay': 0.2, 'piece': 2000},
+    'huge-headers': {'headers': 200, 'header_size': 1000},
+    'gzip-bomb': {'bomb': 100 * 1024 * 1024},
+    'page': {'html': 1, 'links': 20, 'gzip': 1, 'validate': 1},
+    'everything': {'gzip': 1, 'ranges': 1, 'validate': 1},
+} # type: Dict[str, Dict[str, Any]]
+
+LAST_MODIFIED = b"Thu, 01 Jan 2015 00:00:00 GMT"
+_bodies = {} # type: Dict[Tuple, bytes]  # generated bodies, by what they're generated from
+
+
+def make_body(opts: Dict[str, Any]) -> bytes:
+    "Return the (uncoded) body for opts."
+    key = ('body', opts['size'], opts['html'], opts['links'])
+    if key not in _bodies:
+        if opts['html']:
+            links = "".join(['<img src="/basic?size=%i&amp;n=%i">\n' % (opts['size'] // 4, i)
+                             for i in range(opts['links'])])
+            page = "<html><head><title>Test</title></head><body>\n%s" % links
+            filler = "<p>The quick brown fox jumps over the lazy dog.</p>\n"
+            page += filler * max(0, (opts['size'] - len(page)) // len(filler) + 1)
+            _bodies[key] = (page[:max(opts['size'] - 15, 0)] + "</body></html>\n").encode('ascii')
+        else:
+            line = b"0123456789abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ\n"
+            _bodies[key] = (line * (opts['size'] // len(line) + 1))[:opts['size']]
+    return _bodies[key]
+
+
+def gzipped(key: Tuple, body: bytes) -> bytes:
+    "Return body gzipped, caching it under key."
+    key = ('gzip',) + key
+    if key not in _bodies:
+        _bodies[key] = gzip.compress(body)
+    return _bodies[key]
+
+
+def get_header(req_hdrs: List[Tuple[bytes, bytes]], name: bytes) -> List[bytes]:
+    return [value.strip() for (hdr_name, value) in req_hdrs if hdr_name.lower() == name]
+
+
+class OriginConnection(object):
+    """
+    A connection to the origin server. Requests are answered one at a time; pipelined ones wait
+    in the buffer.
+    """
+    def __init__(self, tcp_conn: thor.tcp.TcpConnection) -> None:
+        self.tcp_conn = tcp_conn
+        self.buffer = b""
+        self.busy = False
+        self.closed = False
+        tcp_conn.on('data', self.handle_data)
+        tcp_conn.on('close', self.handle_close)
+        tcp_conn.pause(False)
+
+    def handle_data(self, data: bytes) -> None:
+        self.buffer += data
+        self.next_request()
+
+    def handle_close(self) -> None:
+        self.closed = True
+
+    def next_request(self) -> None:
+        "If we're idle and have a complete request, answer it."
+        if self.busy or self.closed or b"\r\n\r\n" not in self.buffer:
+            return
+        head, self.buffer = self.buffer.split(b"\r\n\r\n", 1)
+        lines = head.lstrip(b"\r\n").split(b"\r\n")
+        try:
+            method, uri, version = lines[0].split(b" ", 2)
+        except ValueError:
+            self.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            self.close()
+            return
+        req_hdrs = []
+        for line in lines[1:]:
+            name, _, value = line.partition(b":")
+            req_hdrs.append((name.strip(), value.strip()))
+        length = get_header(req_hdrs, b'content-length')
+        if length:
+            self.buffer = self.buffer[int(length[0]):] # we don't look at request bodies
+        keep_alive = version == b"HTTP/1.1" and \
+            b"close" not in b",".join(get_header(req_hdrs, b'connection')).lower()
+        self.busy = True
+        OriginResponse(self, method, uri.decode('ascii', 'replace'), req_hdrs, keep_alive).start()
+
+    def response_done(self, keep_alive: bool) -> None:
+        self.busy = False
+        if keep_alive:
+            self.next_request()
+        else:
+            self.close()
+
+    def write(self, data: bytes) -> None:
+        if not self.closed:
+            self.tcp_conn.write(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.tcp_conn.close()
+
+
+class OriginResponse(object):
+    "A response to a request, according to its scenario."
+    def __init__(self, conn: OriginConnection, method: bytes, uri: str,
+                 req_hdrs: List[Tuple[bytes, bytes]], keep_alive: bool) -> None:
+        self.conn = conn
+        self.method = method
+        self.req_hdrs = req_hdrs
+        self.keep_alive = keep_alive
+        path, query = urlsplit(uri)[2:4]
+        self.scenario = SCENARIOS.get(path.strip("/") or "basic", None)
+        self.opts = dict(DEFAULTS)
+        if self.scenario is not None:
+            self.opts.update(self.scenario)
+        for name, value in parse_qsl(query):
+            if name in DEFAULTS:
+                try:
+                    self.opts[name] = type(DEFAULTS[name])(value)
+                except ValueError:
+                    pass
+
+    def start(self) -> None:
+        if self.scenario is None:
+            self.send(b"404", b"Not Found", [(b"Content-Type", b"text/plain")], b"Not found.\n")
+            return
+        opts = self.opts
+        headers = [
+            (b"Content-Type", b"text/html" if opts['html'] else b"text/plain"),
+            (b"Cache-Control", b"max-age=%i" % opts['max_age'])
+        ]
+        key = (opts['size'], opts['html'], opts['links'])
+        body = make_body(opts)
+        if opts['bomb']:
+            body = gzipped(('bomb', opts['bomb']), b"\0" * opts['bomb'])
+            headers.append((b"Content-Encoding", b"gzip"))
+        elif opts['gzip']:
+            headers.append((b"Vary", b"Accept-Encoding"))
+            if b"gzip" in b",".join(get_header(self.req_hdrs, b'accept-encoding')):
+                body = gzipped(key, body)
+                headers.append((b"Content-Encoding", b"gzip"))
+        if opts['validate']:
+            etag = b'"%s"' % hashlib.sha1(body).hexdigest()[:16].encode('ascii')
+            headers.extend([(b"ETag", etag), (b"Last-Modified", LAST_MODIFIED)])
+            inm = get_header(self.req_hdrs, b'if-none-match')
+            ims = get_header(self.req_hdrs, b'if-modified-since')
+            if opts['validate'] == 1 and \
+              ((inm and etag in [tag.strip() for tag in b",".join(inm).split(b",")]) or \
+               (not inm and ims and ims[0] == LAST_MODIFIED)):
+                self.send(b"304", b"Not Modified", headers, b"")
+                return
+        for i in range(opts['headers']):
+            headers.append((b"X-Filler-%i" % i, b"x" * opts['header_size']))
+        status, phrase = b"200", b"OK"
+        if opts['ranges']:
+            headers.append((b"Accept-Ranges", b"bytes"))
+            byte_range = self.parse_range(len(body))
+            if byte_range is not None:
+                start, end = byte_range
+                status, phrase = b"206", b"Partial Content"
+                headers.append((b"Content-Range", b"bytes %i-%i/%i" % (start, end, len(body))))
+                body = body[start:end + 1]
+        self.send(status, phrase, headers, body)
+
+    def parse_range(self, length: int) -> Tuple[int, int]:
+        "Return the (first, last) byte positions of a satisfiable single range, or None."
+        ranges = get_header(self.req_hdrs, b'range')
+        if len(ranges) != 1 or not ranges[0].startswith(b"bytes=") or b"," in ranges[0]:
+            return None
+        first, _, last = ranges[0][6:].partition(b"-")
+        try:
+            if not first:
+                start, end = max(length - int(last), 0), length - 1
+            else:
+                start = int(first)
+                end = min(int(last), length - 1) if last else length - 1
+        except ValueError:
+            return None
+        if start > end or start >= length:
+            return None
+        return start, end
+
+    def send(self, status: bytes, phrase: bytes, headers: List[Tuple[bytes, bytes]],
+             body: bytes) -> None:
+        "Send the response; the body is written in pieces, opts['delay'] seconds apart."
+        opts = self.opts
+        headers = [(b"Date", formatdate(usegmt=True).encode('ascii'))] + headers
+        has_body = self.method != b"HEAD" and status not in [b"204", b"304"]
+        chunked = has_body and (opts['chunked'] or opts['bad_chunk'])
+        if chunked:
+            headers.append((b"Transfer-Encoding", b"chunked"))
+        else:
+            headers.append((b"Content-Length", b"%i" % len(body)))
+        if not self.keep_alive:
+            headers.append((b"Connection", b"close"))
+        self.conn.write(b"HTTP/1.1 %s %s\r\n%s\r\n" % (status, phrase, b"".join(
+            [b"%s: %s\r\n" % (name, value) for (name, value) in headers])))
+        if not has_body:
+            self.conn.response_done(self.keep_alive)
+            return
+        piece = max(opts['piece'], 1)
+        pieces = [body[i:i + piece] for i in range(0, len(body), piece)]
+        self.send_pieces(pieces, chunked, 0)
+
+    def send_pieces(self, pieces: List[bytes], chunked: bool, sent: int) -> None:
+        "Write the body from piece sent onwards, scheduling the rest if there's a delay."
+        opts = self.opts
+        while not self.conn.closed:
+            if sent == len(pieces):
+                if chunked:
+                    self.conn.write(b"0\r\n\r\n")
+                self.conn.response_done(self.keep_alive)
+                return
+            data = pieces[sent]
+            if opts['bad_chunk'] and sent == len(pieces) // 2:
+                self.conn.write(b"zz\r\n%s\r\n" % data)  # not hex
+                self.conn.close()
+                return
+            if chunked:
+                data = b"%x\r\n%s\r\n" % (len(data), data)
+            self.conn.write(data)
+            sent += 1
+            if opts['delay'] > 0:
+                thor.schedule(opts['delay'], self.send_pieces, pieces, chunked, sent)
+                return
+
+
+def serve(host: bytes, port: int) -> thor.TcpServer:
+    "Start an origin server on host and port. The caller is responsible for running the loop."
+    server = thor.TcpServer(host, port)
+    server.on('connect', OriginConnection)
+    return server
+
+
+if __name__ == "__main__":
+    PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    serve(b"127.0.0.1", PORT)
+    sys.stderr.write("Origin server on http://127.0.0.1:%i/\n" % PORT)
+    try:
+        thor.run()
+    except KeyboardInterrupt:
+        thor.stop()
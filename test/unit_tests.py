@@ -9,6 +9,18 @@ from functools import partial
 import redbot.message.headers as headers
 from redbot.syntax import rfc7230
 from redbot.message import DummyMsg
+from redbot.message.codings import GzipDecoder, DeflateDecoder
+from redbot.batch import BatchChecker
+from redbot.cache_file import CacheDb
+from redbot.resource import HttpResource, saved
+from redbot.resource.cookie_jar import CookieJar
+from redbot.resource.crawl import CrawlScheduler, normalize_uri
+from redbot.resource.diff import diff_results
+from redbot.resource.replay import Recording, load_har, load_transcript
+from redbot.resource.fetch import FetchLimits
+from redbot.resource.robot_fetch import RobotFetcher
+from redbot.resource import timing
+from redbot.store import ResultStore
 
 class GeneralHeaderTesters(unittest.TestCase):
     def setUp(self):
@@ -125,7 +137,546 @@ class GeneralHeaderTesters(unittest.TestCase):
             self.assertEqual(expected_pd, param_dict, 
                 "[%s] %s != %s" % (i, str(expected_pd), str(param_dict)))
             i += 1
-                
+
+    def test_compiled_syntax(self):
+        from redbot.message.headers.etag import etag
+        from redbot.message.headers.vary import vary
+        etag_re = etag.compiled_syntax()
+        self.assertIs(etag_re, etag.compiled_syntax())
+        self.assertIsNot(etag_re, vary.compiled_syntax())
+        self.assertTrue(etag_re.match(' "abc" '))
+        self.assertFalse(etag_re.match('abc'))
+        self.assertTrue(vary.compiled_syntax().match('Accept-Encoding'))
+    def test_find_header_handler(self):
+        from redbot.message.headers.content_type import content_type
+        hp = headers.HeaderProcessor
+        self.assertIs(hp.find_header_handler('Content-Type'), content_type)
+        self.assertIs(hp._handlers['content-type'], content_type)
+        self.assertIs(hp.find_header_handler('X-Request-Id'), headers.UnknownHttpHeader)
+        self.assertIs(hp.find_header_handler('x-request-id', default=False), None)
+        self.assertIn('x-request-id', hp._handlers)
+        self.assertIs(hp.find_header_handler('_utils'), headers.UnknownHttpHeader)
+
+class SavedResultTester(unittest.TestCase):
+    def test_round_trip(self):
+        from io import BytesIO
+        resource = HttpResource()
+        resource.set_request("http://www.example.com/")
+        resource.response.process_top_line(b"1.1", b"200", b"OK")
+        resource.response.process_raw_headers([
+            (b"Content-Type", b"text/html; charset=utf-8"),
+            (b"Cache-Control", b"max-age=60, max-age=30")])
+        resource.response.decoded_sample = b"<html>\xff</html>"
+        resource.response.complete = True
+        resource.coding_support = {'gzip': True, 'br': False}
+        resource.coding_savings = {'gzip': 60}
+        fd = BytesIO()
+        saved.save(resource, fd)
+        fd.seek(0)
+        loaded = saved.load(fd)
+        self.assertTrue(loaded.check_done)
+        self.assertEqual(loaded.request.uri, "http://www.example.com/")
+        self.assertEqual(loaded.response.status_code, "200")
+        self.assertEqual(loaded.response.headers, resource.response.headers)
+        self.assertEqual(loaded.response.parsed_headers['content-type'][0], "text/html")
+        self.assertEqual(loaded.response.decoded_sample, resource.response.decoded_sample)
+        self.assertEqual(loaded.notes, resource.notes)
+        self.assertEqual(sorted(loaded.subreqs), sorted(resource.subreqs))
+        self.assertEqual(loaded.coding_support, resource.coding_support)
+        self.assertEqual(loaded.coding_savings, resource.coding_savings)
+
+    def test_pickle(self):
+        import pickle
+        msg = DummyMsg()
+        msg.process_top_line(b"1.1", b"200", b"OK")
+        msg.process_raw_headers([(b"Content-Length", b"5")])
+        msg.feed_body(b"x" * 1000)
+        msg.body_done(True)
+        self.assertFalse(hasattr(msg.notes[0], '__dict__'))
+        self.assertEqual(msg.payload_sample, [(0, b"x" * 128)])
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            loaded = pickle.loads(pickle.dumps(msg, protocol))
+            self.assertEqual(loaded.status_code, "200")
+            self.assertEqual(loaded.parsed_headers, msg.parsed_headers)
+            self.assertEqual(loaded.payload_len, 1000)
+            self.assertEqual(loaded.notes, msg.notes)
+        # pickles made before messages and notes were slotted have their __dict__ as state
+        state = msg.__getstate__()
+        self.assertIn('status_code', state)
+        self.assertNotIn('add_note', state)
+        old = DummyMsg.__new__(DummyMsg)
+        old.__setstate__(state)
+        self.assertEqual(old.status_code, "200")
+        note = msg.notes[0].__class__.__new__(msg.notes[0].__class__)
+        note.__setstate__({'subject': msg.notes[0].subject, 'vars': msg.notes[0].vars})
+        self.assertEqual(note, msg.notes[0])
+
+    def test_not_saved_format(self):
+        from io import BytesIO
+        self.assertRaises(saved.SavedFormatError, saved.load, BytesIO(b"\x80\x03}q\x00."))
+        self.assertRaises(saved.SavedFormatError, saved.load,
+                          BytesIO(b'{"format":"redbot-saved","version":0}\n{}\n'))
+
+
+class RobotCacheTester(unittest.TestCase):
+    def test_checker_lru(self):
+        fetcher = RobotFetcher()
+        fetcher.robot_checkers = type(RobotFetcher.robot_checkers)()
+        fetcher.max_robot_checkers = 2
+        fetcher._load_checker("http://a:80", b"User-agent: *\nDisallow: /")
+        fetcher._load_checker("http://b:80", b"")
+        self.assertIsNotNone(fetcher._get_checker("http://a:80"))
+        fetcher._load_checker("http://c:80", b"")
+        self.assertEqual(list(fetcher.robot_checkers), ["http://a:80", "http://c:80"])
+        self.assertFalse(fetcher.check_robots("http://a/foo", sync=True))
+        self.assertTrue(fetcher.check_robots("http://c/foo", sync=True))
+
+    def test_shared_lookup(self):
+        fetcher = RobotFetcher()
+        fetcher.robot_checkers = type(RobotFetcher.robot_checkers)()
+        fetcher._load_checker("http://a:80", b"User-agent: *\nDisallow: /")
+        results = []
+        fetcher.on("robot-http://a/foo", results.append)
+        fetcher.on("robot-http://a/foo", results.append)
+        fetcher.check_robots("http://a/foo")
+        self.assertEqual(results, [False, False])
+        self.assertEqual(fetcher.listeners("robot-http://a/foo"), [])
+
+    def test_disk_expiry(self):
+        import tempfile, thor
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fetcher = RobotFetcher()
+            fetcher.robot_checkers = type(RobotFetcher.robot_checkers)()
+            fetcher.robot_cache_dir = tmpdir
+            fetcher._get_db().write("http://a:80", b"User-agent: *\nDisallow: /", 10)
+            self.assertFalse(fetcher.check_robots("http://a/foo", sync=True))
+            expires, checker = fetcher.robot_checkers["http://a:80"]
+            self.assertTrue(expires - thor.time() <= 10)
+
+    def test_cache_db(self):
+        import os, tempfile, thor
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db = CacheDb(os.path.join(tmpdir, "cache.sqlite"))
+            self.assertEqual(db.read("foo"), None)
+            db.write("foo", b"bar", 60)
+            db.write("stale", b"baz", -1)
+            content, expires = CacheDb(db.path).read("foo")
+            self.assertEqual(content, b"bar")
+            self.assertTrue(59 < expires - thor.time() <= 60)
+            self.assertEqual(db.read("stale"), None)
+            db.delete("foo")
+            self.assertEqual(db.read("foo"), None)
+
+
+class ContentDecoderTester(unittest.TestCase):
+    def member(self, data, flags=0, extra=b""):
+        import zlib
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return b"\x1f\x8b\x08" + bytes([flags]) + b"\0\0\0\0\0\xff" + extra + \
+            compressor.compress(data) + compressor.flush() + b"\0" * 8
+
+    def test_split_header(self):
+        stream = self.member(b"foo" * 100, 2 | 4 | 8 | 16,
+                             b"\x03\x00abc" + b"name\0" + b"comment\0" + b"\0\0")
+        for size in [1, 2, 5, len(stream)]:
+            decoder = GzipDecoder()
+            out = b"".join([decoder.decode(stream[i:i + size])
+                            for i in range(0, len(stream), size)])
+            self.assertEqual(out, b"foo" * 100)
+
+    def test_multi_member(self):
+        decoder = GzipDecoder()
+        out = decoder.decode(self.member(b"foo") + self.member(b"bar", 8, b"x\0"))
+        self.assertEqual(out, b"foobar")
+        self.assertEqual(decoder.members, 2)
+
+    def test_bad_header(self):
+        self.assertRaises(IOError, GzipDecoder().decode, b"\x1f\x8c" + b"\0" * 20)
+
+    def test_padding(self):
+        stream = self.member(b"foo") + b"\0" * 20 + self.member(b"bar") + b"\0" * 3
+        for size in [1, len(stream)]:
+            decoder = GzipDecoder()
+            out = b"".join([decoder.decode(stream[i:i + size])
+                            for i in range(0, len(stream), size)])
+            self.assertEqual(out, b"foobar")
+            self.assertEqual(decoder.members, 2)
+
+    def test_trailing_garbage(self):
+        decoder = GzipDecoder()
+        out = decoder.decode(self.member(b"foo") + b"garbage that isn't gzip" + self.member(b"bar"))
+        self.assertEqual(out, b"foo")
+        self.assertEqual(decoder.members, 1)
+
+    def test_deflate(self):
+        import zlib
+        for wbits in [zlib.MAX_WBITS, -zlib.MAX_WBITS]:
+            compressor = zlib.compressobj(9, zlib.DEFLATED, wbits)
+            stream = compressor.compress(b"foo" * 100) + compressor.flush()
+            decoder = DeflateDecoder()
+            out = b"".join([decoder.decode(stream[i:i + 1]) for i in range(len(stream))])
+            self.assertEqual(out, b"foo" * 100)
+
+
+class PartialPayloadTester(unittest.TestCase):
+    def feed(self, size, chunks):
+        msg = DummyMsg()
+        msg.payload_size = size
+        msg.process_top_line(b"HTTP/1.1", b"206", b"Partial Content")
+        for chunk in chunks:
+            msg.feed_body(chunk)
+        msg.body_done(True)
+        return msg
+
+    def test_under_cap(self):
+        msg = self.feed(10, [b"abc", b"def"])
+        self.assertEqual(msg.payload, b"abcdef")
+        self.assertFalse(msg.payload_truncated)
+        self.assertEqual(msg.note_classes, [])
+
+    def test_over_cap(self):
+        msg = self.feed(5, [b"abc", b"def", b"ghi"])
+        self.assertEqual(msg.payload, b"abcde")
+        self.assertEqual(msg.payload_len, 9)
+        self.assertTrue(msg.payload_truncated)
+        self.assertEqual(msg.note_classes, ['PAYLOAD_TRUNCATED'])
+
+
+class FetchLimitsTester(unittest.TestCase):
+    def test_bytes(self):
+        limits = FetchLimits(max_body_bytes=10, max_header_bytes=5)
+        limits.use(body_bytes=10, header_bytes=5)
+        self.assertEqual(limits.exceeded(), None)
+        limits.use(body_bytes=1)
+        self.assertEqual(limits.exceeded(), "10 bytes of body")
+        limits.use(header_bytes=1)
+        self.assertEqual(limits.exceeded(), "5 bytes of headers")
+
+    def test_time(self):
+        limits = FetchLimits(max_time=10)
+        self.assertEqual(limits.time_left(), 10)
+        limits.start()
+        limits.start_time -= 11
+        self.assertEqual(limits.time_left(), 0)
+        self.assertEqual(limits.exceeded(), "10 seconds")
+        self.assertEqual(FetchLimits().time_left(), None)
+
+
+class EarlyCheckTester(unittest.TestCase):
+    def early_checks(self):
+        resource = HttpResource()
+        resource.set_request("http://www.example.com/")
+        resource.response.process_top_line(b"1.1", b"200", b"OK")
+        checks = [resource.subreqs[name] for name in ["ETag Validation", "Last-Modified Validation"]]
+        for check in checks:
+            resource.add_check(check)
+            check.fetch_done = True
+            check.emit('fetch_done')
+            self.assertFalse(check.check_done)
+        return resource, checks
+
+    def test_base_complete(self):
+        resource, checks = self.early_checks()
+        resource.response.complete = True
+        resource._fetch_done()
+        self.assertEqual([check.check_done for check in checks], [True, True])
+        self.assertTrue(resource.own_checks_done)
+
+    def test_base_incomplete(self):
+        resource, checks = self.early_checks()
+        resource._fetch_done()
+        self.assertEqual([check.abandoned for check in checks], [True, True])
+        self.assertEqual([check.check_done for check in checks], [True, True])
+        self.assertTrue(resource.own_checks_done)
+
+
+class SkipBodyTester(unittest.TestCase):
+    def start(self, check_name, res_hdrs):
+        resource = HttpResource()
+        resource.set_request("http://www.example.com/")
+        resource.response.process_top_line(b"1.1", b"200", b"OK")
+        resource.response.parsed_headers['etag'] = (False, "abc")
+        check = resource.subreqs[check_name]
+        check.set_request("http://www.example.com/")
+        check.exchange = check.client.exchange()
+        check.exchange.res_version = b"1.1"
+        check._response_start(b"200", b"OK", res_hdrs)
+        return check
+
+    def test_same_etag(self):
+        check = self.start("ETag Validation", [(b"ETag", b'"abc"')])
+        self.assertTrue(check.body_skipped)
+        self.assertTrue(check.fetch_done)
+        self.assertTrue(check.response.complete)
+
+    def test_small_body(self):
+        check = self.start("ETag Validation", [(b"ETag", b'"abc"'), (b"Content-Length", b"10")])
+        self.assertFalse(check.body_skipped)
+
+    def test_different_etag(self):
+        check = self.start("Last-Modified Validation", [(b"ETag", b'"def"')])
+        self.assertFalse(check.body_skipped)
+
+    def test_conneg(self):
+        self.assertTrue(self.start("Content Negotiation", []).body_skipped)
+        check = self.start("Content Negotiation", [(b"Content-Encoding", b"gzip")])
+        self.assertFalse(check.body_skipped)
+
+
+class BatchTester(unittest.TestCase):
+    def redbot(self, *args):
+        import os
+        import subprocess
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join([root] + [p for p in [env.get('PYTHONPATH')] if p])
+        return subprocess.run([sys.executable, os.path.join(root, "bin", "redbot")] + list(args),
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env,
+                              timeout=20)
+
+    def test_empty(self):
+        import thor
+        batch = BatchChecker([])
+        done = []
+        batch.on("batch_done", lambda: done.append(True) or thor.stop())
+        batch.run()
+        thor.schedule(5, thor.stop)
+        thor.run()
+        self.assertEqual(done, [True])
+        self.assertEqual(batch.checked, 0)
+
+    def test_empty_input(self):
+        import tempfile
+        with tempfile.NamedTemporaryFile("w", suffix=".txt") as infile:
+            infile.write("# nothing to check\n")
+            infile.flush()
+            for option in ["--batch", "--diff-batch"]:
+                result = self.redbot(option, infile.name)
+                self.assertEqual(result.returncode, 0)
+                self.assertEqual(result.stdout, b"")
+
+    def test_diff_saved(self):
+        import gzip
+        import json
+        import os
+        import tempfile
+        resource = HttpResource()
+        resource.set_request("http://www.example.com/")
+        resource.response.process_top_line(b"1.1", b"200", b"OK")
+        resource.response.complete = True
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "saved")
+            with gzip.open(path, 'w') as fd:
+                saved.save(resource, fd)
+            pairs = os.path.join(tmpdir, "pairs.txt")
+            with open(pairs, 'w') as fd:
+                fd.write("%s %s\n" % (path, path))
+            result = self.redbot("--diff-batch", pairs)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(json.loads(result.stdout.decode('utf-8'))['new'], path)
+
+
+class CrawlSchedulerTester(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize_uri("HTTP://Example.COM:80#foo"), "http://example.com/")
+        self.assertEqual(normalize_uri("https://example.com:8443/a%2fb?c=%7e"),
+                         "https://example.com:8443/a%2Fb?c=%7E")
+        self.assertEqual(normalize_uri("http://[::1]:8080/"), "http://[::1]:8080/")
+
+    def test_frontier(self):
+        root = HttpResource(descend=True)
+        root.set_request("http://www.example.com/")
+        crawler = CrawlScheduler(root)
+        crawler.max_origin_checks = 0 # don't start anything
+        crawler.max_resources = 3
+        crawler.add_link(root, "http://www.example.com/a.png", "img")
+        crawler.add_link(root, "http://WWW.example.com/a.png#x", "script")
+        crawler.add_link(root, "http://www.example.com/b.js", "script")
+        crawler.add_link(root, "http://www.example.com/c.css", "link")
+        crawler.add_link(root, "http://www.example.com/d.css", "link")
+        self.assertEqual([tag for (linked, tag) in root.linked], ['img', 'script', 'link'])
+        self.assertEqual([item[2].request.uri for item in sorted(crawler.frontier)], [
+            "http://www.example.com/c.css", "http://www.example.com/b.js",
+            "http://www.example.com/a.png"])
+        self.assertEqual(crawler.skipped, 1)
+        self.assertEqual([n.__class__.__name__ for n in root.notes], ['LINKED_LIMIT'])
+
+
+class CookieJarTester(unittest.TestCase):
+    def test_jar(self):
+        jar = CookieJar()
+        jar.set_cookies("http://www.example.com/a/b", [
+            ("sid", "1", []),
+            ("lang", "en", [("Path", "/"), ("Domain", "example.com")]),
+            ("tok", "2", [("Secure", "")]),
+            ("old", "3", [("Max-Age", 0)]),
+            ("evil", "4", [("Domain", "example.net")])], now=1000)
+        self.assertEqual(len(jar), 3)
+        self.assertEqual(jar.cookie_header("http://www.example.com/a/c", now=1000),
+                         "sid=1; lang=en")
+        self.assertEqual(jar.cookie_header("https://img.example.com/a", now=1000),
+                         "lang=en")
+        self.assertEqual(jar.cookie_header("http://www.example.com/ab", now=1000), "lang=en")
+        self.assertEqual(jar.cookie_header("http://example.org/", now=1000), None)
+        hdrs, added = jar.add_cookies("http://example.org/", [('User-Agent', 'foo')])
+        self.assertEqual((hdrs, added), ([('User-Agent', 'foo')], False))
+        hdrs, added = jar.add_cookies("http://www.example.com/", [('Cookie', 'a=b')])
+        self.assertEqual((hdrs, added), ([('Cookie', 'a=b')], False))
+
+
+class PhaseTimerTester(unittest.TestCase):
+    def test_phases(self):
+        finished = []
+        timing.phase_hooks.append(lambda owner, phase: finished.append((owner, phase.name)))
+        try:
+            timer = timing.PhaseTimer("owner")
+            timer.span("robots", 10.0, 10.5)
+            for i in range(2):
+                with timer.phase("body"):
+                    with timer.phase("link_parse"):
+                        sum(range(100000))
+            timer.start("check")
+        finally:
+            timing.phase_hooks.pop()
+        self.assertEqual([phase.name for phase in timer], ["robots", "body", "link_parse", "check"])
+        self.assertEqual(timer["robots"].record(),
+                         {'start': 10.0, 'elapsed': 0.5, 'cpu': None, 'count': 1})
+        self.assertEqual((timer["body"].count, timer["link_parse"].count), (2, 2))
+        self.assertTrue(timer["body"].cpu < timer["link_parse"].cpu)
+        self.assertEqual(timer["check"].elapsed, None)
+        self.assertEqual(finished[:3], [("owner", "robots"), ("owner", "link_parse"),
+                                        ("owner", "body")])
+
+
+class ReplayTester(unittest.TestCase):
+    transcript = (
+        b"GET /a HTTP/1.1\r\nHost: www.example.com\r\n\r\n"
+        b"HTTP/1.1 100 Continue\r\n\r\n"
+        b"HTTP/1.1 200 OK\r\nDate: Mon, 04 Jul 2011 09:08:06 GMT\r\n"
+        b"Transfer-Encoding: chunked\r\nX-Folded: a\r\n b\r\n\r\n"
+        b"3\r\nabc\r\n2;ext=1\r\nde\r\n0\r\n\r\n"
+        b"GET http://www.example.com/a HTTP/1.1\r\nIf-None-Match: \"x\"\r\n\r\n"
+        b"HTTP/1.1 304 Not Modified\r\nContent-Length: 5\r\n\r\n"
+        b"HEAD /b HTTP/1.1\r\nHost: www.example.com\r\n\r\n"
+        b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\n"
+        b"POST /c HTTP/1.1\r\nHost: www.example.com\r\nContent-Length: 3\r\n\r\nabc"
+        b"HTTP/1.0 200 OK\r\n\r\nuntil close"
+    )
+
+    def test_transcript(self):
+        exchanges = load_transcript(self.transcript)
+        self.assertEqual([(e.method, e.uri, e.status) for e in exchanges], [
+            ("GET", "http://www.example.com/a", b"200"),
+            ("GET", "http://www.example.com/a", b"304"),
+            ("HEAD", "http://www.example.com/b", b"200"),
+            ("POST", "http://www.example.com/c", b"200")])
+        self.assertEqual(b"".join(exchanges[0].chunks), b"abcde")
+        self.assertEqual(exchanges[0].start_time, 1309770486)
+        self.assertEqual(exchanges[0].headers[-1], (b"X-Folded", b"a b"))
+        self.assertEqual(exchanges[2].chunks, [])
+        self.assertEqual(exchanges[3].req_body, b"abc")
+        self.assertEqual((exchanges[3].version, b"".join(exchanges[3].chunks)),
+                         (b"1.0", b"until close"))
+        recording = Recording(exchanges)
+        self.assertEqual(recording.find("GET", "http://www.example.com/a#foo",
+                                        [("User-Agent", "foo")]), exchanges[0])
+        self.assertEqual(recording.find("GET", "http://www.example.com/a",
+                                        [("if-none-match", '"x"')]), exchanges[1])
+        self.assertEqual(recording.find("GET", "http://www.example.com/a",
+                                        [("Range", "bytes=0-1")]), None)
+
+    def test_har(self):
+        import gzip
+        exchanges = load_har({'log': {'entries': [{
+            'startedDateTime': "2011-07-04T09:08:06.500+01:00",
+            'time': 300,
+            'timings': {'blocked': -1, 'dns': -1, 'connect': 50, 'send': 0, 'wait': 150,
+                        'receive': 100},
+            'request': {'method': "GET", 'url': "https://www.example.com/",
+                        'headers': [{'name': ":authority", 'value': "www.example.com"},
+                                    {'name': "Accept-Encoding", 'value': "gzip"}]},
+            'response': {'status': 200, 'statusText': "OK", 'httpVersion': "HTTP/2.0",
+                         'headers': [{'name': "Content-Encoding", 'value': "gzip"}],
+                         'content': {'size': 5, 'text': "hello"}}}]}})
+        self.assertEqual(len(exchanges), 1)
+        exchange = exchanges[0]
+        self.assertEqual(exchange.req_headers, [("Accept-Encoding", "gzip")])
+        self.assertEqual((exchange.version, exchange.status), (b"2.0", b"200"))
+        self.assertEqual(exchange.start_time, 1309766886.5)
+        self.assertEqual(exchange.response_time, 1309766886.7)
+        self.assertEqual(gzip.decompress(b"".join(exchange.chunks)), b"hello")
+        self.assertFalse(exchange.body_recorded)
+
+
+class ResultDiffTester(unittest.TestCase):
+    def make_resource(self, status, headers, notes):
+        resource = HttpResource()
+        resource.set_request("http://www.example.com/")
+        resource.response.process_top_line(b"1.1", status, b"OK")
+        resource.response.process_raw_headers(headers)
+        resource.notes = []
+        for note, subject, vrs in notes:
+            resource.add_note(subject, note, **vrs)
+        return resource
+
+    def test_diff(self):
+        from redbot.message.cache import FRESHNESS_FRESH, FRESHNESS_NONE
+        from redbot.message import CL_CORRECT
+        old = self.make_resource(b"200", [
+            (b"Date", b"Mon, 01 Jan 2018 00:00:00 GMT"), (b"Cache-Control", b"max-age=60"),
+            (b"Content-Length", b"10")], [
+                (FRESHNESS_FRESH, 'header-cache-control', {'freshness_left': '1 min'}),
+                (CL_CORRECT, 'header-content-length', {})])
+        self.assertFalse(diff_results(old, old).changed)
+        new = self.make_resource(b"200", [
+            (b"Date", b"Tue, 02 Jan 2018 00:00:00 GMT"), (b"Cache-Control", b"max-age=120"),
+            (b"Vary", b"Accept")], [
+                (FRESHNESS_FRESH, 'header-cache-control', {'freshness_left': '2 min'}),
+                (FRESHNESS_NONE, 'header-cache-control', {})])
+        diff = diff_results(old, new)
+        self.assertTrue(diff.changed)
+        self.assertEqual(diff.status, None)
+        self.assertEqual([n.__class__ for n in diff.added_notes], [FRESHNESS_NONE])
+        self.assertEqual([n.__class__ for n in diff.removed_notes], [CL_CORRECT])
+        self.assertEqual([(o.vars['freshness_left'], n.vars['freshness_left'])
+                          for (o, n) in diff.changed_notes], [('1 min', '2 min')])
+        self.assertEqual(diff.added_headers, ['vary'])
+        self.assertEqual(diff.removed_headers, ['content-length'])
+        self.assertEqual(dict(diff.changed_headers),
+                         {'cache-control': (['max-age=60'], ['max-age=120'])})
+        self.assertEqual(diff.record()['added_headers'], {'vary': ['Accept']})
+
+
+class ResultStoreTester(unittest.TestCase):
+    def test_record_and_query(self):
+        import os, tempfile
+        from redbot.message.cache import FRESHNESS_NONE
+        resource = HttpResource(descend=True)
+        resource.set_request("http://www.example.com/")
+        resource.request.start_time = 1000.0
+        resource.response.process_top_line(b"1.1", b"200", b"OK")
+        resource.response.complete = True
+        resource.add_note('header-cache-control', FRESHNESS_NONE)
+        linked = resource.add_linked("http://www.example.com/a.css", "link", resource)
+        linked.request.start_time = 2000.0
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = ResultStore(os.path.join(tmpdir, "results.sqlite"))
+            check_id = store.record(resource, "abc")
+            checks = store.checks()
+            self.assertEqual([c['uri'] for c in checks],
+                             ["http://www.example.com/a.css", "http://www.example.com/"])
+            self.assertEqual(checks[0]['parent'], check_id)
+            self.assertEqual(checks[1]['status'], "200")
+            self.assertEqual(checks[1]['test_id'], "abc")
+            self.assertEqual(store.notes(check_id), [{
+                'note': 'FRESHNESS_NONE', 'subject': 'header-cache-control', 'level': 'info'}])
+            self.assertEqual(store.uris(note='FRESHNESS_NONE', since=500, until=1500),
+                             [("http://www.example.com/", 1)])
+            self.assertEqual(store.uris(note='FRESHNESS_NONE', level='bad'), [])
+            self.assertEqual(store.checks(since=1500, top_only=True), [])
+            self.assertEqual(store.note_counts(), [('FRESHNESS_NONE', 1)])
+
+
 if __name__ == "__main__":
     # requires Python 2.7
     import sys
@@ -139,7 +690,25 @@ if __name__ == "__main__":
     else:
         auto_suite = loader.discover("redbot", "*.py", 'redbot')
         local_suite = loader.loadTestsFromTestCase(GeneralHeaderTesters)
-        all_tests = unittest.TestSuite([local_suite, auto_suite])
+        saved_suite = loader.loadTestsFromTestCase(SavedResultTester)
+        robot_suite = loader.loadTestsFromTestCase(RobotCacheTester)
+        coding_suite = loader.loadTestsFromTestCase(ContentDecoderTester)
+        partial_suite = loader.loadTestsFromTestCase(PartialPayloadTester)
+        limits_suite = loader.loadTestsFromTestCase(FetchLimitsTester)
+        early_suite = loader.loadTestsFromTestCase(EarlyCheckTester)
+        batch_suite = loader.loadTestsFromTestCase(BatchTester)
+        skip_body_suite = loader.loadTestsFromTestCase(SkipBodyTester)
+        crawl_suite = loader.loadTestsFromTestCase(CrawlSchedulerTester)
+        diff_suite = loader.loadTestsFromTestCase(ResultDiffTester)
+        store_suite = loader.loadTestsFromTestCase(ResultStoreTester)
+        cookie_suite = loader.loadTestsFromTestCase(CookieJarTester)
+        timing_suite = loader.loadTestsFromTestCase(PhaseTimerTester)
+        replay_suite = loader.loadTestsFromTestCase(ReplayTester)
+        all_tests = unittest.TestSuite([local_suite, saved_suite, robot_suite, coding_suite,
+                                        partial_suite, limits_suite, early_suite,
+                                        skip_body_suite, batch_suite, crawl_suite,
+                                        diff_suite, store_suite, cookie_suite, timing_suite,
+                                        replay_suite, auto_suite])
     result = unittest.TextTestRunner().run(all_tests)
     if result.errors or result.failures:
         sys.exit(1)